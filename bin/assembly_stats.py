@@ -9,53 +9,107 @@ __author__ = 'D.J.BERGER'
 
 ###### Imports
 
-from Bio import SeqIO
-from Bio.Seq import Seq
+from itertools import accumulate
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import argparse
 import os
 import csv
 import sys
+from fasta_reader import iter_fasta, is_fasta
+from stats_sidecar import hash_file, length_curves, write_sidecar
 
 
 ###### Functions
 
-# Scaffold stats
-def calculate_scaffold_stats(fasta_file):
-	records = list(SeqIO.parse(fasta_file, "fasta"))
-	count = len(records)
-	total_asm = sum(len(record.seq) for record in records)
-	lengths = [len(record.seq) for record in records]
-	lengths.sort(reverse=True)
-	gc_count = sum(record.seq.upper().count("G") + record.seq.upper().count("C") for record in records)
-	all_count = sum(record.seq.upper().count("G") + record.seq.upper().count("C") + record.seq.upper().count("T") + record.seq.upper().count("A") for record in records)
-	gc_cont = round((gc_count/all_count)*100, 2)
-	s_n50 = next((length for length in lengths if sum(lengths[:lengths.index(length) + 1]) >= total_asm * 0.5), None)
-	s_n90 = next((length for length in lengths if sum(lengths[:lengths.index(length) + 1]) >= total_asm * 0.9), None)
-	gap_sum = sum(record.seq.count("N") for record in records)
+# Find the Nx value (e.g. N50, N90) from a list of lengths sorted in descending order using a single cumulative sum
+def calculate_nx(lengths, total_len, fraction):
+	target = total_len * fraction
+	for length, cumulative in zip(lengths, accumulate(lengths)):
+		if cumulative >= target:
+			return length
+	return None
+
+
+# Scaffold and contig stats, gathered in a single streaming pass over each FASTA file
+# Per-record names, lengths, GC and N counts are also returned for the stats sidecar
+def calculate_assembly_stats(fasta_file, gap_size):
+	gap_string = b"N" * int(gap_size)
+	names = []
+	record_lengths = array('Q')
+	gc_counts = array('Q')
+	n_counts = array('Q')
+	contig_lengths = array('Q')
+	all_count = 0
+
+	for header, seq in iter_fasta(fasta_file):
+		seq_upper = seq.upper()
+		record_gc = seq_upper.count(b"G") + seq_upper.count(b"C")
+		names.append((header.split(maxsplit=1) or [b""])[0].decode())
+		record_lengths.append(len(seq))
+		gc_counts.append(record_gc)
+		n_counts.append(seq.count(b"N"))
+		all_count += record_gc + seq_upper.count(b"T") + seq_upper.count(b"A")
+
+		# Split on gaps and keep the lengths of the resulting contigs
+		contig_lengths.extend(len(contig) for contig in seq.split(gap_string) if len(contig) > 0 and b"N" not in contig)
+
+	count = len(record_lengths)
+	total_asm = sum(record_lengths)
+	scaffold_lengths = sorted(record_lengths, reverse=True)
+	gc_cont = round((sum(gc_counts)/all_count)*100, 2)
+	s_n50 = calculate_nx(scaffold_lengths, total_asm, 0.5)
+	s_n90 = calculate_nx(scaffold_lengths, total_asm, 0.9)
+	gap_sum = sum(n_counts)
 	gap_perc = round((gap_sum/total_asm)*100, 2)
-	return count, s_n50, gap_sum, total_asm, s_n90, gc_cont, gap_perc
-
-
-# Contig stats
-def calculate_contig_stats(fasta_file, gap_size):
-	records = [record for record in SeqIO.parse(fasta_file, "fasta")]
-	new_records = []
-	for record in records:
-		seq = str(record.seq)
-		contigs = seq.split("N" * int(gap_size)) # Split on gaps and create new records for split contigs
-		for contig in contigs:
-			if len(contig) > 0 and "N" not in contig:
-				new_record = record[:]
-				new_record.seq = Seq(contig)
-				new_records.append(new_record)
-	c_count = len(new_records)
-	gap_count = len(new_records) - len(records)
-	total_len = sum(len(record.seq) for record in new_records)
-	lengths = [len(record.seq) for record in new_records]
-	lengths.sort(reverse=True)
-	c_n50 = next((length for length in lengths if sum(lengths[:lengths.index(length) + 1]) >= total_len * 0.5), None)
-	c_n90 = next((length for length in lengths if sum(lengths[:lengths.index(length) + 1]) >= total_len * 0.9), None)
-	return c_count, c_n50, gap_count, c_n90
+
+	c_count = len(contig_lengths)
+	gap_count = c_count - count
+	total_len = sum(contig_lengths)
+	sorted_contig_lengths = sorted(contig_lengths, reverse=True)
+	c_n50 = calculate_nx(sorted_contig_lengths, total_len, 0.5)
+	c_n90 = calculate_nx(sorted_contig_lengths, total_len, 0.9)
+
+	records = {
+		'names' : names,
+		'lengths' : record_lengths,
+		'gc_counts' : gc_counts,
+		'n_counts' : n_counts,
+		'contig_lengths' : contig_lengths,
+	}
+
+	return (count, s_n50, gap_sum, total_asm, s_n90, gc_cont, gap_perc, c_count, c_n50, gap_count, c_n90), records
+
+
+# Calculate stats for a single FASTA file, and its content hash if a sidecar is being written
+def process_fasta(fasta_file, gap_size, sidecar):
+	stats, records = calculate_assembly_stats(fasta_file, gap_size)
+	if not sidecar:
+		return stats, None, None
+	return stats, records, hash_file(fasta_file)
+
+
+# Build a sidecar entry with the summary stats, full Nx/Lx curves and auN for scaffolds and gap-split contigs
+def build_sidecar_entry(fasta_name, role, stats, records):
+	count, s_n50, gap_sum, total_asm, s_n90, gc_cont, gap_perc, c_count, c_n50, gap_count, c_n90 = stats
+	entry = {
+		'files' : [{'file' : fasta_name, 'role' : role, 'bin' : fasta_name.split(".")[1]}],
+		'stats' : {
+			'assembly_length_bp' : total_asm, 'scaffold_count' : count, 'scaffold_N50_bp' : s_n50, 'scaffold_N90_bp' : s_n90,
+			'contig_count' : c_count, 'contig_N50_bp' : c_n50, 'contig_N90_bp' : c_n90, 'GC_perc' : gc_cont,
+			'gaps_count' : gap_count, 'gaps_sum_bp' : gap_sum, 'gaps_perc' : gap_perc,
+		},
+		'scaffolds' : length_curves(records['lengths']),
+		'contigs' : length_curves(records['contig_lengths']),
+		'names' : records['names'],
+	}
+	arrays = {
+		'lengths' : records['lengths'],
+		'gc_counts' : records['gc_counts'],
+		'n_counts' : records['n_counts'],
+	}
+	return entry, arrays
 
 
 # Write results to csv file
@@ -73,6 +127,9 @@ def parse_args():
 	parser.add_argument('--fasta_dir', help='Directory containing FASTA files (required)')
 	parser.add_argument('--gap', help="Minimum gap length to be considered a scaffold (optional) [2]", default=2)
 	parser.add_argument('--output', help="Output file prefix (optional) ['sample']", default="sample")
+	parser.add_argument('--threads', type=int, help="Number of FASTA files to process in parallel (optional) [1]", default=1)
+	parser.add_argument('--sidecar', action='store_true', help="Also write a stats sidecar (*.assembly_stats.json and *.assembly_stats.lengths.bin) with Nx/Lx curves, auN and per-contig arrays (optional)")
+	parser.add_argument('--complete_assembly', help="Complete assembly FASTA (binned and unbinned contigs) to include in the stats sidecar (optional)", default=None)
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return parser.parse_args()
@@ -85,13 +142,33 @@ def main():
 		writer = csv.writer(csvfile)
 		writer.writerow(["sampleid","bin", "assembly_length_bp", "scaffold_count", "scaffold_N50_bp", "scaffold_N90_bp","contig_count", "contig_N50_bp", "contig_N90_bp", "GC_perc", "gaps_count", "gaps_sum_bp", "gaps_perc"])
 
-		# Find and process FASTA files
-		for file_name in os.listdir(args.fasta_dir):
-			if file_name.endswith('.fasta') or file_name.endswith('.fa'):
-				file_path = os.path.join(args.fasta_dir, file_name)
-				count, s_n50, gap_sum, total_asm, s_n90, gc_cont, gap_perc = calculate_scaffold_stats(file_path)
-				c_count, c_n50, gap_count, c_n90 = calculate_contig_stats(file_path, args.gap)
+		# Find FASTA files, sorted so the output order does not depend on the directory listing
+		fasta_names = sorted(file_name for file_name in os.listdir(args.fasta_dir) if is_fasta(file_name))
+		fasta_paths = [os.path.join(args.fasta_dir, file_name) for file_name in fasta_names]
+		roles = ['bin'] * len(fasta_paths)
+		if args.sidecar and args.complete_assembly:
+			fasta_names.append(os.path.basename(args.complete_assembly))
+			fasta_paths.append(args.complete_assembly)
+			roles.append('complete_assembly')
+
+		# Process FASTA files across a pool of worker processes, results are returned in input order
+		if args.threads > 1 and len(fasta_paths) > 1:
+			with ProcessPoolExecutor(max_workers=min(args.threads, len(fasta_paths))) as executor:
+				all_stats = list(executor.map(partial(process_fasta, gap_size=args.gap, sidecar=args.sidecar), fasta_paths))
+		else:
+			all_stats = [process_fasta(file_path, args.gap, args.sidecar) for file_path in fasta_paths]
+
+		sidecar_entries = []
+		for file_name, role, (stats, records, file_hash) in zip(fasta_names, roles, all_stats):
+			if role == 'bin':
+				count, s_n50, gap_sum, total_asm, s_n90, gc_cont, gap_perc, c_count, c_n50, gap_count, c_n90 = stats
 				write_stats_to_file(file_name, count, s_n50, c_count, c_n50, gap_count, gap_sum, total_asm, s_n90, c_n90, gc_cont, gap_perc, args.output, csvfile)
+			if args.sidecar:
+				entry, arrays = build_sidecar_entry(file_name, role, stats, records)
+				sidecar_entries.append((file_hash, entry, arrays))
+
+	if args.sidecar:
+		write_sidecar(args.output, sidecar_entries, args.gap)
 
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,106 @@
+# Shared FASTA reader for LOMA bin/ scripts.
+# Plain FASTA files are memory-mapped and gzip/BGZF files are stream-decompressed, records are yielded as (header, sequence) bytes without building per-record objects.
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import os
+import mmap
+import gzip
+
+
+###### Constants
+
+GZIP_MAGIC = b'\x1f\x8b'
+CHUNK_SIZE = 4 * 1024 * 1024 # Decompressed bytes read per chunk from gzip/BGZF files
+
+
+###### Functions
+
+# Check the leading bytes of a file to determine if it is gzip (or BGZF) compressed
+def is_gzipped(fasta_file):
+	with open(fasta_file, 'rb') as handle:
+		return handle.read(2) == GZIP_MAGIC
+
+
+# Slice a single record out of a buffer, strip newlines from the sequence unless the raw sequence block is requested
+def parse_record(buffer, start, end, raw):
+	header_end = buffer.find(b'\n', start, end)
+	if header_end == -1:
+		header_end = end
+	header = bytes(buffer[start + 1:header_end]).rstrip(b'\r')
+	sequence = bytes(buffer[header_end + 1:end])
+	if not raw:
+		sequence = sequence.translate(None, b'\r\n')
+	return header, sequence
+
+
+# Iterate over records in a memory-mapped plain FASTA file
+def iter_mmap(fasta_file, raw):
+	with open(fasta_file, 'rb') as handle:
+		if os.fstat(handle.fileno()).st_size == 0:
+			return
+		with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+			size = len(buffer)
+			start = buffer.find(b'>')
+			while start != -1:
+				boundary = buffer.find(b'\n>', start)
+				end = size if boundary == -1 else boundary + 1
+				yield parse_record(buffer, start, end, raw)
+				start = -1 if boundary == -1 else end
+
+
+# Iterate over records in a gzip/BGZF compressed FASTA file, decompressing in fixed size chunks
+def iter_gzip(fasta_file, raw):
+	with gzip.open(fasta_file, 'rb') as handle:
+		buffer = bytearray()
+		search_from = 0
+		started = False
+		while True:
+			chunk = handle.read(CHUNK_SIZE)
+			buffer += chunk
+
+			# Discard anything before the first header
+			if not started:
+				first = buffer.find(b'>')
+				if first == -1:
+					buffer.clear()
+					if not chunk:
+						return
+					continue
+				del buffer[:first]
+				started = True
+
+			# Yield every record that is followed by another header in the buffer
+			start = 0
+			boundary = buffer.find(b'\n>', search_from)
+			while boundary != -1:
+				yield parse_record(buffer, start, boundary + 1, raw)
+				start = boundary + 1
+				boundary = buffer.find(b'\n>', start)
+
+			if not chunk:
+				if start < len(buffer):
+					yield parse_record(buffer, start, len(buffer), raw)
+				return
+
+			# Keep the incomplete last record and only search the newly read data next time
+			del buffer[:start]
+			search_from = max(len(buffer) - 1, 0)
+
+
+# Iterate over (header, sequence) records in a plain or gzip/BGZF compressed FASTA file
+# With raw=True the sequence is returned as the original block of sequence lines (including newlines), which can be copied straight to another file
+def iter_fasta(fasta_file, raw=False):
+	if is_gzipped(fasta_file):
+		return iter_gzip(fasta_file, raw)
+	return iter_mmap(fasta_file, raw)
+
+
+# Check if a file name has a FASTA extension (optionally gzip compressed)
+def is_fasta(file_name):
+	return file_name.endswith(('.fasta', '.fa', '.fna', '.fasta.gz', '.fa.gz', '.fna.gz'))
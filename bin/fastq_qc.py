@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+# Read quality control of a FASTQ file in a single pass, replacing separate NanoPlot and seqtk fqchk runs.
+# Writes NanoPlot style summary statistics (NanoStats.txt), seqtk fqchk style base composition and quality along the 5' and 3' read ends (fw.txt, rv.txt) and a read length/mean quality histogram (read_hist.tsv).
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import queue
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from remove_host_reads import open_input
+from process_seqsum import add_to_histogram
+
+
+###### Constants
+
+CHUNK_SIZE = 16 * 1024 * 1024 # Decompressed FASTQ bytes per batch of reads
+PHRED_OFFSET = 33
+QUAL_THRESHOLD = 20 # Quality threshold for the %low and %high columns, as seqtk fqchk
+QUAL_CUTOFFS = [5, 7, 10, 12, 15] # Mean read quality cutoffs reported by NanoPlot
+LENGTH_RESOLUTION = 0.5 # kbp per read length histogram bin
+QUAL_RESOLUTION = 0.05 # Mean read quality per histogram bin
+PAD = b'\x00' # Pads read ends shorter than the end sequence length, never found in a FASTQ
+BASE_CODES = np.full(256, 4, dtype=np.uint8) # A, C, G, T, other (N), padding
+BASE_CODES[list(b'ACGTacgt')] = [0, 1, 2, 3, 0, 1, 2, 3]
+BASE_CODES[ord(PAD)] = 5
+ERROR_PROBS = np.power(10, -np.maximum(np.arange(256) - PHRED_OFFSET, 0) / 10)
+COMPLEMENT = bytes.maketrans(b'ACGTacgt', b'TGCAtgca')
+
+
+###### Functions
+
+# Decompress the FASTQ in a background thread, so decompression overlaps with parsing (zlib releases the GIL), passing chunks through a bounded queue
+def decompress_chunks(fastq, chunks):
+	try:
+		with open_input(fastq) as handle:
+			while True:
+				chunk = handle.read(CHUNK_SIZE)
+				if not chunk:
+					break
+				chunks.put(chunk)
+		chunks.put(None)
+	except Exception as e:
+		chunks.put(e)
+
+
+# Iterate over batches of (sequences, qualities) from a plain or gzip compressed four line FASTQ
+def iter_batches(fastq, threads):
+	chunks = queue.Queue(maxsize=max(threads, 2))
+	threading.Thread(target=decompress_chunks, args=(fastq, chunks), daemon=True).start()
+	remainder = b''
+	while True:
+		chunk = chunks.get()
+		if isinstance(chunk, Exception):
+			raise chunk
+		if chunk is None:
+			lines = remainder.rstrip(b'\n').split(b'\n') if remainder.strip() else []
+			lines = lines[:len(lines) // 4 * 4]
+			if lines:
+				yield lines[1::4], lines[3::4]
+			return
+
+		# Keep the incomplete last record for the next chunk
+		lines = (remainder + chunk).split(b'\n')
+		complete = (len(lines) - 1) // 4 * 4
+		remainder = b'\n'.join(lines[complete:])
+		yield lines[1:complete:4], lines[3:complete:4]
+
+
+# Count bases and sum qualities at each position of a set of read ends, padded to the same length
+def end_composition(end_seqs, end_quals, endseq_len):
+	codes = BASE_CODES[np.frombuffer(b''.join(seq.ljust(endseq_len, PAD) for seq in end_seqs), dtype=np.uint8)].reshape(-1, endseq_len)
+	qscores = np.frombuffer(b''.join(qual.ljust(endseq_len, PAD) for qual in end_quals), dtype=np.uint8).reshape(-1, endseq_len)
+	valid = codes < 5
+	phred = np.where(valid, qscores.astype(np.int64) - PHRED_OFFSET, 0)
+	bases = np.bincount((codes.astype(np.int64) * endseq_len + np.arange(endseq_len)).ravel(), minlength=6 * endseq_len).reshape(6, endseq_len)
+
+	composition = {
+		'bases' : bases[:5],
+		'qual_sum' : phred.sum(axis=0),
+		'error_sum' : np.where(valid, ERROR_PROBS[qscores], 0).sum(axis=0),
+		'low' : (valid & (phred < QUAL_THRESHOLD)).sum(axis=0),
+	}
+
+	return(composition)
+
+
+# Get read lengths, mean read qualities (averaged as error probabilities, as NanoPlot) and the composition of both read ends for a batch
+# The 3' end is reverse complemented, matching seqtk fqchk on the output of seqtk seq -r
+def batch_stats(seqs, quals, endseq_len):
+	lengths = np.fromiter(map(len, seqs), dtype=np.int64, count=len(seqs))
+	errors = np.r_[0, np.cumsum(ERROR_PROBS[np.frombuffer(b''.join(quals), dtype=np.uint8)])]
+	ends = np.cumsum(lengths)
+	error_means = (errors[ends] - errors[ends - lengths]) / np.maximum(lengths, 1)
+	read_quals = np.where(lengths > 0, -10 * np.log10(np.maximum(error_means, 1e-10)), 0)
+
+	stats = {
+		'lengths' : lengths.astype(np.uint32),
+		'quals' : read_quals.astype(np.float32),
+		'fw' : end_composition([seq[:endseq_len] for seq in seqs], [qual[:endseq_len] for qual in quals], endseq_len),
+		'rv' : end_composition([seq[-endseq_len:][::-1].translate(COMPLEMENT) for seq in seqs], [qual[-endseq_len:][::-1] for qual in quals], endseq_len),
+	}
+
+	return(stats)
+
+
+# Add the statistics of a batch to the running totals
+def add_batch(totals, stats):
+	if len(stats['lengths']) == 0:
+		return
+	totals['lengths'].append(stats['lengths'])
+	totals['quals'].append(stats['quals'])
+	for end in ['fw', 'rv']:
+		totals[end] = {key: totals[end][key] + stats[end][key] for key in stats[end]} if end in totals else stats[end]
+	length_bins = np.floor(stats['lengths'] / 1000 / LENGTH_RESOLUTION).astype(np.int64)
+	qual_bins = np.floor(stats['quals'] / QUAL_RESOLUTION).astype(np.int64)
+	totals['hist'] = add_to_histogram(totals['hist'], length_bins, qual_bins)
+
+
+# Scan the FASTQ once, computing batch statistics in a thread pool while the next chunks are decompressed and split into records
+# At most one batch per thread is in flight, so memory does not depend on the size of the FASTQ
+def scan_fastq(fastq, endseq_len, threads):
+	totals = {'lengths' : [], 'quals' : [], 'hist' : np.zeros((0, 0), dtype=np.int64)}
+	pending = deque()
+	with ThreadPoolExecutor(max_workers=max(threads - 1, 1)) as executor:
+		for seqs, quals in iter_batches(fastq, threads):
+			pending.append(executor.submit(batch_stats, seqs, quals, endseq_len))
+			if len(pending) >= max(threads - 1, 1):
+				add_batch(totals, pending.popleft().result())
+		while pending:
+			add_batch(totals, pending.popleft().result())
+
+	lengths = np.concatenate(totals['lengths']) if totals['lengths'] else np.zeros(0, dtype=np.uint32)
+	quals = np.concatenate(totals['quals']) if totals['quals'] else np.zeros(0, dtype=np.float32)
+	ends = {end: totals.get(end, end_composition([], [], endseq_len)) for end in ['fw', 'rv']}
+
+	return(lengths, quals, ends, totals['hist'])
+
+
+# Write summary statistics in the NanoPlot NanoStats.txt layout
+def write_nanostats(lengths, quals, output):
+	lengths = lengths.astype(np.int64)
+	total_bases = int(lengths.sum())
+	if len(lengths):
+		sorted_lengths = np.sort(lengths)[::-1]
+		n50 = sorted_lengths[np.searchsorted(np.cumsum(sorted_lengths), total_bases / 2)]
+		mean_qual = -10 * np.log10(np.mean(np.power(10, -quals.astype(np.float64) / 10)))
+		features = {
+			'Mean read length' : lengths.mean(),
+			'Mean read quality' : mean_qual,
+			'Median read length' : np.median(lengths),
+			'Median read quality' : np.median(quals),
+			'Number of reads' : len(lengths),
+			'Read length N50' : n50,
+			'STDEV read length' : lengths.std(ddof=1) if len(lengths) > 1 else 0,
+			'Total bases' : total_bases,
+		}
+	else:
+		features = dict.fromkeys(['Mean read length', 'Mean read quality', 'Median read length', 'Median read quality', 'Number of reads', 'Read length N50', 'STDEV read length', 'Total bases'], 0)
+
+	with open(output + '.NanoStats.txt', 'w') as nanostats_out:
+		nanostats_out.write("General summary:\n")
+		for feature, value in features.items():
+			nanostats_out.write(f"{feature + ':':<24}{value:>20,.1f}\n")
+		nanostats_out.write("Number, percentage and megabases of reads above quality cutoffs\n")
+		for cutoff in QUAL_CUTOFFS:
+			passed = quals > cutoff
+			percentage = 100 * passed.sum() / len(quals) if len(quals) else 0
+			nanostats_out.write(f">Q{cutoff}:\t{passed.sum()} ({percentage:.1f}%) {lengths[passed].sum() / 1e6:.1f}Mb\n")
+
+
+# Write the composition and quality at each position of one read end in the seqtk fqchk column layout (without the header and ALL rows)
+def write_fqchk(composition, output_file):
+	depth = composition['bases'].sum(axis=0)
+	positions = np.flatnonzero(depth)
+	depth = depth[positions]
+	fqchk = pd.DataFrame({'POS' : positions + 1, '#bases' : depth})
+	for base, counts in zip(['%A', '%C', '%G', '%T', '%N'], composition['bases']):
+		fqchk[base] = 100 * counts[positions] / depth
+	fqchk['avgQ'] = composition['qual_sum'][positions] / depth
+	fqchk['errQ'] = -10 * np.log10(np.maximum(composition['error_sum'][positions] / depth, 1e-10))
+	fqchk['%low'] = 100 * composition['low'][positions] / depth
+	fqchk['%high'] = 100 - fqchk['%low']
+
+	fqchk.to_csv(output_file, sep='\t', header=False, index=False, float_format='%.1f')
+
+
+# Write the non-empty bins of the read length/mean quality histogram, as the lower bin edges
+def write_read_hist(hist, output):
+	length_bins, qual_bins = np.nonzero(hist)
+	read_hist = pd.DataFrame({
+		'length_kbp' : length_bins * LENGTH_RESOLUTION,
+		'quality' : np.round(qual_bins * QUAL_RESOLUTION, 2),
+		'reads' : hist[length_bins, qual_bins],
+	})
+
+	read_hist.to_csv(output + '.read_hist.tsv', sep='\t', index=False)
+
+
+# Parse arguments from the command line.
+def parse_args():
+	description = 'Single pass read quality control of a FASTQ file. Version: %s, Date: %s, Author: %s' % (__version__, __date__, __author__)
+	parser = argparse.ArgumentParser(description=description)
+	parser.add_argument("--fastq", required=True, help="Input FASTQ file (optionally gzip compressed, '-' for stdin)")
+	parser.add_argument("--endseq_len", type=int, default=300, help="Number of bases at either end of reads to report composition and quality for [300]")
+	parser.add_argument("--threads", type=int, default=1, help="Threads for decompression and batch statistics [1]")
+	parser.add_argument("--output", required=True, help="Output prefix")
+	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
+
+	return parser.parse_args()
+
+
+###### Main
+def main():
+	args = parse_args()
+	lengths, quals, ends, hist = scan_fastq(args.fastq, args.endseq_len, args.threads)
+	write_nanostats(lengths, quals, args.output)
+	write_fqchk(ends['fw'], args.output + '.fw.txt')
+	write_fqchk(ends['rv'], args.output + '.rv.txt')
+	write_read_hist(hist, args.output)
+
+
+if __name__ == "__main__":
+	main()
@@ -11,7 +11,15 @@ __author__ = 'D.J.BERGER'
 
 import csv
 import argparse
+import numpy as np
+from itertools import islice
 from collections import defaultdict
+from bisect import bisect_left
+
+
+###### Constants
+
+FILTERED_HITS_HEADER = ['qseqid','sseqid','pident', 'length', 'mismatch', 'gapopen', 'qstart', 'qend', 'sstart', 'send', 'evalue', 'bitscore','slen','Description', 'Quality']
 
 
 ###### Functions
@@ -32,7 +40,7 @@ def process_workflow(workflow):
 # Filter the blastn results using the processed workflow data
 def filter_results(blast_results, workflow_data, overlap_len):
 	filtered_rows = []
-	seen_hits = set()
+	seen_hits = defaultdict(lambda: ([], [])) # Accepted hit (starts, ends) per (qseqid, sseqid)
 	gene_count = defaultdict(int)
 	with open(blast_results, 'r', newline='') as blast_input:
 		reader = csv.reader(blast_input, delimiter='\t')
@@ -45,29 +53,75 @@ def filter_results(blast_results, workflow_data, overlap_len):
 			length = int(row[3])
 			qcovs = int(row[12])
 
-			# Identify full length blastn hits above the specified pident
-			if sseqid in workflow_data and pident >= workflow_data[sseqid]['ident'] and (length/qcovs)*100 == 100:
-				# Check for overlapping hits and keep the first one
-				hit_key = (qseqid, sseqid, qstart, qend)
-				if not any(existing_hit for existing_hit in seen_hits if overlap(existing_hit, hit_key, overlap_len)):
-					seen_hits.add(hit_key)
-					row.append(workflow_data[sseqid]['description'])
-					row.insert(14, "Good")
-					filtered_rows.append(row)
-					gene_count[sseqid] += 1
+			if sseqid not in workflow_data or pident < workflow_data[sseqid]['ident']:
+				continue
+
+			# Identify full length (Good) or partial/longer length (Uncertain) blastn hits above the specified pident
+			if (length/qcovs)*100 == 100:
+				quality = "Good"
+			elif (length/qcovs)*100 >= pident and (length/qcovs)*100 < 100:
+				quality = "Uncertain"
+			else:
+				continue
+
+			# Check for overlapping hits and keep the first one
+			hit_intervals = seen_hits[(qseqid, sseqid)]
+			if not overlaps_seen(hit_intervals, qstart, qend, overlap_len):
+				add_seen(hit_intervals, qstart, qend, overlap_len)
+				row.append(workflow_data[sseqid]['description'])
+				row.insert(14, quality)
+				filtered_rows.append(row)
+				gene_count[sseqid] += 1
+
+		return(filtered_rows, gene_count)
+
+
+# Filter the blastn results in chunks with bounded memory, writing accepted hits as they are found
+# Identity and coverage thresholds are applied to each chunk as arrays, only the rows passing them are checked for overlaps (in file order, keeping the first hit)
+def filter_results_streaming(blast_results, workflow_data, overlap_len, output, chunk_size):
+	seen_hits = defaultdict(lambda: ([], [])) # Accepted hit (starts, ends) per (qseqid, sseqid)
+	gene_count = defaultdict(int)
+	output_csv_path = output + '.blastn_filtered_hits.tsv'
+	with open(blast_results, 'r', newline='') as blast_input, open(output_csv_path, 'w', newline='') as output_csv:
+		writer = csv.writer(output_csv, delimiter='\t')
+		writer.writerow(FILTERED_HITS_HEADER)
+		while True:
+			lines = list(islice(blast_input, chunk_size))
+			if not lines:
+				break
+
+			# Per-row identity threshold from the workflow genes (rows for unknown genes can never pass)
+			sseqids = np.array([line.split('\t', 2)[1] for line in lines])
+			genes, gene_index = np.unique(sseqids, return_inverse=True)
+			gene_ident = np.array([workflow_data[gene]['ident'] if gene in workflow_data else np.inf for gene in genes])
+			ident = gene_ident[gene_index]
+
+			# pident, length and qcovs columns
+			values = np.loadtxt(lines, delimiter='\t', usecols=(2, 3, 12), ndmin=2)
+			pident = values[:, 0]
+			with np.errstate(divide='ignore', invalid='ignore'):
+				cov_perc = (values[:, 1]/values[:, 2])*100
+			passed_ident = pident >= ident
+			good = passed_ident & (cov_perc == 100)
+			uncertain = passed_ident & (cov_perc >= pident) & (cov_perc < 100)
+
+			for index in np.flatnonzero(good | uncertain):
+				row = lines[index].rstrip('\r\n').split('\t')
+				qseqid = row[0]
+				sseqid = row[1]
+				qstart = int(row[6])
+				qend = int(row[7])
 
-			# Identify partial/longer length blastn hits above the specified pident
-			if sseqid in workflow_data and pident >= workflow_data[sseqid]['ident'] and (length/qcovs)*100 >= pident and (length/qcovs)*100 < 100:
 				# Check for overlapping hits and keep the first one
-				hit_key = (qseqid, sseqid, qstart, qend)
-				if not any(existing_hit for existing_hit in seen_hits if overlap(existing_hit, hit_key, overlap_len)):
-					seen_hits.add(hit_key)
+				hit_intervals = seen_hits[(qseqid, sseqid)]
+				if not overlaps_seen(hit_intervals, qstart, qend, overlap_len):
+					add_seen(hit_intervals, qstart, qend, overlap_len)
 					row.append(workflow_data[sseqid]['description'])
-					row.insert(14, "Uncertain")
-					filtered_rows.append(row)
+					row.insert(14, "Good" if good[index] else "Uncertain")
+					writer.writerow(row)
 					gene_count[sseqid] += 1
 
-		return(filtered_rows, gene_count)
+	return(gene_count)
 
 
 # Write filtered hits to files
@@ -76,11 +130,15 @@ def write_outputs(filtered_rows, gene_count, workflow_data, output):
 	output_csv_path = output + '.blastn_filtered_hits.tsv'
 	with open(output_csv_path, 'w', newline='') as output_csv:
 		writer = csv.writer(output_csv, delimiter='\t')
-		writer.writerow(['qseqid','sseqid','pident', 'length', 'mismatch', 'gapopen', 'qstart', 'qend', 'sstart', 'send', 'evalue', 'bitscore','slen','Description', 'Quality'])
+		writer.writerow(FILTERED_HITS_HEADER)
 		for row in filtered_rows:
 			writer.writerow(row)
 
-	# Write gene counts to output file
+	write_summary(gene_count, workflow_data, output)
+
+
+# Write gene counts to file
+def write_summary(gene_count, workflow_data, output):
 	output_count_csv_path = output + '.blastn_summary.tsv'
 	with open(output_count_csv_path, 'w', newline='') as count_csv:
 		count_writer = csv.writer(count_csv, delimiter='\t')
@@ -88,9 +146,25 @@ def write_outputs(filtered_rows, gene_count, workflow_data, output):
 		for gene, count in gene_count.items():
 			count_writer.writerow([gene, workflow_data[gene]['description'],count])
 
-# Define how overlaps are evaluated
-def overlap(hit1, hit2, overlap_len):
-	return( hit1[0] == hit2[0] and hit1[1] == hit2[1] and max(0, min(hit1[3], hit2[3]) - max(hit1[2], hit2[2])) > overlap_len)
+# Check a hit against the accepted hits of the same query/subject in O(log n), hits overlap if they share more than overlap_len bp
+# Only hits longer than overlap_len can overlap by more than overlap_len, and accepted hits of that length overlap each other by at most overlap_len,
+# so none of them contains another and their ends are sorted in the same order as their starts. The only candidate is the last accepted hit starting before qend - overlap_len.
+def overlaps_seen(hit_intervals, qstart, qend, overlap_len):
+	starts, ends = hit_intervals
+	if qend - qstart <= overlap_len:
+		return False
+	index = bisect_left(starts, qend - overlap_len)
+	return index > 0 and ends[index - 1] > qstart + overlap_len
+
+
+# Record an accepted hit, keeping starts sorted (hits too short to overlap others are not stored)
+def add_seen(hit_intervals, qstart, qend, overlap_len):
+	starts, ends = hit_intervals
+	if qend - qstart <= overlap_len:
+		return
+	index = bisect_left(starts, qstart)
+	starts.insert(index, qstart)
+	ends.insert(index, qend)
 
 
 # Parse arguments from the command line.
@@ -101,6 +175,8 @@ def parse_args():
 	parser.add_argument('--workflow', required=True, help="Workflow.txt file")
 	parser.add_argument('--overlap', required=False, default=3, type=float, help="Minimum overlap (in bp) required to count as a single hit [3]")
 	parser.add_argument('--output', required=True, help="Output TSV prefix")
+	parser.add_argument('--streaming', required=False, action='store_true', help="Filter the blastn results in chunks with bounded memory, writing hits as they are accepted")
+	parser.add_argument('--chunk_size', required=False, default=100000, type=int, help="Number of blastn rows per chunk in --streaming mode [100000]")
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 	
 	return parser.parse_args()
@@ -111,8 +187,12 @@ def main():
 	args = parse_args()
 
 	workflow_data = process_workflow(args.workflow)
-	filtered_rows, gene_count = filter_results(args.blast_results, workflow_data, args.overlap)
-	write_outputs(filtered_rows, gene_count, workflow_data, args.output)
+	if args.streaming:
+		gene_count = filter_results_streaming(args.blast_results, workflow_data, args.overlap, args.output, args.chunk_size)
+		write_summary(gene_count, workflow_data, args.output)
+	else:
+		filtered_rows, gene_count = filter_results(args.blast_results, workflow_data, args.overlap)
+		write_outputs(filtered_rows, gene_count, workflow_data, args.output)
 
 
 if __name__ == "__main__":
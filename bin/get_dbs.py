@@ -19,6 +19,8 @@ import gzip
 import re
 from git import Repo
 import subprocess
+from gtdb_metadata import build_index
+from ncbi_taxonomy import build_taxonomy_cache
 
 
 ###### Functions
@@ -185,6 +187,17 @@ def get_gtdb(database_directory, gtdb_url):
 	return(gtdb_dbdir_path)
 
 
+def get_gtdb_metadata_index(database_directory, gtdb_metadata):
+	if re.match(r'^(https?|ftp)://', gtdb_metadata):
+		gtdb_metadata_path = os.path.join(database_directory, os.path.basename(gtdb_metadata))
+		urlretrieve(gtdb_metadata, gtdb_metadata_path)
+		gtdb_metadata = gtdb_metadata_path
+	filename = re.sub(r'\.tsv(\.gz)?$', "", os.path.basename(gtdb_metadata)) + ".sqlite"
+	gtdb_metadata_index = build_index(gtdb_metadata, os.path.join(database_directory, filename))
+
+	return(gtdb_metadata_index)
+
+
 def unpack_repo(database_directory, repodir):
 	if not os.path.isfile("virulencefinder_2.0.4--hdfd78af_0.sif"):
 		subprocess.run('singularity pull docker://quay.io/biocontainers/virulencefinder:2.0.4--hdfd78af_0', shell=True)
@@ -231,6 +244,10 @@ def parse_args():
 	parser.add_argument("--gtdb_url", required=False, default="https://data.ace.uq.edu.au/public/gtdb/data/releases/release220/220.0/auxillary_files/gtdbtk_package/full_package/gtdbtk_r220_data.tar.gz", help="url of GTDB-Tk reference database")
 	parser.add_argument("--gtdb_mash", required=False, action='store_true', help="Get GTDB-Tk reference database")
 	parser.add_argument("--gtdb_mash_url", required=False, default="https://zenodo.org/records/13731176/files/r220.msh", help="Get GTDB-Tk reference mash database")
+	parser.add_argument("--gtdb_metadata_index", required=False, action='store_true', help="Build an SQLite index of the GTDB metadata file, so that taxonomy scripts only look up the accessions in each sample")
+	parser.add_argument("--gtdb_metadata", required=False, default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "gtdb_r220_metadata.tsv.gz"), help="Path or url of the GTDB metadata file (gtdb_r*_metadata.tsv.gz) to index")
+	parser.add_argument("--taxonomy_cache", required=False, action='store_true', help="Build the NCBI taxonomy cache (taxonomy_arrays.npz) in the taxdump directory, so that taxonomy scripts do not rebuild it from nodes.dmp")
+	parser.add_argument("--taxdump", required=False, default=None, help="NCBI taxdump directory (names.dmp, merged.dmp, nodes.dmp) to build the taxonomy cache in")
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return(parser.parse_args())
@@ -297,5 +314,15 @@ def main():
 		gtdb_mash_path = get_gtdb_mash(database_dir, args.gtdb_mash_url)
 		rewrite_config(args.config_file, gtdb_mash_path, "GTDBTK_CLASSIFYWF.mash_db")
 
+	if args.gtdb_metadata_index:
+		gtdb_metadata_index_path = get_gtdb_metadata_index(database_dir, args.gtdb_metadata)
+		rewrite_config(args.config_file, gtdb_metadata_index_path, "TAXONOMIC_PROFILING.gtdb_metadata")
+
+	if args.taxonomy_cache:
+		if not args.taxdump:
+			raise ValueError("\n\n\nInput error: --taxonomy_cache requires --taxdump.")
+		build_taxonomy_cache(args.taxdump)
+		rewrite_config(args.config_file, os.path.abspath(args.taxdump), "TAXONOMIC_PROFILING.dbdir")
+
 if __name__ == "__main__":
 	main()
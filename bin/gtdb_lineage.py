@@ -0,0 +1,56 @@
+# Shared GTDB lineage parser for LOMA bin/ scripts.
+# Lineage strings (e.g. 'd__Bacteria;p__Pseudomonadota;...;s__Escherichia coli') are split once to find the deepest assigned rank and its name, results are cached per unique lineage.
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+
+###### Constants
+
+RANK_PREFIXES = {
+	'd__' : 'Domain',
+	'p__' : 'Phylum',
+	'c__' : 'Class',
+	'o__' : 'Order',
+	'f__' : 'Family',
+	'g__' : 'Genus',
+	's__' : 'Species',
+}
+
+
+###### Functions
+
+# Find the deepest assigned rank and its name in a GTDB lineage, empty ranks (e.g. 'g__;s__') are skipped
+# Returns (rank, name), lineages without rank prefixes are 'Unclassified' (e.g. 'Unclassified Bacteria') or have no rank
+@lru_cache(maxsize=None)
+def parse_lineage(lineage):
+	for taxon in reversed(lineage.split(';')):
+		taxon = taxon.strip()
+		rank = RANK_PREFIXES.get(taxon[:3])
+		if rank is not None:
+			if len(taxon) > 3:
+				return rank, taxon[3:]
+			continue
+		if 'Unclassified' in taxon:
+			return 'Unclassified', taxon
+		return np.nan, taxon
+	return np.nan, ''
+
+
+# Add rank and name columns parsed from a column of GTDB lineages, each unique lineage is only parsed once
+def add_lineage_columns(df, lineage_column, name_column, rank_column='rank'):
+	codes, lineages = pd.factorize(df[lineage_column])
+	parsed = [parse_lineage(lineage) for lineage in lineages]
+	ranks = np.array([rank for rank, _ in parsed] + [np.nan], dtype=object)
+	names = np.array([name for _, name in parsed] + [np.nan], dtype=object)
+	df[rank_column] = ranks[codes]
+	df[name_column] = names[codes]
+	return(df)
@@ -0,0 +1,70 @@
+# Indexed store for the GTDB metadata table (genome accession to lineage) used by LOMA bin/ scripts.
+# The gzip compressed TSV is converted once into an SQLite database keyed by accession, so each sample only looks up the accessions it contains.
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import os
+import csv
+import gzip
+import sqlite3
+import pandas as pd
+
+
+###### Constants
+
+SQLITE_MAGIC = b'SQLite format 3\x00'
+INSERT_BATCH_SIZE = 100000
+QUERY_BATCH_SIZE = 500 # Accessions per query, below SQLite's limit on bound parameters
+
+
+###### Functions
+
+# Check the leading bytes of a file to determine if it is an SQLite database
+def is_sqlite(metadata):
+	with open(metadata, 'rb') as handle:
+		return handle.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+
+
+# Convert the GTDB metadata TSV (accession and lineage columns, optionally gzip compressed) into an SQLite database keyed by accession
+def build_index(metadata, output_db):
+	tmp_db = output_db + '.tmp'
+	if os.path.exists(tmp_db):
+		os.remove(tmp_db)
+	opener = gzip.open if metadata.endswith('.gz') else open
+	with opener(metadata, 'rt', newline='') as metadata_in, sqlite3.connect(tmp_db) as connection:
+		connection.execute('CREATE TABLE lineage (accession TEXT PRIMARY KEY, tax TEXT) WITHOUT ROWID')
+		batch = []
+		for row in csv.reader(metadata_in, delimiter='\t'):
+			batch.append((row[0], row[1]))
+			if len(batch) == INSERT_BATCH_SIZE:
+				connection.executemany('INSERT OR REPLACE INTO lineage VALUES (?, ?)', batch)
+				batch = []
+		connection.executemany('INSERT OR REPLACE INTO lineage VALUES (?, ?)', batch)
+	connection.close()
+	os.replace(tmp_db, output_db)
+	return(output_db)
+
+
+# Look up the lineages of a set of accessions, from the SQLite index or (if given the original table) by reading the whole TSV
+# Returns a DataFrame with the 'Genome_file_1' (accession) and 'tax' columns expected by the merges in the taxonomy scripts
+def load_lineages(metadata, accessions):
+	accessions = [accession for accession in pd.unique(pd.Series(accessions, dtype=object).dropna())]
+	if not is_sqlite(metadata):
+		lineages = pd.read_csv(metadata, sep='\t', header=None, usecols=[0, 1], names=['Genome_file_1', 'tax'])
+		return(lineages[lineages['Genome_file_1'].isin(accessions)].reset_index(drop=True))
+
+	rows = []
+	connection = sqlite3.connect(f"file:{os.path.abspath(metadata)}?mode=ro", uri=True)
+	try:
+		for start in range(0, len(accessions), QUERY_BATCH_SIZE):
+			batch = accessions[start:start + QUERY_BATCH_SIZE]
+			placeholders = ','.join('?' * len(batch))
+			rows.extend(connection.execute(f'SELECT accession, tax FROM lineage WHERE accession IN ({placeholders})', batch).fetchall())
+	finally:
+		connection.close()
+	return(pd.DataFrame(rows, columns=['Genome_file_1', 'tax']))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+# Index a basecalled run directory in a single scan, listing the pass FASTQ chunks (per barcode), sequencing summary and final summary files.
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+###### Imports
+
+import os
+import re
+import csv
+import argparse
+
+
+###### Constants
+
+MANIFEST_HEADER = ['type', 'barcode', 'size', 'mtime', 'path']
+BARCODE_PATTERN = re.compile(r'barcode\d+', re.IGNORECASE)
+
+
+###### Functions
+
+# Check if a directory can be skipped, failed reads and raw signal folders never contain pass FASTQ or sequencing summary files
+def is_pruned(dir_name):
+	dir_name = dir_name.lower()
+	return dir_name.endswith('_fail') or dir_name.startswith('fast5') or dir_name.startswith('pod5')
+
+
+# Get the barcode (e.g. barcode01) from the deepest barcode folder in a path, or an empty string for non-barcoded runs
+def path_barcode(path):
+	barcodes = BARCODE_PATTERN.findall(path)
+	return barcodes[-1].lower() if barcodes else ''
+
+
+# Scan a run directory once with os.scandir, yielding manifest rows for pass FASTQ chunks (in basecaller folders), sequencing summary and final summary files
+def scan_run_dir(search_dir, folder_name):
+	keep_string = "fastq_pass"
+	stack = [search_dir]
+	while stack:
+		root = stack.pop()
+		is_fastq_dir = folder_name.lower() in root.lower() and keep_string in root.lower()
+		try:
+			entries = sorted(os.scandir(root), key=lambda entry: entry.name)
+		except OSError as e:
+			print(f"Warning: Unable to scan {root}: {e}")
+			continue
+		for entry in entries:
+			if entry.is_dir():
+				if not entry.is_symlink() and not is_pruned(entry.name):
+					stack.append(entry.path)
+				continue
+			if 'sequencing_summary' in entry.name:
+				file_type = 'sequencing_summary'
+			elif 'final_summary' in entry.name:
+				file_type = 'final_summary'
+			elif is_fastq_dir and (entry.name.endswith('.fastq') or entry.name.endswith('.fastq.gz')):
+				file_type = 'fastq'
+			else:
+				continue
+			stat = entry.stat()
+			yield [file_type, path_barcode(root), stat.st_size, stat.st_mtime_ns, entry.path]
+
+
+# Write the run manifest
+def write_manifest(search_dir, folder_name, output):
+	with open(output, 'w', newline='') as manifest_out:
+		writer = csv.writer(manifest_out, delimiter='\t')
+		writer.writerow(MANIFEST_HEADER)
+		for row in scan_run_dir(search_dir, folder_name):
+			writer.writerow(row)
+
+
+# Read a run manifest, optionally keeping only one file type
+def read_manifest(manifest, file_type=None):
+	with open(manifest, 'r', newline='') as manifest_in:
+		reader = csv.DictReader(manifest_in, delimiter='\t')
+		return [row for row in reader if file_type is None or row['type'] == file_type]
+
+
+# Parse arguments from the command line.
+def parse_args():
+	description = 'Index FASTQ and sequencing summary files in a basecalled run directory. Version: %s, Date: %s, Author: %s' % (__version__, __date__, __author__)
+	parser = argparse.ArgumentParser(description=description)
+	parser.add_argument("--input-dir", help="Input directory containing run folders", required=True)
+	parser.add_argument("--run_id", help="Run ID", required=True)
+	parser.add_argument("--folder_name", help="basecaller (e.g. guppy, dorado etc)", default="guppy")
+	parser.add_argument("--output", help="Output manifest (TSV)", required=True)
+	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
+
+	return parser.parse_args()
+
+
+###### Main
+def main():
+	args = parse_args()
+	write_manifest(os.path.abspath(os.path.join(args.input_dir, args.run_id)), args.folder_name, args.output)
+
+if __name__ == "__main__":
+	main()
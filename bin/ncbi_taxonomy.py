@@ -0,0 +1,199 @@
+# Compact NCBI taxonomy (nodes.dmp, merged.dmp) for LOMA bin/ scripts.
+# The tree is stored as parent, rank and Euler tour (entry/exit) arrays indexed by node, so that ancestor/descendant tests are O(1) comparisons and can be vectorised over whole reports.
+# The arrays are cached alongside the taxdump by get_dbs.py --taxonomy_cache, pipeline tasks only read that cache and otherwise build (and cache) the arrays in their working directory.
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import os
+import zipfile
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+###### Constants
+
+CACHE_NAME = 'taxonomy_arrays.npz'
+CACHE_VERSION = 1
+
+
+###### Functions
+
+# Read the taxid, parent taxid and rank columns of nodes.dmp
+def read_nodes(nodes_dmp):
+	nodes = pd.read_csv(nodes_dmp, sep='|', header=None, usecols=[0, 1, 2], names=['taxid', 'parent', 'rank'], dtype={'taxid': np.int64, 'parent': np.int64, 'rank': str})
+	nodes['rank'] = nodes['rank'].str.strip()
+	return(nodes)
+
+
+# Read the old to new taxid pairs of merged.dmp (optional in a taxdump)
+def read_merged(merged_dmp):
+	if not os.path.exists(merged_dmp):
+		return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+	merged = pd.read_csv(merged_dmp, sep='|', header=None, usecols=[0, 1], names=['old', 'new'], dtype=np.int64)
+	return merged['old'].to_numpy(), merged['new'].to_numpy()
+
+
+# Find the depth of each node by following parents up to the roots, one vectorised step per tree level
+def node_depths(parent):
+	depth = np.zeros(len(parent), dtype=np.int32)
+	current = np.arange(len(parent))
+	while True:
+		moving = parent[current] != current
+		if not moving.any():
+			return depth
+		depth += moving
+		current = parent[current]
+
+
+# Number the nodes in depth first order, a node's descendants are the nodes with entry times in [entry, exit)
+# Subtree sizes are summed bottom up and entry times assigned top down, one tree level at a time
+def euler_tour(parent):
+	n_nodes = len(parent)
+	depth = node_depths(parent)
+	levels = [np.flatnonzero(depth == level) for level in range(int(depth.max()) + 1)] if n_nodes else []
+
+	size = np.ones(n_nodes, dtype=np.int64)
+	for nodes in reversed(levels[1:]):
+		np.add.at(size, parent[nodes], size[nodes])
+
+	entry = np.zeros(n_nodes, dtype=np.int64)
+	roots = levels[0] if levels else np.zeros(0, dtype=np.int64)
+	entry[roots] = np.cumsum(size[roots]) - size[roots]
+	for nodes in levels[1:]:
+		nodes = nodes[np.argsort(parent[nodes], kind='stable')]
+		offsets = np.cumsum(size[nodes]) - size[nodes]
+		group_start = np.r_[True, parent[nodes][1:] != parent[nodes][:-1]]
+		offsets -= np.maximum.accumulate(np.where(group_start, offsets, 0))
+		entry[nodes] = entry[parent[nodes]] + 1 + offsets
+	return entry.astype(np.int32), (entry + size).astype(np.int32)
+
+
+# Build the taxonomy arrays from a taxdump directory
+def build_taxonomy(taxdump_dir):
+	nodes = read_nodes(os.path.join(taxdump_dir, 'nodes.dmp')).sort_values('taxid', ignore_index=True)
+	taxids = nodes['taxid'].to_numpy()
+	parent = np.searchsorted(taxids, nodes['parent'].to_numpy())
+	parent[(parent >= len(taxids)) | (taxids[np.minimum(parent, len(taxids) - 1)] != nodes['parent'].to_numpy())] = -1
+	parent = np.where(parent < 0, np.arange(len(taxids)), parent) # Nodes with a missing parent are treated as roots
+	entry, exit = euler_tour(parent)
+	rank_codes, rank_names = pd.factorize(nodes['rank'])
+	merged_old, merged_new = read_merged(os.path.join(taxdump_dir, 'merged.dmp'))
+	return {
+		'version' : np.array(CACHE_VERSION),
+		'taxids' : taxids,
+		'parent' : parent.astype(np.int32),
+		'entry' : entry,
+		'exit' : exit,
+		'rank' : rank_codes.astype(np.int16),
+		'rank_names' : np.array(rank_names, dtype=str),
+		'merged_old' : merged_old,
+		'merged_new' : merged_new,
+	}
+
+
+# Write the taxonomy arrays of a taxdump directory to a cache in a directory, through a unique temporary file so concurrent writers cannot corrupt it
+def write_taxonomy_cache(taxonomy, cache_dir):
+	cache = os.path.join(cache_dir, CACHE_NAME)
+	fd, tmp_cache = tempfile.mkstemp(dir=cache_dir, prefix=CACHE_NAME + '.', suffix='.tmp')
+	try:
+		with os.fdopen(fd, 'wb') as cache_out:
+			np.savez(cache_out, **taxonomy)
+		os.chmod(tmp_cache, 0o644)
+		os.replace(tmp_cache, cache)
+	except BaseException:
+		os.remove(tmp_cache)
+		raise
+	return(cache)
+
+
+# Build the taxonomy cache alongside a taxdump directory (run once, by get_dbs.py)
+def build_taxonomy_cache(taxdump_dir):
+	return(write_taxonomy_cache(build_taxonomy(taxdump_dir), taxdump_dir))
+
+
+# Load a taxonomy cache, or None if it is missing, older than nodes.dmp, from another cache version or unreadable
+def read_taxonomy_cache(cache, nodes_mtime):
+	if not os.path.exists(cache) or os.path.getmtime(cache) < nodes_mtime:
+		return None
+	try:
+		with np.load(cache) as cached:
+			if int(cached['version']) != CACHE_VERSION:
+				return None
+			return {key: cached[key] for key in cached.files}
+	except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+		print(f"Warning: could not read the taxonomy cache {cache} ({e}), rebuilding it")
+		return None
+
+
+# Load the cached taxonomy arrays for a taxdump directory (built by get_dbs.py --taxonomy_cache)
+# If the cache is missing, stale or unreadable, the arrays are built and cached in the working directory, never written into the shared taxdump directory
+def load_taxonomy(taxdump_dir):
+	nodes_mtime = os.path.getmtime(os.path.join(taxdump_dir, 'nodes.dmp'))
+	for cache in [os.path.join(taxdump_dir, CACHE_NAME), CACHE_NAME]:
+		taxonomy = read_taxonomy_cache(cache, nodes_mtime)
+		if taxonomy is not None:
+			return(taxonomy)
+
+	taxonomy = build_taxonomy(taxdump_dir)
+	try:
+		write_taxonomy_cache(taxonomy, os.getcwd())
+	except OSError as e:
+		print(f"Warning: could not cache the taxonomy arrays in the working directory ({e})")
+	return(taxonomy)
+
+
+# Map taxids to node indices, following merged taxids, taxids missing from the taxonomy are -1
+def node_index(taxonomy, taxids):
+	taxids = np.asarray(taxids, dtype=np.int64)
+	merged = np.searchsorted(taxonomy['merged_old'], taxids)
+	merged = np.minimum(merged, max(len(taxonomy['merged_old']) - 1, 0))
+	if len(taxonomy['merged_old']):
+		is_merged = taxonomy['merged_old'][merged] == taxids
+		taxids = np.where(is_merged, taxonomy['merged_new'][merged], taxids)
+	index = np.minimum(np.searchsorted(taxonomy['taxids'], taxids), len(taxonomy['taxids']) - 1)
+	return np.where(taxonomy['taxids'][index] == taxids, index, -1)
+
+
+# Pair each ancestor taxid with every descendant taxid (including itself), returning (ancestor position, descendant position) arrays
+# Taxids missing from the taxonomy only pair with an identical taxid
+def descendant_pairs(taxonomy, ancestor_taxids, descendant_taxids):
+	ancestor_index = node_index(taxonomy, ancestor_taxids)
+	descendant_index = node_index(taxonomy, descendant_taxids)
+	ancestor_entry = np.where(ancestor_index >= 0, taxonomy['entry'][ancestor_index], -1)
+	ancestor_exit = np.where(ancestor_index >= 0, taxonomy['exit'][ancestor_index], -1)
+	descendant_entry = np.where(descendant_index >= 0, taxonomy['entry'][descendant_index], -2)
+
+	contains = (ancestor_entry[:, None] <= descendant_entry[None, :]) & (descendant_entry[None, :] < ancestor_exit[:, None])
+	contains |= np.asarray(ancestor_taxids, dtype=np.int64)[:, None] == np.asarray(descendant_taxids, dtype=np.int64)[None, :]
+	return np.nonzero(contains)
+
+
+# Sum values over the clade of each given taxid (the taxid and all its descendants), using prefix sums over the rows ordered by Euler tour entry
+# Clades missing from the taxonomy only sum rows with an identical taxid
+def clade_totals(taxonomy, clade_taxids, taxids, values):
+	taxids = np.asarray(taxids, dtype=np.int64)
+	clade_taxids = np.asarray(clade_taxids, dtype=np.int64)
+	values = np.asarray(values)
+	index = node_index(taxonomy, taxids)
+	present = index >= 0
+	entries = taxonomy['entry'][index[present]]
+	order = np.argsort(entries, kind='stable')
+	sorted_entries = entries[order]
+	cumulative = np.r_[0, np.cumsum(values[present][order])]
+
+	clade_index = node_index(taxonomy, clade_taxids)
+	start = np.searchsorted(sorted_entries, taxonomy['entry'][clade_index])
+	end = np.searchsorted(sorted_entries, taxonomy['exit'][clade_index])
+	totals = cumulative[end] - cumulative[start]
+
+	missing = clade_index < 0
+	if missing.any():
+		direct = pd.Series(values).groupby(taxids).sum()
+		totals[missing] = direct.reindex(clade_taxids[missing]).fillna(0).to_numpy().astype(totals.dtype)
+	return(totals)
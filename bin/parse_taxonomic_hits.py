@@ -8,22 +8,40 @@ __author__ = 'D.J.BERGER'
 
 
 ###### Imports
+import os
+import sys
 import pandas as pd
-import numpy as np
 import argparse
+from gtdb_lineage import add_lineage_columns
+from gtdb_metadata import load_lineages
+from ncbi_taxonomy import load_taxonomy, descendant_pairs
 
 
 ###### Functions
 
-# Process Kraken2 or Centrifuger hits
-def process_hits(taxhits, target_list, min_reads, min_frac):
-	taxhits_tbl = pd.read_csv(taxhits, delimiter='\t')
+# Read the list of target species, shared by all reports in a batch
+def read_targets(target_list):
 	targets_tbl = pd.read_csv(target_list, delimiter='\t', header=None)
 	targets_tbl.columns = ['Species', 'taxonomy_id', 'Kingdom', 'Rank']
-	targets_tbl.dropna(subset=["taxonomy_id"], inplace=True)
+	return(targets_tbl)
+
+
+# Process Kraken2 or Centrifuger hits
+# With a taxonomy, hits at any descendant taxid (e.g. strains or subspecies) are rolled up into the target they belong to, otherwise taxids must match exactly
+def process_hits(taxhits, targets_tbl, min_reads, min_frac, taxonomy=None):
+	taxhits_tbl = pd.read_csv(taxhits, delimiter='\t')
+	targets_tbl = targets_tbl.dropna(subset=["taxonomy_id"])
 	targets_tbl = targets_tbl.drop_duplicates(subset='taxonomy_id', keep='first')
 
-	merged_taxhits = pd.merge(taxhits_tbl, targets_tbl, on=['taxonomy_id'])
+	if taxonomy is not None:
+		target_pos, hit_pos = descendant_pairs(taxonomy, targets_tbl['taxonomy_id'].to_numpy(), taxhits_tbl['taxonomy_id'].to_numpy())
+		rollup = taxhits_tbl.iloc[hit_pos][['new_est_reads', 'fraction_total_reads']].reset_index(drop=True)
+		rollup['taxonomy_id'] = targets_tbl['taxonomy_id'].to_numpy()[target_pos]
+		rollup = rollup.groupby('taxonomy_id', as_index=False, sort=False).sum()
+		merged_taxhits = pd.merge(rollup, targets_tbl, on=['taxonomy_id'])
+		merged_taxhits['name'] = merged_taxhits['Species']
+	else:
+		merged_taxhits = pd.merge(taxhits_tbl, targets_tbl, on=['taxonomy_id'])
 
 	merged_taxhits_x = merged_taxhits[['Species', 'Rank', 'Kingdom', 'taxonomy_id', 'name','new_est_reads', 'fraction_total_reads']]
 
@@ -38,34 +56,19 @@ def process_hits(taxhits, target_list, min_reads, min_frac):
 	return merged_union
 
 
-def process_sylph(taxhits, target_list, gtdbtk_fn, min_frac):
-	syl_fn_df = pd.read_csv(gtdbtk_fn, compression='gzip', sep='\t', header=None)
-	syl_fn_df.columns = ['Genome_file_1','tax']
-
-	targets_tbl = pd.read_csv(target_list, delimiter='\t', header=None)
-	targets_tbl.columns = ['Species', 'taxonomy_id', 'Kingdom', 'Rank']
-
+# Read Sylph hits above the minimum abundance, with the GTDB accession of each reference genome
+def read_sylph(taxhits, min_frac):
 	syl = pd.read_csv(taxhits, delimiter='\t')
 	syl['Genome_file_1'] = syl['Genome_file'].str.split('/').str[-1].str.split("_").str[0:2].apply('_'.join)
 
 	syl = syl[(syl['Taxonomic_abundance'] > (min_frac*100))]
+	return(syl)
+
 
+# Process Sylph hits, lineages are looked up once for all reports in a batch (see load_lineages)
+def process_sylph(syl, targets_tbl, syl_fn_df):
 	syl_merge = pd.merge(syl,syl_fn_df,on=['Genome_file_1'], how = 'left')
-	syl_merge['Species1'] = syl_merge['tax'].str.replace(r'd__;p__;o__;f__;g__;s__$', '', regex=True).str.replace(r';p__;o__;f__;g__;s__$', '', regex=True).str.replace(r';c__;o__;f__;g__;s__$', '', regex=True).str.replace(r';o__;f__;g__;s__$', '', regex=True).str.replace(r';f__;g__;s__$', '', regex=True).str.replace(r';g__;s__$', '', regex=True).str.replace(r';s__$', '', regex=True).str.split(';').str[-1]
-
-	syl_merge['rank'] = np.select(
-		[syl_merge['Species1'].str.contains('s__'),
-		syl_merge['Species1'].str.contains('g__'),
-		syl_merge['Species1'].str.contains('f__'),
-		syl_merge['Species1'].str.contains('o__'),
-		syl_merge['Species1'].str.contains('c__'),
-		syl_merge['Species1'].str.contains('p__'),
-		syl_merge['Species1'].str.contains('d__'),
-		syl_merge['Species1'].str.contains('Unclassified')],
-		['Species', 'Genus','Family','Order','Class','Phylum','Domain','Unclassified'],
-		default=np.nan,
-	)
-	syl_merge['Species'] = syl_merge['Species1'].str.replace('s__', '').str.replace('g__', '').str.replace('f__', '').str.replace('o__', '').str.replace('c__', '').str.replace('p__', '').str.replace('d__', '')
+	syl_merge = add_lineage_columns(syl_merge, 'tax', 'Species')
 	syl_merge = syl_merge[["Taxonomic_abundance", "Sequence_abundance","Species"]]
 
 	syl_merged_taxhits = pd.merge(syl_merge, targets_tbl, on=['Species'])
@@ -81,6 +84,8 @@ def process_sylph(taxhits, target_list, gtdbtk_fn, min_frac):
 def write_hits_to_file(taxhits, merged_union, output):
 	tool = taxhits.split(".")[-2]
 	output_file = output + '.' + tool + '.target_species.tsv'
+	if os.path.dirname(output_file):
+		os.makedirs(os.path.dirname(output_file), exist_ok=True)
 	merged_union.to_csv(output_file, sep='\t', index=False)
 
 
@@ -88,13 +93,14 @@ def write_hits_to_file(taxhits, merged_union, output):
 def parse_args():
 	description = 'Filter Kraken2, Centrifuger or Sylph results against a database of target species. Version: %s, Date: %s, Author: %s' % (__version__, __date__, __author__)
 	parser = argparse.ArgumentParser(description=description)
-	parser.add_argument('--taxhits', required=True, help="Results from profiling tool (Either Kraken2 or Centrifuger)")
-	parser.add_argument('--output', required=True, help="Output TSV name")
+	parser.add_argument('--taxhits', required=True, nargs='+', help="Results from profiling tool (Either Kraken2 or Centrifuger), several reports can be given to process a batch of samples")
+	parser.add_argument('--output', required=True, nargs='+', help="Output TSV name, one per --taxhits report")
 	parser.add_argument('--targets', required=True, help="List of target species")
 	parser.add_argument('--min_reads', required=True, help="Minimum read count to include hit")
 	parser.add_argument('--min_frac', required=True, type=float, help="Minimum read fraction to include hit")
 	parser.add_argument('--mode', required=True, help="Determines how input is processed [Bracken|Sylph]")
-	parser.add_argument('--gtdb_fn', type=str, required=False, help='Path to gtdb_*_metadata.tsv.gz file')
+	parser.add_argument('--gtdb_fn', type=str, required=False, help='Path to gtdb_*_metadata.tsv.gz file or its SQLite index (get_dbs.py --gtdb_metadata_index)')
+	parser.add_argument('--taxdump', type=str, required=False, help='NCBI taxdump directory (nodes.dmp, merged.dmp), used to roll up hits at descendant taxids into their target')
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return(parser.parse_args())
@@ -104,13 +110,33 @@ def parse_args():
 def main():
 	args = parse_args()
 
+	if len(args.taxhits) != len(args.output):
+		sys.exit("--taxhits and --output must be given the same number of values")
+
 	if args.mode == "Bracken":
-		merged_union = process_hits(args.taxhits, args.targets, args.min_reads, args.min_frac)
-		write_hits_to_file(args.taxhits, merged_union, args.output)
+		targets_tbl = read_targets(args.targets)
+		taxonomy = load_taxonomy(args.taxdump) if args.taxdump else None
+		for taxhits, output in zip(args.taxhits, args.output):
+			try:
+				merged_union = process_hits(taxhits, targets_tbl, args.min_reads, args.min_frac, taxonomy)
+				write_hits_to_file(taxhits, merged_union, output)
+			except Exception as e:
+				print(f"Warning: Unable to process {taxhits}: {e}")
 
 	elif args.mode == "Sylph" and args.gtdb_fn:
-		syl_merged = process_sylph(args.taxhits, args.targets, args.gtdb_fn, args.min_frac)
-		write_hits_to_file(args.taxhits, syl_merged, args.output)
+		targets_tbl = read_targets(args.targets)
+		reports = {}
+		for taxhits in args.taxhits:
+			try:
+				reports[taxhits] = read_sylph(taxhits, args.min_frac)
+			except Exception as e:
+				print(f"Warning: Unable to process {taxhits}: {e}")
+		accessions = pd.concat([syl['Genome_file_1'] for syl in reports.values()]) if reports else []
+		syl_fn_df = load_lineages(args.gtdb_fn, accessions)
+		for taxhits, output in zip(args.taxhits, args.output):
+			if taxhits in reports:
+				syl_merged = process_sylph(reports[taxhits], targets_tbl, syl_fn_df)
+				write_hits_to_file(taxhits, syl_merged, output)
 
 	elif args.mode == "Sylph" and not args.gtdb_fn:
 		print("--mode Sylph specific but gtdb_*_metadata.tsv.gz was not provided, please specify using the --gtdb_fn parameter")
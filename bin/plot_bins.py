@@ -15,13 +15,56 @@ import pandas as pd
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
-import plotly.express as px
+import plotly.graph_objects as go
 import argparse
 from jinja2 import Environment, FileSystemLoader
 from io import BytesIO
-import plotly.io as pio
+from PIL import Image
 import os
+from stats_sidecar import load_sidecar, find_entry, load_array
+from gtdb_lineage import add_lineage_columns
+from gtdb_metadata import load_lineages
+from report_assets import figure_div, plotlyjs_tag, PLOTLYJS_HELP
+
+
+###### Constants
+
+FIGURE_DPI = 100 # Resolution of the static assembly QC figure (1300 x 800 px at the default figure size)
+IMAGE_FORMATS = ['png', 'webp'] # 256 colour palette PNG or lossless WebP
+PALETTE_COLORS = 256
+BIN_COLORS = ["#ff4a24","#19D3F3","#F58518","#e60019","#006fdf","#FECB52","#636EFA","#80ba5a","#b596ed","#009b3b","#bc80bd","#882255","#117733","#88ccee","#ff0b6e","#00d395","#f2b701","#999933","#E45756","#332288","#cf1c90","#FFA15A","#ccebc5","#80b1d3","#FF9DA6","#002b90","#008695","#11a579","#3969ac","#44aa99","#54A24B","#72B7B2","#7f3c8d","#9D755D","#aa4499","#AB63FA","#B279A2","#b3de69","#B6E880","#bebada","#c44a86","#cc6677","#ddcc77","#de57ff","#e59800","#e68310","#e73f74","#EECA3B","#EF553B","#fb8072","#fccde5","#FF6692","#FF97FF"]
+SIZE_MAX = 40 # Marker diameter (px) of the longest contig
+WEBGL_THRESHOLD = 1000 # Contigs above which the contig scatter is drawn with WebGL (scattergl), as plotly express does
+CONTIG_HOVER = [
+	"<b>Contig name</b>: %{hovertext}",
+	"<b>Length </b>: %{customdata[0]:.1f} kbp",
+	"<b>GC</b>: %{customdata[1]:.1f}%",
+	"<b>Mean depth</b>: %{customdata[3]:.1f}",
+	"<b>Contig coverage</b>: %{customdata[2]:.1f}%",
+	"%{text}",
+	"<b>--</b>",
+]
+
+# Expands the contig taxonomy codes (customdata[6]) through the lookup table in layout.meta, and formats contig ANI and plasmid scores (N/A if missing), into the hover text of each point
+# customdata is read from the figure data as sent, a float32 typed array ({dtype, bdata, shape}) or (from older plotly.py versions) nested lists
+CONTIG_HOVER_JS = """
+var gd = document.getElementById('{plot_id}');
+var taxonomy = gd.layout.meta.contig_taxonomy;
+var value = function(v) { return isNaN(v) ? 'N/A' : String(Number(v.toPrecision(6))); };
+var rows = function(customdata) {
+	if (!customdata || !customdata.bdata) return customdata || [];
+	var bytes = Uint8Array.from(atob(customdata.bdata), function(c) { return c.charCodeAt(0); });
+	var values = new Float32Array(bytes.buffer);
+	var width = Number(String(customdata.shape).split(',')[1]);
+	return Array.from({length: values.length / width}, function(_, i) { return values.subarray(i * width, (i + 1) * width); });
+};
+Plotly.restyle(gd, {text: gd.data.map(function(trace) {
+	return Array.from(rows(trace.customdata), function(row) {
+		return '<b>Contig taxonomy (rank)</b>: <i>' + taxonomy[row[6]][0] + '</i> (' + taxonomy[row[6]][1] + ')<br><b>Contig average nucleotide identity</b>: ' + value(row[4]) + '%<br><b>Plasmid score</b>: ' + value(row[5]);
+	});
+})});
+"""
+
 
 ###### Functions
 
@@ -42,75 +85,17 @@ def process_metadata(sample_id, run_id, barcode, sample_type, logo):
 def process_bintax(bin_tax):
 	bin_tax= pd.read_csv(bin_tax, sep='\t')
 	bin_tax['Bin'] = bin_tax['user_genome'].str.split('.').str[1]
-	bin_tax['Species1'] = bin_tax['classification'].str.replace(
-		r'd__;p__;o__;f__;g__;s__$', '', regex=True).str.replace(
-			r';p__;o__;f__;g__;s__$', '', regex=True).str.replace(
-				r';c__;o__;f__;g__;s__$', '', regex=True).str.replace(
-					r';o__;f__;g__;s__$', '', regex=True).str.replace(
-						r';f__;g__;s__$', '', regex=True).str.replace(
-							r';g__;s__$', '', regex=True).str.replace(
-								r';s__$', '', regex=True).str.split(';').str[-1]
-
-	bin_tax['rank'] = np.select(
-		[bin_tax['Species1'].str.contains('s__'),
-		bin_tax['Species1'].str.contains('g__'),
-		bin_tax['Species1'].str.contains('f__'),
-		bin_tax['Species1'].str.contains('o__'),
-		bin_tax['Species1'].str.contains('c__'),
-		bin_tax['Species1'].str.contains('p__'),
-		bin_tax['Species1'].str.contains('d__'),
-		bin_tax['Species1'].str.contains('Unclassified')],
-		['Species', 'Genus','Family','Order','Class','Phylum','Domain','Unclassified'],
-		default=np.nan,
-	)
-
-	bin_tax['Species2'] = bin_tax['Species1'].str.replace(
-		's__', '').str.replace(
-			'g__', '').str.replace(
-				'f__', '').str.replace(
-					'o__', '').str.replace(
-						'c__', '').str.replace(
-							'p__', '').str.replace(
-								'd__', '')
+	bin_tax = add_lineage_columns(bin_tax, 'classification', 'Species2')
 	return(bin_tax)
 
 
 def process_skani(skani, gtdb_fn):
 	skani_contigs = pd.read_csv(skani, delimiter='\t')
-	gtdb_fn_df = pd.read_csv(gtdb_fn, compression='gzip', sep='\t', header=None)
-	gtdb_fn_df.columns = ['Genome_file_1','tax']
-
 	skani_contigs['Genome_file_1'] = skani_contigs['Ref_file'].str.split('/').str[-1].str.split("_").str[0:2].apply('_'.join)
+	gtdb_fn_df = load_lineages(gtdb_fn, skani_contigs['Genome_file_1'])
 	skani_contigs_merge = pd.merge(skani_contigs, gtdb_fn_df,on=['Genome_file_1'], how = 'left')
 
-	skani_contigs_merge['Species1'] = skani_contigs_merge['tax'].str.replace(
-		r'd__;p__;o__;f__;g__;s__$', '', regex=True).str.replace(
-			r';p__;o__;f__;g__;s__$', '', regex=True).str.replace(
-				r';c__;o__;f__;g__;s__$', '', regex=True).str.replace(
-					r';o__;f__;g__;s__$', '', regex=True).str.replace(
-						r';f__;g__;s__$', '', regex=True).str.replace(
-							r';g__;s__$', '', regex=True).str.replace(
-								r';s__$', '', regex=True).str.split(';').str[-1]
-
-
-	skani_contigs_merge['rank'] = np.select(
-		[skani_contigs_merge['Species1'].str.contains('s__'),
-		skani_contigs_merge['Species1'].str.contains('g__'),
-		skani_contigs_merge['Species1'].str.contains('f__'),
-		skani_contigs_merge['Species1'].str.contains('o__'),
-		skani_contigs_merge['Species1'].str.contains('c__'),
-		skani_contigs_merge['Species1'].str.contains('p__'),
-		skani_contigs_merge['Species1'].str.contains('d__'),
-		skani_contigs_merge['Species1'].str.contains('Unclassified')],
-		['Species', 'Genus','Family','Order','Class','Phylum','Domain','Unclassified'], default=np.nan)
-
-	skani_contigs_merge['Species2'] = skani_contigs_merge['Species1'].str.replace(
-		's__', '').str.replace(
-			'g__', '').str.replace(
-				'f__', '').str.replace(
-					'o__', '').str.replace(
-						'c__', '').str.replace(
-							'p__', '').str.replace('d__', '')
+	skani_contigs_merge = add_lineage_columns(skani_contigs_merge, 'tax', 'Species2')
 
 	skani_contigs_merge2 = skani_contigs_merge.groupby("Query_name").first()
 	skani_contigs_merge2 = skani_contigs_merge2.reset_index()
@@ -141,12 +126,35 @@ def process_checkm(checkm_metrics):
 	return(checkm)
 
 
-def merge_stats(asm_metrics, fstat_metrics, cov_metrics, plasmid_metrics, bintax_metrics, skani_metrics, checkm_metrics):
+# Per-contig length, GC and N counts from the complete assembly entry of the assembly stats sidecar (matches seqkit fx2tab -ngl -C N)
+def process_sidecar_fstats(asm_sidecar):
+	sidecar = load_sidecar(asm_sidecar)
+	entry = find_entry(sidecar, 'complete_assembly')
+	if entry is None:
+		raise ValueError(f"No complete assembly entry found in {asm_sidecar}")
+
+	lengths = np.frombuffer(load_array(sidecar, entry, 'lengths'), dtype=np.uint64).astype(np.int64)
+	gc_counts = np.frombuffer(load_array(sidecar, entry, 'gc_counts'), dtype=np.uint64).astype(np.int64)
+	n_counts = np.frombuffer(load_array(sidecar, entry, 'n_counts'), dtype=np.uint64).astype(np.int64)
+	fstats = pd.DataFrame({
+		'name' : entry['names'],
+		'len' : lengths,
+		'GC' : np.round(np.divide(gc_counts * 100, lengths, out=np.zeros(len(lengths)), where=lengths > 0), 2),
+		'N_count' : n_counts,
+	})
+
+	return(fstats)
+
+
+def merge_stats(asm_metrics, fstat_metrics, cov_metrics, plasmid_metrics, bintax_metrics, skani_metrics, checkm_metrics, asm_sidecar=None):
 	asm_stats = pd.read_csv(asm_metrics)
 	asm_stats.columns = ['sampleid','Bin','assembly_length_bp','scaffold_count','scaffold_N50_bp','scaffold_N90_bp','contig_count','contig_N50_bp','contig_N90_bp','GC_perc','gaps_count','gaps_sum_bp','gaps_perc']
 
-	fstats = pd.read_csv(fstat_metrics, sep='\t', header=None)
-	fstats.columns = ['name','len','GC','N_count']
+	if asm_sidecar:
+		fstats = process_sidecar_fstats(asm_sidecar)
+	else:
+		fstats = pd.read_csv(fstat_metrics, sep='\t', header=None)
+		fstats.columns = ['name','len','GC','N_count']
 
 	cov = pd.read_csv(cov_metrics, sep='\t')
 	cov.columns = ['name','startpos','endpos','numreads','covbases','coverage','meandepth','meanbaseq','meanmapq']
@@ -181,70 +189,69 @@ def merge_stats(asm_metrics, fstat_metrics, cov_metrics, plasmid_metrics, bintax
 	return(m7, m8, asm_stats)
 
 
-def plot_bins(mq_out, output):
-	bin_dist = px.scatter(mq_out,
-			x='GC',
-			y='meandepth',
-			opacity=.75,
-			size='len',
-			log_y=True,
-			size_max=40,
-			color="Bin2",
-			color_discrete_sequence=["#ff4a24","#19D3F3","#F58518","#e60019","#006fdf","#FECB52","#636EFA","#80ba5a","#b596ed","#009b3b","#bc80bd","#882255","#117733","#88ccee","#ff0b6e","#00d395","#f2b701","#999933","#E45756","#332288","#cf1c90","#FFA15A","#ccebc5","#80b1d3","#FF9DA6","#002b90","#008695","#11a579","#3969ac","#44aa99","#54A24B","#72B7B2","#7f3c8d","#9D755D","#aa4499","#AB63FA","#B279A2","#b3de69","#B6E880","#bebada","#c44a86","#cc6677","#ddcc77","#de57ff","#e59800","#e68310","#e73f74","#EECA3B","#EF553B","#fb8072","#fccde5","#FF6692","#FF97FF"],
-			custom_data=['name_y', 'rlen', 'rGC','rcoverage','rmeandepth',
-							'Bin2','Species2','rank','bin_qual','closest_genome_ani',
-							'Completeness','Contamination','Strain heterogeneity','contig_species3',
-						'contig_rank2','contig_ANI2','contig_align_fraction_ref','contig_align_fraction_query', 'plasmid_score'],
-			)
-
-	for t in bin_dist.data:
-		bin_dist.update_traces(marker={"color": ("lightgrey")},selector={"name":"Unbinned"})
-
-	bin_dist.for_each_trace(lambda t: t.update(marker_line_color = t.marker.color, opacity=1))
-
-	bin_dist.for_each_trace(lambda t: t.update(name = '<b>' + t.name +'</b>' + " (" + '<i>' + f"{t.customdata[0][6]}" + '</i>' + ")"))
-
-	bin_dist.for_each_trace(lambda t: t.update(name = '<b>' + "Unbinned" +'</b>'), 	selector=dict(name = "<b>Unbinned</b> (<i>N/A</i>)"))
-
-	bin_dist.update_traces(
-		hovertemplate="<br>".join([
-			"<b>Contig name</b>: %{customdata[0]}",
-			"<b>Length </b>: %{customdata[1]} kbp",
-			"<b>GC</b>: %{customdata[2]}%",
-			"<b>Mean depth</b>: %{customdata[4]}",
-			"<b>Contig coverage</b>: %{customdata[3]}%",
-			"<b>Contig taxonomy (rank)</b>: <i>%{customdata[13]}</i> (%{customdata[14]})",
-			"<b>Contig average nucleotide identity</b>: %{customdata[15]}%",
-			"<b>Plasmid score</b>: %{customdata[18]}",
-			"<b>--</b>",
-			"<b>Assigned bin</b>: %{customdata[5]}",
-			"<b>Assigned taxonomy (rank)</b>: <i>%{customdata[6]}</i> (%{customdata[7]})",
-			"<b>Average nucleotide identity</b>: %{customdata[9]}%",
-			"<b>Completeness</b>: %{customdata[10]}% (%{customdata[8]})",
-			"<b>Contamination (Strain heterogenity)</b>: %{customdata[11]}% (%{customdata[12]})",
-		] )+"<extra></extra>"
-	)
-
-	bin_dist.update_traces(selector={"name":"<b>Unbinned</b>"},
-		hovertemplate="<br>".join([
-			"<b>Contig name</b>: %{customdata[0]}",
-			"<b>Length </b>: %{customdata[1]} kbp",
-			"<b>GC</b>: %{customdata[2]}%",
-			"<b>Mean depth</b>: %{customdata[4]}",
-			"<b>Contig coverage</b>: %{customdata[3]}%",
-			"<b>Contig taxonomy (rank)</b>: <i>%{customdata[13]}</i> (%{customdata[14]})",
-			"<b>Contig average nucleotide identity</b>: %{customdata[15]}%",
-			"<b>Plasmid score</b>: %{customdata[18]}",
-			"<b>--</b>",
-			"<b>Assigned bin</b>: Unbinned",
-		] )+"<extra></extra>"
-	)
+# Get a column as float32, with missing values ('N/A') as NaN
+def numeric_column(df, column):
+	return(pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float32))
+
+
+# Plot contig GC against mean depth (sized by length), one trace per bin
+# Per-contig numbers are sent as binary typed arrays, bin-level hover fields once per trace in its hovertemplate and contig taxonomies once as a lookup table (layout.meta) expanded in the browser by CONTIG_HOVER_JS
+def plot_bins(mq_out, output, webgl_threshold=WEBGL_THRESHOLD):
+	taxonomy_codes, taxonomy_lookup = pd.factorize(pd.MultiIndex.from_arrays([mq_out['contig_species3'].astype(str), mq_out['contig_rank2'].astype(str)]))
+	customdata = np.column_stack([
+		numeric_column(mq_out, 'rlen'),
+		numeric_column(mq_out, 'rGC'),
+		numeric_column(mq_out, 'rcoverage'),
+		numeric_column(mq_out, 'rmeandepth'),
+		numeric_column(mq_out, 'contig_ANI2'),
+		numeric_column(mq_out, 'plasmid_score'),
+		taxonomy_codes,
+	]).astype(np.float32)
+	gc = numeric_column(mq_out, 'GC')
+	meandepth = numeric_column(mq_out, 'meandepth')
+	length = numeric_column(mq_out, 'len')
+	names = mq_out['name_y'].astype(str).to_numpy()
+	bins = mq_out['Bin2'].astype(str).to_numpy()
+
+	scatter = go.Scattergl if len(mq_out) > webgl_threshold else go.Scatter
+	sizeref = 2 * np.nanmax(length) / SIZE_MAX ** 2 if np.isfinite(length).any() else 1
+	bin_dist = go.Figure()
+	for index, bin_name in enumerate(pd.unique(bins)):
+		rows = np.flatnonzero(bins == bin_name)
+		first = mq_out.iloc[rows[0]]
+		if bin_name == "Unbinned":
+			color = "lightgrey"
+			name = '<b>Unbinned</b>'
+			hover = CONTIG_HOVER + ["<b>Assigned bin</b>: Unbinned"]
+		else:
+			color = BIN_COLORS[index % len(BIN_COLORS)]
+			name = f"<b>{bin_name}</b> (<i>{first['Species2']}</i>)"
+			hover = CONTIG_HOVER + [
+				f"<b>Assigned bin</b>: {first['Bin2']}",
+				f"<b>Assigned taxonomy (rank)</b>: <i>{first['Species2']}</i> ({first['rank']})",
+				f"<b>Average nucleotide identity</b>: {first['closest_genome_ani']}%",
+				f"<b>Completeness</b>: {first['Completeness']}% ({first['bin_qual']})",
+				f"<b>Contamination (Strain heterogenity)</b>: {first['Contamination']}% ({first['Strain heterogeneity']})",
+			]
+
+		bin_dist.add_trace(scatter(
+			x=gc[rows],
+			y=meandepth[rows],
+			mode='markers',
+			name=name,
+			legendgroup=bin_name,
+			marker=dict(size=length[rows], sizemode='area', sizeref=sizeref, color=color, line=dict(color=color)),
+			customdata=customdata[rows],
+			hovertext=names[rows],
+			hovertemplate="<br>".join(hover) + "<extra></extra>",
+		))
 
 	bin_dist.update_xaxes(title_text = '<b> GC (%) </b>', showline=True, linewidth=1, linecolor='black')
-	bin_dist.update_yaxes(title_text ='<b> Log\u2081\u2080(mean coverage) </b>', showline=True, linewidth=1, linecolor='black')
-	bin_dist.update_layout(title_text='<b>'+output+'</b>', title_font=dict(size=20), plot_bgcolor='white', legend_title_text='<b>Assigned bin</b>', height=850, width=1500)
+	bin_dist.update_yaxes(title_text ='<b> Log\u2081\u2080(mean coverage) </b>', type='log', showline=True, linewidth=1, linecolor='black')
+	bin_dist.update_layout(title_text='<b>'+output+'</b>', title_font=dict(size=20), plot_bgcolor='white', legend_title_text='<b>Assigned bin</b>', legend_itemsizing='constant', height=850, width=1500)
+	bin_dist.update_layout(meta={'contig_taxonomy' : [list(taxon) for taxon in taxonomy_lookup]})
 
-	bin_dist_string = pio.to_html(bin_dist, full_html=False)
+	bin_dist_string = figure_div(bin_dist, CONTIG_HOVER_JS)
 	bin_dist_data = {
 		'bin_dist' : bin_dist_string,
 	}
@@ -268,57 +275,62 @@ def assembly_summary(m7):
 	return(m11, m10, roundedqual, roundedcont)
 
 
-def plot_assembly_summary(m10, roundedqual, roundedcont):
+# Plot bin completeness against contamination with per-quality marginal densities (laid out as a seaborn jointplot)
+def plot_assembly_summary(subfig, m10, roundedqual, roundedcont):
 	palette = {'High quality': '#7f58af',
 								'Medium quality': "#64c5eb",
 								'Partial assembly': "#e83d8a",
 								"QC fail": "#feb326"}
-	gfew = sns.jointplot(
-		data=m10,
-		x="Completeness",
-		alpha=.85,
-		hue="bin_qual",
-		palette=palette,
-		s=16,
-		y="Contamination",
-		hue_order = ['High quality', 'Medium quality', 'Partial assembly','QC fail'],
-		kind='scatter',
-		xlim = (roundedqual-2.5,100), ylim = (-1,roundedcont))
-
-	gfew.set_axis_labels("Completeness (%)","Contamination (%)", fontweight='bold')
-	gfew.figure.tight_layout()
-	gfew.ax_joint.legend(loc='upper left')
-
-	gfew.savefig('figaaa1.png', bbox_inches="tight", dpi=699)
-
-
-def plot_assembly_stats(m11, asm_stats):
-	gridspec = dict(height_ratios=[0.12,0.01, 0.025, 0.025, 0.025,0.025])
+	hue_order = ['High quality', 'Medium quality', 'Partial assembly','QC fail']
+	grid = subfig.add_gridspec(2, 2, width_ratios=(5, 1), height_ratios=(1, 5), wspace=0.05, hspace=0.05)
+	ax_joint = subfig.add_subplot(grid[1, 0])
+	ax_x = subfig.add_subplot(grid[0, 0], sharex=ax_joint)
+	ax_y = subfig.add_subplot(grid[1, 1], sharey=ax_joint)
+
+	sns.scatterplot(data=m10, x="Completeness", y="Contamination", hue="bin_qual", palette=palette, hue_order=hue_order, alpha=.85, s=16, rasterized=True, ax=ax_joint)
+	sns.kdeplot(data=m10, x="Completeness", hue="bin_qual", palette=palette, hue_order=hue_order, fill=True, legend=False, warn_singular=False, ax=ax_x)
+	sns.kdeplot(data=m10, y="Contamination", hue="bin_qual", palette=palette, hue_order=hue_order, fill=True, legend=False, warn_singular=False, ax=ax_y)
+
+	ax_joint.set_xlim(roundedqual-2.5, 100)
+	ax_joint.set_ylim(-1, roundedcont)
+	ax_joint.set_xlabel("Completeness (%)", fontweight='bold')
+	ax_joint.set_ylabel("Contamination (%)", fontweight='bold')
+	ax_joint.legend(loc='upper left')
+	ax_x.set(xlabel="", ylabel="", yticks=[])
+	ax_y.set(xlabel="", ylabel="", xticks=[])
+	ax_x.tick_params(labelbottom=False)
+	ax_y.tick_params(labelleft=False)
+	sns.despine(ax=ax_x, left=True)
+	sns.despine(ax=ax_y, bottom=True)
+
+
+def plot_assembly_stats(subfig, m11, asm_stats):
+	gridspec = dict(height_ratios=[0.12,0.01, 0.025, 0.025, 0.025,0.025], hspace=1)
 	palette = {'High quality': '#7f58af',
 								'Medium quality': "#64c5eb",
 								'Partial assembly': "#e83d8a",
 								"QC fail": "#feb326"}
-	fig, axs = plt.subplots(ncols=1, nrows=6, gridspec_kw=gridspec, figsize = (7, 13))
+	axs = subfig.subplots(ncols=1, nrows=6, gridspec_kw=gridspec)
 
-	qqq = sns.stripplot(x="contig_count", data=asm_stats, jitter = True, color="grey",alpha=.75, ax=axs[2])
+	qqq = sns.stripplot(x="contig_count", data=asm_stats, jitter = True, color="grey",alpha=.75, rasterized=True, ax=axs[2])
 	qqq = sns.boxplot(x="contig_count", data=asm_stats, showfliers=False, fill=False, color="black", ax=axs[2])
 	qqq.set_xlabel("Number of contigs", fontdict={'weight': 'bold'})
 	qqq.set_ylabel("")
 	qqq.tick_params(left=False)
 
-	qqq2 = sns.stripplot(x="contig_N50_bp", data=asm_stats, jitter = True, color="grey",alpha=.75, ax=axs[3])
+	qqq2 = sns.stripplot(x="contig_N50_bp", data=asm_stats, jitter = True, color="grey",alpha=.75, rasterized=True, ax=axs[3])
 	qqq2 = sns.boxplot(x="contig_N50_bp", data=asm_stats, showfliers=False, fill=False, color="black", ax=axs[3])
 	qqq2.set_xlabel(r'Contig N$\bf{_{50}}$ (Mb)', fontdict={'weight': 'bold'})
 	qqq2.set_ylabel("")
 	qqq2.tick_params(left=False)
 
-	qqq3 = sns.stripplot(x="assembly_length_bp", data=asm_stats, jitter = True, color="grey",alpha=.75, ax=axs[4])
+	qqq3 = sns.stripplot(x="assembly_length_bp", data=asm_stats, jitter = True, color="grey",alpha=.75, rasterized=True, ax=axs[4])
 	qqq3 = sns.boxplot(x="assembly_length_bp", data=asm_stats, showfliers=False, fill=False, color="black", ax=axs[4])
 	qqq3.set_xlabel("Assembly length (Mb)", fontdict={'weight': 'bold'})
 	qqq3.set_ylabel("")
 	qqq3.tick_params(left=False)
 
-	qqq4 = sns.stripplot(x="GC_perc", data=asm_stats, jitter = True, color="grey",alpha=.75, ax=axs[5])
+	qqq4 = sns.stripplot(x="GC_perc", data=asm_stats, jitter = True, color="grey",alpha=.75, rasterized=True, ax=axs[5])
 	qqq4 = sns.boxplot(x="GC_perc", data=asm_stats, showfliers=False, fill=False, color="black", ax=axs[5])
 	qqq4.set_xlabel("GC (%)", fontdict={'weight': 'bold'})
 	qqq4.tick_params(left=False)
@@ -335,34 +347,45 @@ def plot_assembly_stats(m11, asm_stats):
 	qqq0 = sns.barplot(y="counts",x="bin_qual", data=m11, hue="bin_qual", ax=axs[1])
 	axs[1].set_visible(False)
 
-	fig.subplots_adjust(hspace=1)
-	fig.savefig('figaaa.png', bbox_inches="tight")
-
-
-def merge_plots(m7, output):
 
-	f, axarr = plt.subplots(1, 2, figsize=(14, 7))
+# Render a figure at the given resolution, close it and encode it as a base64 palette PNG or lossless WebP
+# Plots only use a few flat colours (and the alpha blends of the KDE fills), so a 256 colour palette without dithering keeps them intact at a fraction of the RGBA size
+def figure_base64(fig, dpi=FIGURE_DPI, image_format='png'):
+	buffer = BytesIO()
+	fig.savefig(buffer, bbox_inches="tight", format="png", dpi=dpi)
+	plt.close(fig)
+	buffer.seek(0)
+	with Image.open(buffer) as image:
+		image = image.convert('RGB')
+	buffer.close()
 
-	axarr[0].imshow(mpimg.imread('figaaa1.png'))
-	axarr[1].imshow(mpimg.imread('figaaa.png'))
+	encoded = BytesIO()
+	if image_format == 'webp':
+		image.save(encoded, format='WEBP', lossless=True, method=6)
+	else:
+		image.quantize(colors=PALETTE_COLORS, dither=Image.Dither.NONE).save(encoded, format='PNG', optimize=True)
+	image_base64 = base64.b64encode(encoded.getvalue()).decode('utf-8')
+	encoded.close()
 
-	[ax.set_axis_off() for ax in axarr.ravel()]
+	return(image_base64)
 
-	plt.tight_layout()
 
-	buffer = BytesIO()
-	plt.savefig(buffer, bbox_inches="tight", format="png")
-	buffer.seek(0)
-	image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-	buffer.close()
+# Plot the bin quality summary and assembly statistics side by side in one figure
+def plot_assembly_figures(m10, m11, asm_stats, roundedqual, roundedcont, dpi=FIGURE_DPI, image_format='png'):
+	fig = plt.figure(figsize=(13, 8))
+	summary_subfig, stats_subfig = fig.subfigures(1, 2, width_ratios=[8, 5], wspace=0.05)
+	plot_assembly_summary(summary_subfig, m10, roundedqual, roundedcont)
+	plot_assembly_stats(stats_subfig, m11, asm_stats)
 
 	fig_data = {
-		'image_base64' : image_base64,
+		'image_base64' : figure_base64(fig, dpi, image_format),
+		'image_format' : image_format,
 	}
 
+	return(fig_data)
 
-	f.savefig('figaa2.png', bbox_inches="tight")
 
+def merge_plots(m7, output):
 	outstringtab = output + '.bin_summary.tsv'
 	outstringcontigtab = output + '.contig_summary.tsv'
 
@@ -395,7 +418,7 @@ def merge_plots(m7, output):
 
 	outcont_tab2_data = outcont_tab2.to_dict(orient='records')
 
-	return(binning_merged_data, fig_data, outcont_tab2_data)
+	return(binning_merged_data, outcont_tab2_data)
 
 
 def merge_ccvals(sample_data, bin_dist_data, binning_merged_data, fig_data, outcont_tab2_data):
@@ -411,8 +434,9 @@ def merge_ccvals(sample_data, bin_dist_data, binning_merged_data, fig_data, outc
 
 
 #
-def render_template(context, template, output):
+def render_template(context, template, output, plotlyjs='inline'):
 	template_dir = os.getcwd()
+	context['plotlyjs'] = plotlyjs_tag(plotlyjs, output + '.summary_binning_report.html')
 	env = Environment(loader=FileSystemLoader(template_dir))
 	template = env.get_template(template)
 
@@ -434,12 +458,13 @@ def parse_args():
 	parser = argparse.ArgumentParser(description=description)
 	parser.add_argument('--asm_stats', type=str, help='Path to assembly stats file', required=True)
 	parser.add_argument('--cov', type=str, help='Path to coverage file', required=True)
-	parser.add_argument('--fstats', type=str, help='Path to contig stats file', required=True)
+	parser.add_argument('--fstats', type=str, help='Path to contig stats file (seqkit fx2tab), not needed if --asm_sidecar is given', required=False)
+	parser.add_argument('--asm_sidecar', type=str, help='Path to assembly stats sidecar JSON (*.assembly_stats.json), used instead of --fstats', required=False)
 	parser.add_argument('--bin_tax', type=str, help='Path to GTDB-tk output  file', required=True)
 	parser.add_argument('--checkm', type=str, help='Path to CheckM file', required=True)
 	parser.add_argument('--skani', type=str, help='Path to Skani results file', required=True)
 	parser.add_argument('--genomad_plasmid', type=str, help='Path to geNomad plasmid summary file', required=True)
-	parser.add_argument('--gtdb_fn', type=str, help='Path to gtdb_r214_metadata.tsv.gz file', required=True)
+	parser.add_argument('--gtdb_fn', type=str, help='Path to gtdb_r214_metadata.tsv.gz file or its SQLite index (get_dbs.py --gtdb_metadata_index)', required=True)
 
 	parser.add_argument('--sample_id', required=True, help="Sample ID")
 	parser.add_argument('--run_id', required=True, help="Run ID")
@@ -449,6 +474,10 @@ def parse_args():
 	parser.add_argument('--report_template', required=True, help="HTML template")
 
 	parser.add_argument('--output', type=str, help='Output file name', required=True)
+	parser.add_argument('--plotlyjs', type=str, default='inline', help=PLOTLYJS_HELP)
+	parser.add_argument('--webgl_threshold', type=int, default=WEBGL_THRESHOLD, help=f'Number of contigs above which the contig scatter is drawn with WebGL [{WEBGL_THRESHOLD}]')
+	parser.add_argument('--dpi', type=int, default=FIGURE_DPI, help=f'Resolution of the assembly QC figure [{FIGURE_DPI}]')
+	parser.add_argument('--image_format', type=str, default='png', choices=IMAGE_FORMATS, help='Image format of the assembly QC figure, palette PNG or lossless WebP [png]')
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return parser.parse_args()
@@ -456,19 +485,20 @@ def parse_args():
 
 def main():
 	args = parse_args()
+	if not args.fstats and not args.asm_sidecar:
+		raise ValueError("Either --fstats or --asm_sidecar must be provided")
 	sample_data = process_metadata(args.sample_id, args.run_id, args.barcode, args.sample_type, args.logo)
 	bintax_metrics = process_bintax(args.bin_tax)
 	skani_metrics = process_skani(args.skani, args.gtdb_fn)
 	checkm_metrics = process_checkm(args.checkm)
-	m7, mq_out, asm_stats = merge_stats(args.asm_stats, args.fstats, args.cov, args.genomad_plasmid, bintax_metrics, skani_metrics, checkm_metrics)
-	bin_dist_data = plot_bins(mq_out, args.output)
+	m7, mq_out, asm_stats = merge_stats(args.asm_stats, args.fstats, args.cov, args.genomad_plasmid, bintax_metrics, skani_metrics, checkm_metrics, args.asm_sidecar)
+	bin_dist_data = plot_bins(mq_out, args.output, args.webgl_threshold)
 	m11, m10, roundedqual, roundedcont = assembly_summary(mq_out)
-	plot_assembly_summary(m10, roundedqual, roundedcont)
-	plot_assembly_stats(m11, asm_stats)
-	binning_merged_data, fig_data, outcont_tab2_data = merge_plots(m7, args.output)
+	fig_data = plot_assembly_figures(m10, m11, asm_stats, roundedqual, roundedcont, args.dpi, args.image_format)
+	binning_merged_data, outcont_tab2_data = merge_plots(m7, args.output)
 
 	context = merge_ccvals(sample_data, bin_dist_data, binning_merged_data, fig_data, outcont_tab2_data)
-	render_template(context, args.report_template, args.output)
+	render_template(context, args.report_template, args.output, args.plotlyjs)
 
 
 if __name__ == "__main__":
@@ -15,12 +15,18 @@ import datetime
 from jinja2 import Environment, FileSystemLoader
 import os
 import math
-import seaborn as sns
 import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
 from pretty_html_table import build_table
 import base64
-import matplotlib.image as mpimg
 from io import BytesIO
+from fastq_qc import LENGTH_RESOLUTION, QUAL_RESOLUTION
+
+
+###### Constants
+
+CHUNK_SIZE = 1000000 # Nanoplot data rows per chunk
+DISPLAY_BINS = 100 # Display bins (axis limits rounded to 50 kbp and 5 / DISPLAY_BINS) are whole multiples of the accumulated LENGTH_RESOLUTION and QUAL_RESOLUTION bins
 
 
 ###### Functions
@@ -39,7 +45,7 @@ def process_metadata(sample_id, run_id, barcode, sample_type, logo):
 	return sample_data
 
 
-# Process and reformat Nanoplot output table (nanostats.txt)
+# Process and reformat Nanoplot output table (nanostats.txt, also written by fastq_qc.py)
 def process_nanostats(nanostats_in, stage):
 	df_ns = pd.read_csv(nanostats_in, sep='|', header=None)
 	df_ns = df_ns[df_ns[0].str.contains(":")]
@@ -100,7 +106,7 @@ def merge_nanostats(ns_preqc, ns_postqc, output):
 	return(ns_merged2)
 
 
-# Process Seqtk fqchk results for the starts and ends of reads
+# Process Seqtk fqchk results (also written by fastq_qc.py) for the starts and ends of reads
 def process_seqtk_fqchk(fqchk_in_fw, fqchk_in_rv):
 	fqchk_fw = pd.read_csv(fqchk_in_fw, sep='\t', header=None)
 	fqchk_fw['Orientation'] = "FW"
@@ -115,82 +121,60 @@ def process_seqtk_fqchk(fqchk_in_fw, fqchk_in_rv):
 	return(fqchk_merged)
 
 
+# Render a figure to a base64 encoded PNG and close it
+def figure_base64(fig):
+	buffer = BytesIO()
+	fig.savefig(buffer, bbox_inches="tight", format="png")
+	plt.close(fig)
+	image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+	buffer.close()
+
+	return(image_base64)
+
+
+# Plot nucleotide composition and mean PHRED score along one end of the reads
+def plot_fqchk_panel(subfig, fqchk, maxq, xlabel, label, legend=False, invert=False):
+	ax1 = subfig.subplots()
+	ax1.bar(fqchk['POS'], fqchk['%G'], width=1, bottom=fqchk['%A']+fqchk['%T']+fqchk['%C'],color='#AE93BE')
+	ax1.bar(fqchk['POS'], fqchk['%C'], width=1, bottom=fqchk['%A']+fqchk['%T'], color='#B4DAE5')
+	ax1.bar(fqchk['POS'], fqchk['%T'], width=1, bottom=fqchk['%A'], color='#F0D77B')
+	ax1.bar(fqchk['POS'], fqchk['%A'], width=1, color='#bab8b8')
+	ax1.set_ylim([0, 100])
+	ax1.set_xlim([0, 300])
+	ax1.xaxis.set_ticks(np.arange(0, 301, 100))
+	ax1.set_ylabel('Nucleotide composition (%)', weight='bold')
+	ax1.set_xlabel(xlabel, weight='bold')
+	if legend:
+		ax1.legend(['G (%)','C (%)','T (%)','A (%)'],loc='lower right')
+
+	ax2 = ax1.twinx()
+	ax2.plot(fqchk['POS'], fqchk["avgQ"], color="red", linewidth=1.6)
+	ax2.set_ylabel('Mean PHRED score', color="red", weight='bold')
+	ax2.tick_params(axis='y', colors="red")
+	ax2.spines['right'].set_color("red")
+	ax2.yaxis.set_ticks(np.linspace(0,maxq,4))
+	if invert:
+		ax1.invert_xaxis()
+
+	subfig.text(0, 1, label, size=15, weight='bold', va='top')
+
+
 # Plot Seqtk fqchk results for both pre- and post-QC
 def plot_seqtk_fqchk(fqchk_merged, stage):
 	maxq = math.ceil((max(fqchk_merged["avgQ"])*1.2)/5)*5
 	fqchk_fw = fqchk_merged[fqchk_merged['Orientation'] == "FW"]
 	fqchk_rv = fqchk_merged[fqchk_merged['Orientation'] == "RV"]
+	labels = ["A", "B"] if stage == "Pre-QC" else ["C", "D"]
 
-	fw_fig, fw_ax1 = plt.subplots()
-	fw_ax1.bar(fqchk_fw['POS'], fqchk_fw['%G'], width=1, bottom=fqchk_fw['%A']+fqchk_fw['%T']+fqchk_fw['%C'],color='#AE93BE')
-	fw_ax1.bar(fqchk_fw['POS'], fqchk_fw['%C'], width=1, bottom=fqchk_fw['%A']+fqchk_fw['%T'], color='#B4DAE5')
-	fw_ax1.bar(fqchk_fw['POS'], fqchk_fw['%T'], width=1, bottom=fqchk_fw['%A'], color='#F0D77B')
-	fw_ax1.bar(fqchk_fw['POS'], fqchk_fw['%A'], width=1, color='#bab8b8')
-	fw_ax1.set_ylim([0, 100])
-	fw_ax1.set_xlim([0, 300])
-	fw_ax1.xaxis.set_ticks(np.arange(0, 301, 100))
-	fw_ax1.set_ylabel('Nucleotide composition (%)', weight='bold')
-	fw_ax1.set_xlabel("5' position (bp)", weight='bold')
-	fw_ax1.legend(['G (%)','C (%)','T (%)','A (%)'],loc='lower right')
-
-	fw_ax2 = fw_ax1.twinx()
-	fw_ax2.plot(fqchk_fw['POS'], fqchk_fw["avgQ"], color="red", linewidth=1.6)
-	fw_ax2.set_ylabel('Mean PHRED score', color="red", weight='bold')
-	fw_ax2.tick_params(axis='y', colors="red")
-	fw_ax2.spines['right'].set_color("red")
-	fw_ax2.yaxis.set_ticks(np.linspace(0,maxq,4))
-	fw_fig.tight_layout()
-
-	if stage == "Pre-QC":
-		fw_fig.text(-0.05, 1, "A",size=15, weight='bold')
-	if stage == "Post-QC":
-		fw_fig.text(-0.05, 1, "C",size=15, weight='bold')
-	fw_fig.savefig('fw_'+stage+'.png', bbox_inches="tight")
-
-	rv_fig, rv_ax1 = plt.subplots()
-	rv_ax1.bar(fqchk_rv['POS'], fqchk_rv['%G'], width=1, bottom=fqchk_rv['%A']+fqchk_rv['%T']+fqchk_rv['%C'],color='#AE93BE')
-	rv_ax1.bar(fqchk_rv['POS'], fqchk_rv['%C'], width=1, bottom=fqchk_rv['%A']+fqchk_rv['%T'], color='#B4DAE5')
-	rv_ax1.bar(fqchk_rv['POS'], fqchk_rv['%T'], width=1, bottom=fqchk_rv['%A'], color='#F0D77B')
-	rv_ax1.bar(fqchk_rv['POS'], fqchk_rv['%A'], width=1, color='#bab8b8')
-	rv_ax1.set_ylim([0, 100])
-	rv_ax1.set_xlim([0, 300])
-	rv_ax1.xaxis.set_ticks(np.arange(0, 301, 100))
-	rv_ax1.set_ylabel('Nucleotide composition (%)', weight='bold')
-	rv_ax1.set_xlabel("3' position (bp)", weight='bold')
-
-	rv_ax2 = rv_ax1.twinx()
-	rv_ax2.plot(fqchk_rv['POS'], fqchk_rv["avgQ"], color="red", linewidth=1.6)
-	rv_ax2.set_ylabel('Mean PHRED score', color="red", weight='bold')
-	rv_ax2.tick_params(axis='y', colors="red")
-	rv_ax2.spines['right'].set_color("red")
-	rv_ax2.yaxis.set_ticks(np.linspace(0,maxq,4))
-	rv_ax1.invert_xaxis()
-	rv_fig.tight_layout()
-
-	if stage == "Pre-QC":
-		rv_fig.text(-0.05, 1, "B",size=15, weight='bold')
-	if stage == "Post-QC":
-		rv_fig.text(-0.05, 1, "D",size=15, weight='bold')
-
-	rv_fig.savefig('rv_'+stage+'.png', bbox_inches="tight")
-
-
-	f, axarr = plt.subplots(1,2, figsize=(14, 14))
-	axarr[0].imshow(mpimg.imread('fw_'+stage+'.png'))
-	axarr[1].imshow(mpimg.imread('rv_'+stage+'.png'))
-	[ax.set_axis_off() for ax in axarr.ravel()]
-	plt.tight_layout()
-
-	buffer = BytesIO()
-	plt.savefig(buffer, bbox_inches="tight", format="png")
-	buffer.seek(0)
-	image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-	buffer.close()
+	fig = plt.figure(figsize=(13, 4.8), layout='constrained')
+	fw_subfig, rv_subfig = fig.subfigures(1, 2, wspace=0.05)
+	plot_fqchk_panel(fw_subfig, fqchk_fw, maxq, "5' position (bp)", labels[0], legend=True)
+	plot_fqchk_panel(rv_subfig, fqchk_rv, maxq, "3' position (bp)", labels[1], invert=True)
 
 	stage2 = stage.replace("-QC","")
 
 	fig_data = {
-		'image_base64_'+stage2 : image_base64,
+		'image_base64_'+stage2 : figure_base64(fig),
 	}
 
 	return(fig_data)
@@ -204,65 +188,104 @@ def process_readqc(read_qc_stats):
 	return readqc_data
 
 
-# Process raw Nanoplot data (NanoPlot-data.tsv.gz)
+# Accumulate a 2D histogram of read length (kbp) and mean read quality from raw Nanoplot data (NanoPlot-data.tsv.gz)
+# Only the lengths and quals columns are read, in chunks, so memory does not depend on the number of reads
+def accumulate_nanodata(fn):
+	counts = np.zeros((0, 0), dtype=np.int64)
+	for chunk in pd.read_csv(fn, sep='\t', usecols=['lengths', 'quals'], dtype=np.float32, chunksize=CHUNK_SIZE):
+		length_bins = np.floor(np.nan_to_num(chunk['lengths'].to_numpy()) / 1000 / LENGTH_RESOLUTION).astype(np.int64)
+		qual_bins = np.floor(np.nan_to_num(chunk['quals'].to_numpy()) / QUAL_RESOLUTION).astype(np.int64)
+		length_bins = np.maximum(length_bins, 0)
+		qual_bins = np.maximum(qual_bins, 0)
+		if len(length_bins) == 0:
+			continue
+		shape = (max(counts.shape[0], int(length_bins.max()) + 1), max(counts.shape[1], int(qual_bins.max()) + 1))
+		if shape != counts.shape:
+			grown = np.zeros(shape, dtype=np.int64)
+			grown[:counts.shape[0], :counts.shape[1]] = counts
+			counts = grown
+		counts += np.bincount(length_bins * shape[1] + qual_bins, minlength=shape[0] * shape[1]).reshape(shape)
+
+	return(counts)
+
+
+# Load a read length/mean quality histogram written by fastq_qc.py (read_hist.tsv)
+def load_read_hist(fn):
+	read_hist = pd.read_csv(fn, sep='\t')
+	length_bins = np.rint(read_hist['length_kbp'].to_numpy() / LENGTH_RESOLUTION).astype(np.int64)
+	qual_bins = np.rint(read_hist['quality'].to_numpy() / QUAL_RESOLUTION).astype(np.int64)
+	counts = np.zeros((length_bins.max() + 1 if len(read_hist) else 0, qual_bins.max() + 1 if len(read_hist) else 0), dtype=np.int64)
+	np.add.at(counts, (length_bins, qual_bins), read_hist['reads'].to_numpy())
+
+	return(counts)
+
+
+# Load a read length/quality histogram (read_hist.tsv) or accumulate one from raw Nanoplot data
+def read_nanodata(fn):
+	if fn.endswith('.read_hist.tsv'):
+		return(load_read_hist(fn))
+	return(accumulate_nanodata(fn))
+
+
+# Process read length/quality data for pre- and post-QC reads
 def process_nanodata(fn_pre, fn_post):
-	nd_pre = pd.read_csv(fn_pre, compression='gzip', sep='\t')
-	nd_pre['Stage'] = "Pre-QC"
-
-	nd_post = pd.read_csv(fn_post, compression='gzip', sep='\t')
-	nd_post['Stage'] = "Post-QC"
-
-	nd_merged = pd.concat([nd_pre, nd_post], ignore_index=True, sort=False)
-	nd_merged["klen"] = nd_merged["lengths"]/1000
-
-	return(nd_merged)
-
-
-# Plot raw Nanoplot data and merge subplots
-def plot_nanodata(nd_merged):
-	re_nd_pre = nd_merged.loc[nd_merged['Stage']== "Pre-QC"]
-	re_nd_post = nd_merged.loc[nd_merged['Stage']== "Post-QC"]
-	roundedqual = math.ceil(nd_merged['quals'].max()/5)*5
-	roundedlen = (math.ceil(nd_merged['klen'].max()/50)*50)
-	gfg_pre = sns.jointplot(
-		data=re_nd_pre,
-		x="klen",
-		alpha=.25,
-		color="r",
-		s=5,
-		y="quals",
-		kind='scatter',
-		marginal_kws=dict(bins=100),
-		xlim = (0,roundedlen), ylim = (0,roundedqual))
-	gfg_pre.set_axis_labels("Read length (kbp)","Mean read quality", fontweight='bold')
-	gfg_pre.figure.tight_layout()
-
-	gfg_post = sns.jointplot(
-		data=re_nd_post,
-		x="klen",
-		alpha=.25,
-		s=5,
-		y="quals",
-		kind='scatter',
-		marginal_kws=dict(bins=100),
-		xlim = (0,roundedlen), ylim = (0,roundedqual))
-	gfg_post.set_axis_labels("Read length (kbp)","Mean read quality", fontweight='bold')
-	gfg_post.figure.tight_layout()
-
-	gfg_pre.savefig("gfg_pre.png")
-	gfg_post.savefig("gfg_post.png")
-
-	f, axarr = plt.subplots(1,2, figsize=(14, 14))
-	axarr[0].imshow(mpimg.imread('gfg_pre.png'))
-	axarr[1].imshow(mpimg.imread('gfg_post.png'))
-	[ax.set_axis_off() for ax in axarr.ravel()]
-	plt.tight_layout()
+	nd_hist = {
+		'Pre-QC' : read_nanodata(fn_pre),
+		'Post-QC' : read_nanodata(fn_post),
+	}
 
-	buffer = BytesIO()
-	plt.savefig(buffer, bbox_inches="tight", format="png")
-	buffer.seek(0)
-	image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-	buffer.close()
+	return(nd_hist)
+
+
+# Sum fine histogram bins into DISPLAY_BINS x DISPLAY_BINS bins covering the axis limits
+def rebin_nanodata(counts, roundedlen, roundedqual):
+	length_factor = int(round(roundedlen / (DISPLAY_BINS * LENGTH_RESOLUTION)))
+	qual_factor = int(round(roundedqual / (DISPLAY_BINS * QUAL_RESOLUTION)))
+	padded = np.zeros((DISPLAY_BINS * length_factor, DISPLAY_BINS * qual_factor), dtype=np.int64)
+	padded[:counts.shape[0], :counts.shape[1]] = counts[:padded.shape[0], :padded.shape[1]]
+
+	return(padded.reshape(DISPLAY_BINS, length_factor, DISPLAY_BINS, qual_factor).sum(axis=(1, 3)))
+
+
+# Draw a read length/quality density with marginal histograms (laid out as a seaborn jointplot) from binned counts
+def plot_density(subfig, counts, roundedlen, roundedqual, color, cmap):
+	length_edges = np.linspace(0, roundedlen, DISPLAY_BINS + 1)
+	qual_edges = np.linspace(0, roundedqual, DISPLAY_BINS + 1)
+	grid = subfig.add_gridspec(2, 2, width_ratios=(5, 1), height_ratios=(1, 5), wspace=0.05, hspace=0.05)
+	ax_joint = subfig.add_subplot(grid[1, 0])
+	ax_x = subfig.add_subplot(grid[0, 0], sharex=ax_joint)
+	ax_y = subfig.add_subplot(grid[1, 1], sharey=ax_joint)
+
+	if counts.any():
+		ax_joint.pcolormesh(length_edges, qual_edges, np.ma.masked_equal(counts, 0).T, cmap=cmap, norm=LogNorm(vmin=1, vmax=counts.max()), rasterized=True)
+	ax_x.bar(length_edges[:-1], counts.sum(axis=1), width=np.diff(length_edges), align='edge', color=color, alpha=0.5)
+	ax_y.barh(qual_edges[:-1], counts.sum(axis=0), height=np.diff(qual_edges), align='edge', color=color, alpha=0.5)
+
+	ax_joint.set_xlim(0, roundedlen)
+	ax_joint.set_ylim(0, roundedqual)
+	ax_joint.set_xlabel("Read length (kbp)", fontweight='bold')
+	ax_joint.set_ylabel("Mean read quality", fontweight='bold')
+	for ax in [ax_x, ax_y]:
+		ax.tick_params(labelbottom=False, labelleft=False, bottom=ax is ax_y, left=ax is ax_x)
+		ax.spines[['top', 'right']].set_visible(False)
+	ax_x.set_yticks([])
+	ax_y.set_xticks([])
+	ax_x.spines['left'].set_visible(False)
+	ax_y.spines['bottom'].set_visible(False)
+
+
+# Plot binned Nanoplot data for pre- and post-QC reads side by side
+def plot_nanodata(nd_hist):
+	max_klen = max([(np.flatnonzero(counts.any(axis=1))[-1] + 1) * LENGTH_RESOLUTION for counts in nd_hist.values() if counts.any()] or [50])
+	max_qual = max([(np.flatnonzero(counts.any(axis=0))[-1] + 1) * QUAL_RESOLUTION for counts in nd_hist.values() if counts.any()] or [5])
+	roundedqual = math.ceil(round(max_qual, 6)/5)*5
+	roundedlen = (math.ceil(round(max_klen, 6)/50)*50)
+
+	fig = plt.figure(figsize=(12, 6))
+	pre_subfig, post_subfig = fig.subfigures(1, 2, wspace=0.05)
+	plot_density(pre_subfig, rebin_nanodata(nd_hist['Pre-QC'], roundedlen, roundedqual), roundedlen, roundedqual, 'r', 'Reds')
+	plot_density(post_subfig, rebin_nanodata(nd_hist['Post-QC'], roundedlen, roundedqual), roundedlen, roundedqual, 'C0', 'Blues')
+	image_base64 = figure_base64(fig)
 
 	ns_rawfig_data = {
 		'ns_raw_image_base64' : image_base64,
@@ -312,8 +335,8 @@ def parse_args():
 	parser.add_argument('--nucl_comp_pre_rv', type=str, help="Nucleotide compositions, 3' (pre-QC)")
 	parser.add_argument('--nucl_comp_post_fw', type=str, help="Nucleotide compositions, 5' (post-QC)")
 	parser.add_argument('--nucl_comp_post_rv', type=str, help="Nucleotide compositions, 3' (post-QC)")
-	parser.add_argument('--nanoplot_raw_pre', type=str, help='Nanoplot raw results (pre-QC)')
-	parser.add_argument('--nanoplot_raw_post', type=str, help='Nanoplot raw results (post-QC)')
+	parser.add_argument('--nanoplot_raw_pre', type=str, help='Read length/quality histogram from fastq_qc.py (read_hist.tsv) or Nanoplot raw results (pre-QC)')
+	parser.add_argument('--nanoplot_raw_post', type=str, help='Read length/quality histogram from fastq_qc.py (read_hist.tsv) or Nanoplot raw results (post-QC)')
 	parser.add_argument('--logo', required=False, help="Logo")
 	parser.add_argument('--report_template', required=True, help="HTML template")
 	parser.add_argument('--output', required=True, help="Output HTML filename prefix")
@@ -345,8 +368,8 @@ def main():
 		post_fig_data = "None"
 
 	if args.nanoplot_raw_pre and args.nanoplot_raw_post:
-		df4 = process_nanodata(args.nanoplot_raw_pre, args.nanoplot_raw_post)
-		ns_rawfig_data = plot_nanodata(df4)
+		nd_hist = process_nanodata(args.nanoplot_raw_pre, args.nanoplot_raw_post)
+		ns_rawfig_data = plot_nanodata(nd_hist)
 	else:
 		ns_rawfig_data = "None"
 
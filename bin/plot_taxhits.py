@@ -18,7 +18,10 @@ import argparse
 from jinja2 import Environment, FileSystemLoader
 import base64
 from io import BytesIO
-import plotly.io as pio
+from gtdb_lineage import add_lineage_columns
+from gtdb_metadata import load_lineages
+from ncbi_taxonomy import load_taxonomy, clade_totals
+from report_assets import figure_div, plotlyjs_tag, PLOTLYJS_HELP
 
 
 ###### Functions
@@ -26,6 +29,21 @@ import plotly.io as pio
 plot_B_colors = ["#ff4a24","#19D3F3","#F58518","#e60019","#006fdf","#FECB52","#636EFA","#80ba5a","#b596ed","#009b3b","#bc80bd","#882255","#117733","#88ccee","#ff0b6e","#00d395","#f2b701","#999933","#E45756","#332288","#cf1c90","#FFA15A","#ccebc5","#80b1d3","#FF9DA6","#002b90","#008695","#11a579","#3969ac","#44aa99","#54A24B","#72B7B2","#7f3c8d","#9D755D","#aa4499","#AB63FA","#B279A2","#b3de69","#B6E880","#bebada","#c44a86","#cc6677","#ddcc77","#de57ff","#e59800","#e68310","#e73f74","#EECA3B","#EF553B","#fb8072","#fccde5","#FF6692","#FF97FF"]
 plot_A_colors = ['#ddcc77','#882255','#117733','#332288','#aa4499','#44aa99','#88ccee','#cc6677']
 
+# Taxpasta (NCBI) ranks grouped into the ranks shown in the rank composition plot, ranks not listed are kept as is (and not plotted)
+RANK_GROUPS = {
+	'kingdom' : 'Kingdom',
+	'superkingdom' : 'Domain', 'clade' : 'Domain', 'domain' : 'Domain',
+	'superclass' : 'Phylum', 'subphylum' : 'Phylum', 'phylum' : 'Phylum',
+	'superorder' : 'Class', 'subclass' : 'Class', 'class' : 'Class',
+	'superfamily' : 'Order', 'parvorder' : 'Order', 'infraorder' : 'Order', 'suborder' : 'Order', 'order' : 'Order',
+	'tribe' : 'Family', 'subfamily' : 'Family', 'family' : 'Family',
+	'species subgroup' : 'Genus', 'species group' : 'Genus', 'genus' : 'Genus', 'subgenus' : 'Genus',
+	'species' : 'Species',
+	'strain' : 'Subspecies', 'serotype' : 'Subspecies', 'serogroup' : 'Subspecies', 'isolate' : 'Subspecies', 'forma specialis' : 'Subspecies', 'subspecies' : 'Subspecies',
+	'no rank' : 'Missing rank',
+}
+RANK_ORDER = ['Unclassified', 'Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus', 'Species','Subspecies','Missing rank']
+
 
 # Combine sample metadata
 def process_metadata(sample_id, run_id, barcode, sample_type, logo):
@@ -42,26 +60,20 @@ def process_metadata(sample_id, run_id, barcode, sample_type, logo):
 
 
 #
-def process_taxpasta_A(infile_taxp):
+def process_taxpasta_A(infile_taxp, taxonomy=None):
 	df_taxp = pd.read_csv(infile_taxp, delimiter='\t')
 
-	df_taxp['rank'] = df_taxp['rank'].replace(['kingdom'], 'Kingdom')
-	df_taxp['rank'] = df_taxp['rank'].replace(['superkingdom','clade','domain'], 'Domain')
-	df_taxp['rank'] = df_taxp['rank'].replace(['tribe','family'], 'Family')
-	df_taxp['rank'] = df_taxp['rank'].replace(['superorder','class'], 'Class')
-	df_taxp['rank'] = df_taxp['rank'].replace(['superfamily','parvorder','infraorder','suborder','order'], 'Order')
-	df_taxp['rank'] = df_taxp['rank'].replace(['superclass','subphylum','phylum'], 'Phylum')
-	df_taxp['rank'] = df_taxp['rank'].replace(['superorder','subclass','class'], 'Class')
-	df_taxp['rank'] = df_taxp['rank'].replace(['subfamily','family'], 'Family')
-	df_taxp['rank'] = df_taxp['rank'].replace(['species'], 'Species')
-	df_taxp['rank'] = df_taxp['rank'].replace(['strain','serotype','serogroup','isolate','forma specialis','subspecies'], 'Subspecies')
-	df_taxp['rank'] = df_taxp['rank'].replace(['species subgroup','species group','genus','subgenus'], 'Genus')
-	df_taxp['rank'] = df_taxp['rank'].replace(['no rank'], 'Missing rank')
-	df_taxp['rank'] = df_taxp['rank'].fillna('Unclassified')
-
-	df_taxp_grouped = df_taxp.groupby('rank').sum('count')
-	sorter = ['Unclassified', 'Kingdom', 'Phylum', 'Class', 'Order', 'Family', 'Genus', 'Species','Subspecies','Missing rank']
-	df_taxp_grouped = df_taxp_grouped.reindex(index = sorter)
+	rank_codes, raw_ranks = pd.factorize(df_taxp['rank'])
+	ranks = np.array([RANK_GROUPS.get(rank, rank) for rank in raw_ranks] + ['Unclassified'], dtype=object)
+	df_taxp['rank'] = pd.Categorical(ranks[rank_codes])
+
+	if taxonomy is not None:
+		df_taxp['clade_count'] = clade_totals(taxonomy, df_taxp['taxonomy_id'], df_taxp['taxonomy_id'], df_taxp['count'])
+	else:
+		df_taxp['clade_count'] = df_taxp['count']
+
+	df_taxp_grouped = df_taxp.groupby('rank', observed=True)['count'].sum().to_frame()
+	df_taxp_grouped = df_taxp_grouped.reindex(index = RANK_ORDER)
 	taxp_total_reads = df_taxp_grouped['count'].sum()
 	df_taxp_grouped['perc'] = ((df_taxp_grouped['count']/taxp_total_reads)*100).round(2)
 	df_taxp_grouped['x_value'] = 1
@@ -103,7 +115,7 @@ def plot_taxpasta_A(df_taxp_grouped, tool, output):
 						plot_bgcolor='white',
 						title_text='<b>'+output+'</b>', title_font=dict(size=20))
 
-	taxp_fig_A_string = pio.to_html(taxp_fig_A, full_html=False)
+	taxp_fig_A_string = figure_div(taxp_fig_A)
 	taxp_fig_A_data = {
 		'taxp_fig_A_'+tool : taxp_fig_A_string,
 	}
@@ -114,6 +126,7 @@ def plot_taxpasta_A(df_taxp_grouped, tool, output):
 #
 def process_taxpasta_B(df_taxp_grouped):
 	filtered_df_taxp = df_taxp_grouped[df_taxp_grouped['rank'] == "Species"]
+	filtered_df_taxp = filtered_df_taxp.assign(count=filtered_df_taxp['clade_count'])
 	taxp_rcount = filtered_df_taxp['count'].sum()
 	taxp_top_20 = filtered_df_taxp.nlargest(50,'count')
 	taxp_other = filtered_df_taxp[filtered_df_taxp['name'] != 'unclassified']
@@ -165,7 +178,7 @@ def plot_taxpasta_B(df_taxp_stacked, tool, output):
 						title_text='<b>'+output+'</b>', 
 						title_font=dict(size=20))
 
-	taxp_fig_B_string = pio.to_html(taxp_fig_B, full_html=False)
+	taxp_fig_B_string = figure_div(taxp_fig_B)
 	taxp_fig_B_data = {
 		'taxp_fig_B_'+tool : taxp_fig_B_string,
 	}
@@ -233,7 +246,7 @@ def plot_bracken(infile, tool, output):
 							title_text='<b>'+output+'</b>',
 							title_font=dict(size=20))
 
-	fig_bracken_string = pio.to_html(fig_bracken, full_html=False)
+	fig_bracken_string = figure_div(fig_bracken)
 	fig_bracken_data = {
 		'fig_bracken_'+tool : fig_bracken_string,
 	}
@@ -243,29 +256,12 @@ def plot_bracken(infile, tool, output):
 
 #
 def process_sylph(sylph_infile, sylph_metadata):
-	syl_fn_df = pd.read_csv(sylph_metadata, compression='gzip', sep='\t', header=None)
-	syl_fn_df.columns = ['Genome_file_1','tax']
-
 	syl = pd.read_csv(sylph_infile, delimiter='\t')
 	syl['Genome_file_1'] = syl['Genome_file'].str.split('/').str[-1].str.split("_").str[0:2].apply('_'.join)
+	syl_fn_df = load_lineages(sylph_metadata, syl['Genome_file_1'])
 
 	syl_merge = pd.merge(syl,syl_fn_df,on=['Genome_file_1'], how = 'left')
-	syl_merge['Species1'] = syl_merge['tax'].str.replace(r'd__;p__;o__;f__;g__;s__$', '', regex=True).str.replace(r';p__;o__;f__;g__;s__$', '', regex=True).str.replace(r';c__;o__;f__;g__;s__$', '', regex=True).str.replace(r';o__;f__;g__;s__$', '', regex=True).str.replace(r';f__;g__;s__$', '', regex=True).str.replace(r';g__;s__$', '', regex=True).str.replace(r';s__$', '', regex=True).str.split(';').str[-1]
-
-	syl_merge['rank'] = np.select(
-		[syl_merge['Species1'].str.contains('s__'), 
-		syl_merge['Species1'].str.contains('g__'),
-		syl_merge['Species1'].str.contains('f__'),
-		syl_merge['Species1'].str.contains('o__'),
-		syl_merge['Species1'].str.contains('c__'),
-		syl_merge['Species1'].str.contains('p__'),
-		syl_merge['Species1'].str.contains('d__'),
-		syl_merge['Species1'].str.contains('Unclassified')],
-		['Species', 'Genus','Family','Order','Class','Phylum','Domain','Unclassified'],
-		default=np.nan,
-	)
-	syl_merge['rank']
-	syl_merge['Species2'] = syl_merge['Species1'].str.replace('s__', '').str.replace('g__', '').str.replace('f__', '').str.replace('o__', '').str.replace('c__', '').str.replace('p__', '').str.replace('d__', '')
+	syl_merge = add_lineage_columns(syl_merge, 'tax', 'Species2')
 	sylph_filtered_df = syl_merge[syl_merge['rank'] == "Species"]
 	rcount = sylph_filtered_df['Taxonomic_abundance'].sum()
 	top_20 = sylph_filtered_df.nlargest(50,'Taxonomic_abundance')
@@ -321,7 +317,7 @@ def plot_sylph(sylph_stacked, output):
 						title_text='<b>'+output+'</b>',
 						title_font=dict(size=20))
 
-	fig_syl_string = pio.to_html(fig_syl, full_html=False)
+	fig_syl_string = figure_div(fig_syl)
 	fig_syl_data = {
 		'fig_syl' : fig_syl_string,
 	}
@@ -371,8 +367,9 @@ def merge_ccvals(sample_data, taxp_fig_A_data, taxp_fig_B_data, taxp_fig_A_data_
 
 
 #
-def render_template(context, template, output):
+def render_template(context, template, output, plotlyjs='inline'):
 	template_dir = os.getcwd()
+	context['plotlyjs'] = plotlyjs_tag(plotlyjs, output + '.taxonomy_report.html')
 
 	env = Environment(loader=FileSystemLoader(template_dir))
 	template = env.get_template(template)
@@ -394,7 +391,8 @@ def parse_args():
 	parser.add_argument('--sylph', type=str, required=False, help='Path to Sylph output')
 	parser.add_argument('--bracken_kraken2', required=False, type=str, help='Path to Kraken2 bracken output')
 	parser.add_argument('--bracken_centrifuger', required=False, type=str, help='Path to Centrifuger bracken output')
-	parser.add_argument('--syl_fn', type=str, required=False, help='Path to gtdb_r214_metadata.tsv.gz file')
+	parser.add_argument('--taxdump', type=str, required=False, help='NCBI taxdump directory (nodes.dmp, merged.dmp), used to roll up reads assigned below species level into the species plots')
+	parser.add_argument('--syl_fn', type=str, required=False, help='Path to gtdb_r214_metadata.tsv.gz file or its SQLite index (get_dbs.py --gtdb_metadata_index)')
 
 	parser.add_argument('--sample_id', required=True, help="Sample ID")
 	parser.add_argument('--run_id', required=True, help="Run ID")
@@ -405,6 +403,7 @@ def parse_args():
 	parser.add_argument('--report_template', required=True, help="HTML template")
 
 	parser.add_argument('--output', type=str, help='Output file name')
+	parser.add_argument('--plotlyjs', type=str, default='inline', help=PLOTLYJS_HELP)
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return parser.parse_args()
@@ -415,9 +414,10 @@ def main():
 	args = parse_args()
 
 	sample_data = process_metadata(args.sample_id, args.run_id, args.barcode, args.sample_type, args.logo)
+	taxonomy = load_taxonomy(args.taxdump) if args.taxdump and (args.taxpasta_kraken2 or args.taxpasta_centrifuger) else None
 
 	if args.taxpasta_kraken2:
-		df_taxp, df_taxp_2x1 = process_taxpasta_A(args.taxpasta_kraken2)
+		df_taxp, df_taxp_2x1 = process_taxpasta_A(args.taxpasta_kraken2, taxonomy)
 		taxp_fig_A_data = taxp_kraken2_plot_A = plot_taxpasta_A(df_taxp_2x1, "Kraken2", args.sample_id)
 		df_taxp_stacked = process_taxpasta_B(df_taxp)
 		taxp_fig_B_data = taxp_kraken2_plot_B = plot_taxpasta_B(df_taxp_stacked, "Kraken2", args.sample_id)
@@ -426,7 +426,7 @@ def main():
 		taxp_fig_B_data = "None"
 
 	if args.taxpasta_centrifuger:
-		df_taxp, df_taxp_2x1 = process_taxpasta_A(args.taxpasta_centrifuger)
+		df_taxp, df_taxp_2x1 = process_taxpasta_A(args.taxpasta_centrifuger, taxonomy)
 		taxp_fig_A_data_centrifuger = plot_taxpasta_A(df_taxp_2x1, "Centrifuger", args.sample_id)
 		df_taxp_stacked = process_taxpasta_B(df_taxp)
 		taxp_fig_B_data_centrifuger = plot_taxpasta_B(df_taxp_stacked, "Centrifuger", args.sample_id)
@@ -453,7 +453,7 @@ def main():
 		fig_syl_data = "None"
 
 	context = merge_ccvals(sample_data, taxp_fig_A_data, taxp_fig_B_data, taxp_fig_A_data_centrifuger, taxp_fig_B_data_centrifuger, fig_bracken_data_kraken2, fig_bracken_data_centrifuger, fig_syl_data)
-	render_template(context, args.report_template, args.output)
+	render_template(context, args.report_template, args.output, args.plotlyjs)
 
 if __name__ == "__main__":
 	main()
@@ -9,48 +9,213 @@ __author__ = 'D.J.BERGER'
 ###### Imports
 
 import os
+import csv
+import gzip
+import time
+import shutil
 import argparse
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from index_run_dir import read_manifest, scan_run_dir
+
+
+###### Constants
+
+BLOCK_SIZE = 4 * 1024 * 1024 # Bytes of uncompressed FASTQ per gzip member
+GZIP_LEVEL = 6
+CONSUMED_HEADER = ['path', 'size', 'mtime', 'output_end']
 
 
 ###### Functions
 
+# Append a file to an open output file in-kernel (copy_file_range, falling back to sendfile and then a buffered copy)
+def append_file(out_f, filepath):
+	with open(filepath, 'rb') as in_f:
+		remaining = os.fstat(in_f.fileno()).st_size
+		out_f.flush()
+		try:
+			while remaining > 0:
+				copied = os.copy_file_range(in_f.fileno(), out_f.fileno(), remaining)
+				if copied == 0:
+					break
+				remaining -= copied
+		except (AttributeError, OSError):
+			try:
+				while remaining > 0:
+					copied = os.sendfile(out_f.fileno(), in_f.fileno(), None, remaining)
+					if copied == 0:
+						break
+					remaining -= copied
+			except (AttributeError, OSError):
+				shutil.copyfileobj(in_f, out_f)
+				return
+		out_f.seek(0, os.SEEK_END)
+
+
+# Compress an uncompressed FASTQ file onto the output as independent gzip members, blocks are compressed in parallel (zlib releases the GIL) and written in order
+def append_compressed(out_f, filepath, executor, threads):
+	with open(filepath, 'rb') as in_f:
+		while True:
+			blocks = [block for block in (in_f.read(BLOCK_SIZE) for _ in range(threads)) if block]
+			if not blocks:
+				break
+			for member in executor.map(lambda block: gzip.compress(block, compresslevel=GZIP_LEVEL), blocks):
+				out_f.write(member)
+
+
+# Append a single *.fastq.gz (copied as is) or *.fastq (compressed) chunk to the output
+def append_chunk(out_f, filepath, executor, threads):
+	if filepath.endswith('.fastq.gz'):
+		append_file(out_f, filepath)
+	else:
+		append_compressed(out_f, filepath, executor, threads)
+
+
+# Append every FASTQ chunk in a folder to the output, in file name order
+def append_fastq_files(out_f, root, files, executor, threads, check_barcode):
+	for filename in sorted(files):
+		if filename.endswith('.fastq') or filename.endswith('.fastq.gz'):
+			filepath = os.path.join(root, filename)
+			if check_barcode and 'barcode' in filepath:
+				raise ValueError("Folder contains barcoded samples")
+			append_chunk(out_f, filepath, executor, threads)
+
+
+# Find the FASTQ folder to concatenate (and its files) by walking the run directory
+def walk_fastq_folders(input_dir, run_id):
+	search_dir = os.path.join(input_dir, run_id)
+	for root, dirs, files in os.walk(search_dir):
+		yield root, files
+
+
+# Find FASTQ folders (and their files) from a run manifest written by index_run_dir.py
+def manifest_fastq_folders(manifest):
+	folders = {}
+	for row in read_manifest(manifest, 'fastq'):
+		root, filename = os.path.split(row['path'])
+		folders.setdefault(root, []).append(filename)
+	return folders.items()
+
+
+# Select the pass FASTQ folder for the basecaller (and barcode), there must only be one
+def select_fastq_folders(folders, barcode, folder_name):
+	keep_string = "fastq_pass"
+	outputaa = []
+	for root, files in folders:
+		if folder_name.lower() in root.lower():
+			if keep_string.lower() in root.lower():
+				if barcode is not None:
+					barcode_string = "barcode" + barcode[-2:]
+					if barcode_string.lower() not in root.lower():
+						continue
+				outputaa.append((root, files))
+				if len(outputaa) > 1:
+					raise ValueError("Multiple folders found, please ensure search strings and folder structures direct to a single *.fastq(.gz) directory")
+	return outputaa
+
+
 # Identify relevant folders containing FASTQ files and concatenate them into a single *.fastq.gz output
-def concatenate_fastq_files(input_dir, run_id, barcode, output_prefix, folder_name):
+def concatenate_fastq_files(input_dir, run_id, barcode, output_prefix, folder_name, threads=1, manifest=None):
 	output_file = output_prefix + ".concatenated.fastq.gz"
 	print(output_file)
-	search_dir = os.path.join(input_dir, run_id)
-	keep_string = "fastq_pass"
-	outputaa = set()
-
-	with open(output_file, 'wb') as out_f:
-		for root, dirs, files in os.walk(search_dir):
-			if folder_name.lower() in root.lower():
-				if keep_string.lower() in root.lower():
-					if barcode is not None:
-						barcode_string = "barcode" + barcode[-2:]
-						if barcode_string.lower() not in root.lower():
-							continue
-						outputaa.add(root)
-						if len(outputaa) > 1:
-							raise ValueError("Multiple folders found, please ensure search strings and folder structures direct to a single *.fastq(.gz) directory")
-						for filename in files:
-							if filename.endswith('.fastq') or filename.endswith('.fastq.gz'):
-								filepath = os.path.join(root, filename)
-								if filename.endswith('.fastq.gz'):
-									subprocess.run(['cat', filepath], stdout=out_f, check=True)
-
-					elif barcode is None:
-						outputaa.add(root)
-						if len(outputaa) > 1:
-							raise ValueError("Multiple folders found, please ensure search strings and folder structures direct to a single *.fastq(.gz) directory")
-						for filename in files:
-							if filename.endswith('.fastq') or filename.endswith('.fastq.gz'):
-								filepath = os.path.join(root, filename)
-								if 'barcode' in filepath:
-									raise ValueError("Folder contains barcoded samples")
-								if filename.endswith('.fastq.gz'):
-									subprocess.run(['cat', filepath], stdout=out_f, check=True)
+	folders = manifest_fastq_folders(manifest) if manifest else walk_fastq_folders(input_dir, run_id)
+
+	with open(output_file, 'wb') as out_f, ThreadPoolExecutor(max_workers=threads) as executor:
+		for root, files in select_fastq_folders(folders, barcode, folder_name):
+			append_fastq_files(out_f, root, files, executor, threads, barcode is None)
+
+
+# Check if a consumed chunk has been rewritten since it was appended (its size or mtime differ from those recorded)
+def chunk_changed(path, size, mtime):
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return False
+	return stat.st_size != int(size) or stat.st_mtime_ns != int(mtime)
+
+
+# Load the chunks consumed by a previous watch session, as a dict of path to (size, mtime)
+# Chunks are kept up to the first one rewritten since it was appended, that chunk and all later ones are appended again
+# The output is truncated to the end of the last kept chunk and the manifest rewritten to match
+def load_consumed(consumed_manifest, output_file):
+	consumed = {}
+	output_end = 0
+	if os.path.exists(consumed_manifest):
+		with open(consumed_manifest, 'r', newline='') as manifest_in:
+			rows = list(csv.DictReader(manifest_in, delimiter='\t'))
+		kept = []
+		for row in rows:
+			if chunk_changed(row['path'], row['size'], row['mtime']):
+				print(f"Warning: {row['path']} changed since it was appended, resuming from this chunk")
+				break
+			kept.append(row)
+			consumed[row['path']] = (int(row['size']), int(row['mtime']))
+			output_end = int(row['output_end'])
+		with open(consumed_manifest, 'w', newline='') as manifest_out:
+			writer = csv.writer(manifest_out, delimiter='\t')
+			writer.writerow(CONSUMED_HEADER)
+			writer.writerows([row[column] for column in CONSUMED_HEADER] for row in kept)
+	if os.path.exists(output_file):
+		os.truncate(output_file, output_end)
+	return consumed
+
+
+# Watch a live run directory, appending newly completed FASTQ chunks to the output until the run finishes (final_summary written) or no new chunks arrive within the idle timeout
+# Consumed chunks (path, size, mtime and the output size after appending them) are recorded in a persistent manifest, so a restarted watch resumes where it stopped
+# Standalone use only: the output and manifest must be kept in a stable location between invocations, a Nextflow task only emits its output when it ends and starts in a fresh work directory
+def watch_fastq_files(input_dir, run_id, barcode, output_prefix, folder_name, threads, poll_interval, settle_time, idle_timeout):
+	output_file = output_prefix + ".concatenated.fastq.gz"
+	consumed_manifest = output_prefix + ".consumed.tsv"
+	print(output_file)
+	search_dir = os.path.abspath(os.path.join(input_dir, run_id))
+	consumed = load_consumed(consumed_manifest, output_file)
+	last_chunk_time = time.time()
+
+	# Not opened in append mode, as copy_file_range fails with EBADF on O_APPEND outputs, instead positioned at the end of the resumed output
+	with open(output_file, 'r+b' if os.path.exists(output_file) else 'wb') as out_f, open(consumed_manifest, 'a', newline='') as manifest_out, ThreadPoolExecutor(max_workers=threads) as executor:
+		out_f.seek(0, os.SEEK_END)
+		writer = csv.writer(manifest_out, delimiter='\t')
+		if manifest_out.tell() == 0:
+			writer.writerow(CONSUMED_HEADER)
+		while True:
+			folders = {}
+			run_complete = False
+			for file_type, _, size, mtime, path in scan_run_dir(search_dir, folder_name):
+				if file_type == 'final_summary':
+					run_complete = True
+				elif file_type == 'fastq':
+					folders.setdefault(os.path.dirname(path), []).append((os.path.basename(path), size, mtime))
+
+			new_chunks = 0
+			for root, files in select_fastq_folders(folders.items(), barcode, folder_name):
+				for filename, size, mtime in sorted(files):
+					filepath = os.path.join(root, filename)
+					if filepath in consumed:
+						if (size, mtime) != consumed[filepath]:
+							print(f"Warning: {filepath} changed after it was appended, restart the watch to append it again")
+							consumed[filepath] = (size, mtime)
+						continue
+					# Chunks modified recently may still be being written, unless the run has finished
+					if not run_complete and time.time() - mtime / 1e9 < settle_time:
+						continue
+					if barcode is None and 'barcode' in filepath:
+						raise ValueError("Folder contains barcoded samples")
+					append_chunk(out_f, filepath, executor, threads)
+					out_f.flush()
+					writer.writerow([filepath, size, mtime, out_f.tell()])
+					manifest_out.flush()
+					consumed[filepath] = (size, mtime)
+					new_chunks += 1
+
+			if new_chunks:
+				print(f"Appended {new_chunks} chunks ({len(consumed)} in total)")
+				last_chunk_time = time.time()
+			if run_complete:
+				print("Run complete")
+				break
+			if idle_timeout and time.time() - last_chunk_time > idle_timeout:
+				print(f"No new chunks for {idle_timeout} seconds, stopping")
+				break
+			time.sleep(poll_interval)
 
 
 # Parse arguments from the command line.
@@ -62,6 +227,12 @@ def parse_args():
 	parser.add_argument("--barcode", help="Barcode string", default=None)
 	parser.add_argument("--folder_name", help="basecaller (e.g. guppy, dorado etc)", default="guppy")
 	parser.add_argument("--output_prefix", help="Output file prefix", required=True)
+	parser.add_argument("--manifest", help="Run manifest from index_run_dir.py, used instead of walking the run directory", default=None)
+	parser.add_argument("--threads", help="Threads used to compress uncompressed *.fastq files", type=int, default=1)
+	parser.add_argument("--watch", help="Watch a live run directory, appending new chunks to the output and resuming from the consumed chunk manifest (standalone use, not within the pipeline)", action="store_true")
+	parser.add_argument("--poll_interval", help="Seconds between scans of the run directory in --watch mode [60]", type=float, default=60)
+	parser.add_argument("--settle_time", help="Seconds a chunk must be unmodified before it is appended in --watch mode [120]", type=float, default=120)
+	parser.add_argument("--idle_timeout", help="Stop --watch mode if no new chunks arrive for this many seconds, 0 to wait for the run to finish [3600]", type=float, default=3600)
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return parser.parse_args()
@@ -71,7 +242,10 @@ def parse_args():
 
 def main():
 	args = parse_args()
-	concatenate_fastq_files(args.input_dir, args.run_id, args.barcode, args.output_prefix, args.folder_name)
+	if args.watch:
+		watch_fastq_files(args.input_dir, args.run_id, args.barcode, args.output_prefix, args.folder_name, args.threads, args.poll_interval, args.settle_time, args.idle_timeout)
+	else:
+		concatenate_fastq_files(args.input_dir, args.run_id, args.barcode, args.output_prefix, args.folder_name, args.threads, args.manifest)
 
 if __name__ == "__main__":
 		main()
@@ -10,21 +10,176 @@ __author__ = 'D.J.BERGER'
 
 import os
 import argparse
+import numpy as np
+import pandas as pd
+from index_run_dir import read_manifest
+
+
+###### Constants
+
+SEQSUM_COLUMNS = {
+	'barcode_arrangement' : 'category',
+	'passes_filtering' : 'boolean',
+	'start_time' : 'float64',
+	'sequence_length_template' : 'uint32',
+	'mean_qscore_template' : 'float32',
+}
+CHUNK_SIZE = 1000000 # Sequencing summary rows per chunk
+LENGTH_BINS_PER_DECADE = 100 # Log10 read length histogram resolution (~2.3% bin width)
+LENGTH_DECADES = 7 # Read lengths up to 10 Mb
+QSCORE_BIN_WIDTH = 0.5
+QSCORE_MAX = 60
+TIME_BIN_WIDTH = 600 # Seconds per throughput bin
 
 
 ###### Functions
 
 # Identify folders containing sequencing summary file and create a symlink
-def create_sequencing_summary_symlink(input_dir, run_id):
-	search_dir = os.path.join(input_dir, run_id)
-	for root, _, files in os.walk(search_dir):
-		for filename in files:
-			if 'sequencing_summary' in filename:
-				filepath = os.path.join(root, filename)
-				try:
-					os.symlink(filepath, os.path.basename(filepath))
-				except OSError as e:
-					print(f"Warning: Unable to create symlink for {filepath}: {e}")
+def create_sequencing_summary_symlink(input_dir, run_id, manifest=None):
+	if manifest:
+		filepaths = [row['path'] for row in read_manifest(manifest, 'sequencing_summary')]
+	else:
+		search_dir = os.path.join(input_dir, run_id)
+		filepaths = [os.path.join(root, filename) for root, _, files in os.walk(search_dir) for filename in files if 'sequencing_summary' in filename]
+	for filepath in filepaths:
+		try:
+			os.symlink(filepath, os.path.basename(filepath))
+		except OSError as e:
+			print(f"Warning: Unable to create symlink for {filepath}: {e}")
+	return(filepaths)
+
+
+# Map a chunk of read lengths, Q-scores and start times to histogram bins
+def histogram_bins(lengths, qscores, start_times):
+	length_bins = np.floor(np.log10(np.maximum(lengths, 1)) * LENGTH_BINS_PER_DECADE).astype(np.int64)
+	length_bins = np.minimum(length_bins, LENGTH_BINS_PER_DECADE * LENGTH_DECADES - 1)
+	qscore_bins = np.clip(np.floor(np.nan_to_num(qscores) / QSCORE_BIN_WIDTH), 0, QSCORE_MAX / QSCORE_BIN_WIDTH - 1).astype(np.int64)
+	time_bins = np.floor(np.maximum(np.nan_to_num(start_times), 0) / TIME_BIN_WIDTH).astype(np.int64)
+	return length_bins, qscore_bins, time_bins
+
+
+# Add counts (and optionally bases) to a per-barcode histogram, growing it if new barcodes or bins appear
+def add_to_histogram(histogram, barcode_index, bins, weights=None):
+	n_barcodes = max(histogram.shape[0], int(barcode_index.max()) + 1)
+	n_bins = max(histogram.shape[1], int(bins.max()) + 1)
+	if (n_barcodes, n_bins) != histogram.shape:
+		grown = np.zeros((n_barcodes, n_bins), dtype=histogram.dtype)
+		grown[:histogram.shape[0], :histogram.shape[1]] = histogram
+		histogram = grown
+	counts = np.bincount(barcode_index * n_bins + bins, weights=weights, minlength=n_barcodes * n_bins)
+	histogram += counts.reshape(n_barcodes, n_bins).astype(histogram.dtype)
+	return histogram
+
+
+# Aggregate sequencing summary files in chunks, reading only the columns needed, into per-barcode read length, Q-score and throughput histograms
+def aggregate_sequencing_summaries(summary_files):
+	barcodes = {}
+	n_length_bins = LENGTH_BINS_PER_DECADE * LENGTH_DECADES
+	n_qscore_bins = int(QSCORE_MAX / QSCORE_BIN_WIDTH)
+	histograms = {
+		'length_reads' : np.zeros((0, n_length_bins), dtype=np.int64),
+		'length_bases' : np.zeros((0, n_length_bins), dtype=np.int64),
+		'qscore_reads' : np.zeros((0, n_qscore_bins), dtype=np.int64),
+		'time_reads' : np.zeros((0, 0), dtype=np.int64),
+		'time_bases' : np.zeros((0, 0), dtype=np.int64),
+	}
+	pass_reads = np.zeros(0, dtype=np.int64)
+	pass_bases = np.zeros(0, dtype=np.int64)
+
+	for summary_file in summary_files:
+		header = pd.read_csv(summary_file, sep='\t', nrows=0).columns
+		usecols = [column for column in SEQSUM_COLUMNS if column in header]
+		dtypes = {column: SEQSUM_COLUMNS[column] for column in usecols}
+		for chunk in pd.read_csv(summary_file, sep='\t', usecols=usecols, dtype=dtypes, chunksize=CHUNK_SIZE):
+			if chunk.empty:
+				continue
+			chunk_barcodes = chunk['barcode_arrangement'].astype(str).to_numpy() if 'barcode_arrangement' in chunk else np.full(len(chunk), 'all')
+			codes, uniques = pd.factorize(chunk_barcodes)
+			barcode_index = np.array([barcodes.setdefault(barcode, len(barcodes)) for barcode in uniques], dtype=np.int64)[codes]
+
+			lengths = chunk['sequence_length_template'].to_numpy(dtype=np.int64)
+			qscores = chunk['mean_qscore_template'].to_numpy(dtype=np.float64)
+			start_times = chunk['start_time'].to_numpy(dtype=np.float64)
+			length_bins, qscore_bins, time_bins = histogram_bins(lengths, qscores, start_times)
+
+			histograms['length_reads'] = add_to_histogram(histograms['length_reads'], barcode_index, length_bins)
+			histograms['length_bases'] = add_to_histogram(histograms['length_bases'], barcode_index, length_bins, lengths)
+			histograms['qscore_reads'] = add_to_histogram(histograms['qscore_reads'], barcode_index, qscore_bins)
+			histograms['time_reads'] = add_to_histogram(histograms['time_reads'], barcode_index, time_bins)
+			histograms['time_bases'] = add_to_histogram(histograms['time_bases'], barcode_index, time_bins, lengths)
+
+			passed = chunk['passes_filtering'].fillna(False).to_numpy(dtype=bool) if 'passes_filtering' in chunk else np.ones(len(chunk), dtype=bool)
+			pass_reads = np.pad(pass_reads, (0, len(barcodes) - len(pass_reads)))
+			pass_bases = np.pad(pass_bases, (0, len(barcodes) - len(pass_bases)))
+			pass_reads += np.bincount(barcode_index[passed], minlength=len(barcodes))
+			pass_bases += np.bincount(barcode_index[passed], weights=lengths[passed], minlength=len(barcodes)).astype(np.int64)
+
+	return list(barcodes), histograms, pass_reads, pass_bases
+
+
+# Estimate the N50 from the read length histogram, as the mean length of reads in the bin where half of the bases is reached
+def histogram_n50(length_reads, length_bases):
+	total_bases = length_bases.sum()
+	if total_bases == 0:
+		return 0
+	index = int(np.searchsorted(np.cumsum(length_bases), total_bases / 2))
+	return int(round(length_bases[index] / length_reads[index]))
+
+
+# Estimate the median from a histogram, as the lower edge of the bin containing the middle read
+def histogram_median(reads, bin_width):
+	if reads.sum() == 0:
+		return 0
+	return int(np.searchsorted(np.cumsum(reads), reads.sum() / 2)) * bin_width
+
+
+# Write per-barcode summary statistics and the histograms (long format) as a columnar cache, Parquet if pyarrow is available, otherwise a compressed TSV
+def write_aggregates(barcodes, histograms, pass_reads, pass_bases, output):
+	summary_rows = []
+	for index, barcode in enumerate(barcodes):
+		reads = int(histograms['length_reads'][index].sum())
+		bases = int(histograms['length_bases'][index].sum())
+		active_bins = np.flatnonzero(histograms['time_reads'][index])
+		summary_rows.append({
+			'barcode' : barcode,
+			'reads' : reads,
+			'bases' : bases,
+			'pass_reads' : int(pass_reads[index]),
+			'pass_bases' : int(pass_bases[index]),
+			'mean_length' : round(bases / reads, 1) if reads else 0,
+			'N50' : histogram_n50(histograms['length_reads'][index], histograms['length_bases'][index]),
+			'median_qscore' : histogram_median(histograms['qscore_reads'][index], QSCORE_BIN_WIDTH),
+			'run_hours' : round((active_bins[-1] + 1) * TIME_BIN_WIDTH / 3600, 2) if len(active_bins) else 0,
+		})
+	pd.DataFrame(summary_rows).to_csv(output + '.seqsum_summary.tsv', sep='\t', index=False)
+
+	length_edges = np.power(10, np.arange(LENGTH_BINS_PER_DECADE * LENGTH_DECADES + 1) / LENGTH_BINS_PER_DECADE)
+	metrics = [
+		('read_length', 'length_reads', 'length_bases', length_edges),
+		('qscore', 'qscore_reads', None, np.arange(histograms['qscore_reads'].shape[1] + 1) * QSCORE_BIN_WIDTH),
+		('start_time', 'time_reads', 'time_bases', np.arange(histograms['time_reads'].shape[1] + 1) * TIME_BIN_WIDTH),
+	]
+	frames = []
+	for metric, reads_key, bases_key, edges in metrics:
+		for index, barcode in enumerate(barcodes):
+			reads = histograms[reads_key][index]
+			bins = np.flatnonzero(reads)
+			frames.append(pd.DataFrame({
+				'barcode' : barcode,
+				'metric' : metric,
+				'bin_start' : edges[bins],
+				'bin_end' : edges[bins + 1],
+				'reads' : reads[bins],
+				'bases' : histograms[bases_key][index][bins] if bases_key else 0,
+			}))
+	histogram_table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['barcode', 'metric', 'bin_start', 'bin_end', 'reads', 'bases'])
+	histogram_table['barcode'] = histogram_table['barcode'].astype('category')
+	histogram_table['metric'] = histogram_table['metric'].astype('category')
+	try:
+		histogram_table.to_parquet(output + '.seqsum_histograms.parquet', index=False)
+	except ImportError:
+		print("Warning: pyarrow is not available, writing histograms as TSV")
+		histogram_table.to_csv(output + '.seqsum_histograms.tsv.gz', sep='\t', index=False)
 
 
 # Parse arguments from the command line.
@@ -33,6 +188,9 @@ def parse_args():
 	parser = argparse.ArgumentParser(description=description)
 	parser.add_argument("--input-dir", help="Input directory containing fastq files", required=True)
 	parser.add_argument("--run_id", help="Run ID", default=None)
+	parser.add_argument("--manifest", help="Run manifest from index_run_dir.py, used instead of walking the run directory", default=None)
+	parser.add_argument("--aggregate", help="Also aggregate the sequencing summaries into per-barcode statistics and histograms", action="store_true")
+	parser.add_argument("--output", help="Output prefix for --aggregate", default=None)
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return parser.parse_args()
@@ -41,7 +199,10 @@ def parse_args():
 ###### Main
 def main():
 	args = parse_args()
-	create_sequencing_summary_symlink(args.input_dir, args.run_id)
+	summary_files = create_sequencing_summary_symlink(args.input_dir, args.run_id, args.manifest)
+	if args.aggregate:
+		barcodes, histograms, pass_reads, pass_bases = aggregate_sequencing_summaries(summary_files)
+		write_aggregates(barcodes, histograms, pass_reads, pass_bases, args.output or args.run_id)
 
 if __name__ == "__main__":
 	main()
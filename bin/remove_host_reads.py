@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+# Remove host reads from a FASTQ file using minimap2 alignments and/or Kraken2 classifications against host databases
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import sys
+import gzip
+import argparse
+import numpy as np
+from array import array
+from itertools import islice
+
+
+###### Constants
+
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+BATCH_SIZE = 100000 # FASTQ records checked against the host read set per batch
+GZIP_LEVEL = 1 # Fast compression, the decontaminated reads are re-read by later steps rather than archived
+
+
+###### Functions
+
+# Hash a read ID to an unsigned 64-bit integer, Python's hash is only stable within a process so all IDs are hashed in this one
+def hash_read_id(read_id):
+	return hash(read_id) & HASH_MASK
+
+
+# Open a plain or gzip compressed file (or '-' for stdin) for reading in binary mode
+def open_input(file_name):
+	if file_name == '-':
+		return sys.stdin.buffer
+	with open(file_name, 'rb') as handle:
+		is_gzipped = handle.read(2) == b'\x1f\x8b'
+	return gzip.open(file_name, 'rb') if is_gzipped else open(file_name, 'rb')
+
+
+# Add the read IDs of mapped reads from minimap2 PAF or SAM output, PAF only lists mapped reads while SAM records with the unmapped flag are skipped
+def add_minimap2_hits(alignments, host_hashes):
+	with open_input(alignments) as handle:
+		for line in handle:
+			if line.startswith(b'@'):
+				continue
+			fields = line.split(b'\t', 5)
+			if len(fields) < 5:
+				continue
+			is_paf = fields[4] in (b'+', b'-')
+			if not is_paf and int(fields[1]) & 4:
+				continue
+			host_hashes.append(hash_read_id(fields[0]))
+
+
+# Add the read IDs of reads classified (to a host taxon) in Kraken2 per-read output
+def add_kraken2_hits(classifications, host_hashes):
+	with open_input(classifications) as handle:
+		for line in handle:
+			if line.startswith(b'C\t'):
+				host_hashes.append(hash_read_id(line.split(b'\t', 2)[1]))
+
+
+# Check a batch of read ID hashes against the sorted, unique host hashes
+def is_host(batch_hashes, host_hashes):
+	if len(host_hashes) == 0:
+		return np.zeros(len(batch_hashes), dtype=bool)
+	index = np.searchsorted(host_hashes, batch_hashes)
+	index[index == len(host_hashes)] = 0
+	return host_hashes[index] == batch_hashes
+
+
+# Stream the FASTQ in batches, writing non-host reads to the clean FASTQ and the IDs of removed reads to the host read list
+def filter_fastq(fastq, host_hashes, output):
+	total_reads = 0
+	host_reads = 0
+	with open_input(fastq) as fastq_in, gzip.open(output + '.fq.gz', 'wb', compresslevel=GZIP_LEVEL) as fastq_out, open(output + '.host_reads.txt', 'wb') as host_out:
+		while True:
+			lines = list(islice(fastq_in, BATCH_SIZE * 4))
+			if not lines:
+				break
+			read_ids = [header[1:].split(None, 1)[0] for header in lines[0::4]]
+			batch_hashes = np.fromiter((hash_read_id(read_id) for read_id in read_ids), dtype=np.uint64, count=len(read_ids))
+			host = is_host(batch_hashes, host_hashes)
+
+			clean = []
+			for record, read_id in enumerate(read_ids):
+				if host[record]:
+					host_out.write(read_id + b'\n')
+				else:
+					clean.extend(lines[record * 4:record * 4 + 4])
+			fastq_out.write(b''.join(clean))
+
+			total_reads += len(read_ids)
+			host_reads += int(host.sum())
+
+	return(total_reads, host_reads)
+
+
+# Parse arguments from the command line.
+def parse_args():
+	description = 'Remove host reads from a FASTQ file using minimap2 and/or Kraken2 results. Version: %s, Date: %s, Author: %s' % (__version__, __date__, __author__)
+	parser = argparse.ArgumentParser(description=description)
+	parser.add_argument("--fastq", required=True, help="Input FASTQ file (optionally gzip compressed)")
+	parser.add_argument("--minimap2", required=False, help="minimap2 alignments of the reads against the host (PAF or SAM, '-' for stdin)")
+	parser.add_argument("--kraken2", required=False, help="Kraken2 per-read classifications of the reads against a host database")
+	parser.add_argument("--output", required=True, help="Output prefix")
+	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
+
+	return parser.parse_args()
+
+
+###### Main
+def main():
+	args = parse_args()
+
+	host_hashes = array('Q')
+	if args.minimap2:
+		add_minimap2_hits(args.minimap2, host_hashes)
+	if args.kraken2:
+		add_kraken2_hits(args.kraken2, host_hashes)
+	host_hashes = np.unique(np.frombuffer(host_hashes, dtype=np.uint64))
+
+	total_reads, host_reads = filter_fastq(args.fastq, host_hashes, args.output)
+	print(f"{host_reads} of {total_reads} reads removed as host", file=sys.stderr)
+
+
+if __name__ == "__main__":
+	main()
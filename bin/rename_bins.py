@@ -9,40 +9,102 @@ __author__ = 'D.J.BERGER'
 ###### Imports
 
 import os
+import re
 import argparse
+from fasta_reader import iter_fasta
+
+###### Constants
+
+LINE_WIDTH = 60 # Line width used when a record with irregular line lengths has to be re-wrapped
 
 ###### Functions
 
+# Check a block of sequence lines has a fixed line width (as required for a .fai index), returns the number of bases per line or None
+def regular_line_width(seq_block):
+	if b"\r" in seq_block:
+		return None
+	line_bases = seq_block.find(b"\n")
+	if line_bases == -1:
+		line_bases = len(seq_block)
+	if line_bases == 0:
+		return None
+	if re.fullmatch(rb"(?:[^\n]{%d}\n)*[^\n]{1,%d}\n?" % (line_bases, line_bases), seq_block) is None:
+		return None
+	return line_bases
+
+
+# Make sure a block of sequence lines can be indexed, re-wrapping it if the line lengths are irregular
+def normalise_seq_block(seq_block):
+	line_bases = regular_line_width(seq_block)
+	if line_bases is not None:
+		if not seq_block.endswith(b"\n"):
+			seq_block += b"\n"
+		return seq_block, line_bases
+	seq = seq_block.translate(None, b"\r\n")
+	seq_block = b"".join(seq[i:i + LINE_WIDTH] + b"\n" for i in range(0, len(seq), LINE_WIDTH))
+	return seq_block, LINE_WIDTH
+
+
 # Iterate through FASTA files, separate binned and unbinned MAGs, rename files (with bin ID or as 'unbinned') and contig number per-group
-def rename_fasta_files_and_headers(input_dir, prefix):
+# Optionally write the concatenated complete assembly, its .fai index and a map of original to new contig IDs in the same pass
+def rename_fasta_files_and_headers(input_dir, prefix, complete_assembly=None, contig_map=None):
 	bin_count = 1 # Counter to ensure unique bin IDs
 
-	for filename in os.listdir(input_dir):
-		if filename.endswith(".fa") or filename.endswith(".fasta"): # Open FASTAs and create file name / header prefixes
-			if filename.endswith('unbinned.fa'): # If unbinned
-				new_filename = f"{prefix}.unbinned.fasta"
-				header_prefix = f"{prefix}.unbinned.contig_"
-			else: # If binned
-				bx = ("%06d" % (bin_count,))
-				new_filename = f"{prefix}.bin_{bx}.fasta"
-				header_prefix = f"{prefix}.bin_{bx}.contig_"
-				bin_count += 1
-				contig_count = 1
-
-			input_file = os.path.join(input_dir, filename)
-			output_file = os.path.join(input_dir, new_filename)
-
-			with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-				contig_count = 1 # Write contigs and headers to file incrementing contig number labels
-				for line in infile:
-					if line.startswith(">"):
-						cx = ("%06d" % (contig_count,))
-						outfile.write(f">{header_prefix}{cx}\n")
-						contig_count += 1
-					else:
-						outfile.write(line)
-
-			os.remove(input_file)
+	# Sort input files so bin numbering does not depend on the directory listing, unbinned contigs are written last
+	filenames = sorted(filename for filename in os.listdir(input_dir) if filename.endswith(".fa") or filename.endswith(".fasta"))
+	filenames.sort(key=lambda filename: filename.endswith('unbinned.fa'))
+
+	complete_out = open(complete_assembly, 'wb') if complete_assembly else None
+	fai_out = open(complete_assembly + '.fai', 'w') if complete_assembly else None
+	map_out = open(contig_map, 'w') if contig_map else None
+	if map_out:
+		map_out.write("original_id\tcontig_id\tbin\n")
+	offset = 0 # Byte offset in the complete assembly
+
+	for filename in filenames: # Open FASTAs and create file name / header prefixes
+		if filename.endswith('unbinned.fa'): # If unbinned
+			bin_id = "unbinned"
+		else: # If binned
+			bx = ("%06d" % (bin_count,))
+			bin_id = f"bin_{bx}"
+			bin_count += 1
+		new_filename = f"{prefix}.{bin_id}.fasta"
+		header_prefix = f"{prefix}.{bin_id}.contig_"
+
+		input_file = os.path.join(input_dir, filename)
+		output_file = os.path.join(input_dir, new_filename)
+
+		with open(output_file, 'wb') as outfile:
+			contig_count = 1 # Write contigs and headers to file incrementing contig number labels, sequence lines are copied as whole blocks
+			for header, seq_block in iter_fasta(input_file, raw=True):
+				cx = ("%06d" % (contig_count,))
+				contig_id = f"{header_prefix}{cx}"
+				header_line = f">{contig_id}\n".encode()
+				seq_block, line_bases = normalise_seq_block(seq_block) if complete_out else (seq_block, None)
+				if seq_block and not seq_block.endswith(b"\n"):
+					seq_block += b"\n"
+				outfile.write(header_line)
+				outfile.write(seq_block)
+
+				if complete_out:
+					complete_out.write(header_line)
+					complete_out.write(seq_block)
+					offset += len(header_line)
+					seq_len = len(seq_block) - seq_block.count(b"\n")
+					fai_out.write(f"{contig_id}\t{seq_len}\t{offset}\t{line_bases}\t{line_bases + 1}\n")
+					offset += len(seq_block)
+
+				if map_out:
+					original_id = (header.split(maxsplit=1) or [b""])[0].decode()
+					map_out.write(f"{original_id}\t{contig_id}\t{bin_id}\n")
+
+				contig_count += 1
+
+		os.remove(input_file)
+
+	for handle in (complete_out, fai_out, map_out):
+		if handle:
+			handle.close()
 
 # Parse arguments from the command line.
 def parse_args():
@@ -50,6 +112,8 @@ def parse_args():
 	parser = argparse.ArgumentParser(description=description)
 	parser.add_argument("--input_dir",type=str, help="Input directory containing FASTA files")
 	parser.add_argument("--prefix", type=str, help="Prefix for renaming files and headers")
+	parser.add_argument("--complete_assembly", type=str, default=None, help="Also write all renamed contigs to this FASTA, with a .fai index (optional)")
+	parser.add_argument("--contig_map", type=str, default=None, help="Also write a TSV mapping original to renamed contig IDs (optional)")
 	parser.add_argument("--version", action="version", version='Version: %s' % (__version__))
 
 	return parser.parse_args()
@@ -58,7 +122,7 @@ def parse_args():
 ###### Main
 def main():
 	args = parse_args()
-	rename_fasta_files_and_headers(args.input_dir, args.prefix)
+	rename_fasta_files_and_headers(args.input_dir, args.prefix, args.complete_assembly, args.contig_map)
 
 if __name__ == "__main__":
 	main()
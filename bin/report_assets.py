@@ -0,0 +1,73 @@
+# Shared plotly.js asset for LOMA HTML reports.
+# Figures are written as JSON-only divs (pio.to_html with include_plotlyjs=False) and plotly.js is injected once per page, either inline, from the CDN, from a versioned file next to the report or from a shared directory or web server.
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import os
+import gzip
+import tempfile
+import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+
+###### Constants
+
+PLOTLYJS_HELP = "How reports load plotly.js: 'inline' (once per report, default), 'cdn', 'file' (a plotly-<version>.min.js (and .gz) written next to the report, to be published with it), an absolute directory holding a shared copy, or the http(s) URL of a directory serving one"
+
+
+###### Functions
+
+# Serialise a figure as a div with its JSON data and Plotly.newPlot call, without a copy of plotly.js
+# An optional post_script runs after the plot is created, with '{plot_id}' replaced by the id of its div
+def figure_div(fig, post_script=None):
+	return(pio.to_html(fig, full_html=False, include_plotlyjs=False, post_script=post_script))
+
+
+# Write data to a file through a unique temporary file in the same directory, so concurrent writers never share or expose a partial file
+def write_atomic(path, data):
+	fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+	try:
+		with os.fdopen(fd, 'wb') as tmp_out:
+			tmp_out.write(data)
+		os.chmod(tmp_path, 0o644)
+		os.replace(tmp_path, path)
+	except BaseException:
+		os.remove(tmp_path)
+		raise
+
+
+# Write plotly-<version>.min.js (and a gzip precompressed copy for web servers) to a shared directory, unless already present
+# The .gz is written first, so an existing .js always has its precompressed copy
+def write_plotlyjs_asset(asset_dir):
+	asset = os.path.join(asset_dir, f"plotly-{get_plotlyjs_version()}.min.js")
+	if not os.path.exists(asset):
+		os.makedirs(asset_dir, exist_ok=True)
+		plotlyjs = get_plotlyjs().encode('utf-8')
+		write_atomic(asset + '.gz', gzip.compress(plotlyjs, compresslevel=9, mtime=0))
+		write_atomic(asset, plotlyjs)
+	return(asset)
+
+
+# Get the <script> tag loading plotly.js for a report page
+# Only files next to the report are referenced relatively, other locations must be absolute as the report is published away from where it is written
+def plotlyjs_tag(mode, report):
+	asset_name = f"plotly-{get_plotlyjs_version()}.min.js"
+	if mode == 'inline':
+		return(f'<script type="text/javascript">{get_plotlyjs()}</script>')
+	if mode == 'cdn':
+		return(f'<script charset="utf-8" src="https://cdn.plot.ly/{asset_name}"></script>')
+	if mode == 'file':
+		write_plotlyjs_asset(os.path.dirname(os.path.abspath(report)))
+		src = asset_name
+	elif mode.startswith(('http://', 'https://')):
+		src = mode.rstrip('/') + '/' + asset_name
+	elif os.path.isabs(mode):
+		src = write_plotlyjs_asset(mode)
+	else:
+		raise ValueError(f"--plotlyjs must be 'inline', 'cdn', 'file', an absolute directory or an http(s) URL, not '{mode}'")
+	return(f'<script charset="utf-8" src="{src}"></script>')
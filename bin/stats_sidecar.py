@@ -0,0 +1,116 @@
+# Read and write the assembly statistics sidecar produced by assembly_stats.py.
+# The sidecar is a JSON file keyed by the SHA-256 of each FASTA file, with per-record arrays (lengths, GC and N counts) stored in a compact binary file of little-endian uint64 values.
+
+__version__ = '0.1'
+__date__ = '18-10-2026'
+__author__ = 'D.J.BERGER'
+
+
+###### Imports
+
+import os
+import sys
+import json
+import hashlib
+from array import array
+from itertools import accumulate
+
+
+###### Constants
+
+SIDECAR_VERSION = 1
+ARRAY_TYPECODE = 'Q' # uint64
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+###### Functions
+
+# Calculate a SHA-256 content hash of a file
+def hash_file(file_path):
+	digest = hashlib.sha256()
+	with open(file_path, 'rb') as handle:
+		for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b''):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+# Calculate the full Nx/Lx curves (x = 1..100) and auN from a list of lengths in a single pass over the cumulative sum
+def length_curves(lengths):
+	lengths = sorted(lengths, reverse=True)
+	total_len = sum(lengths)
+	nx = []
+	lx = []
+	x = 1
+	for index, (length, cumulative) in enumerate(zip(lengths, accumulate(lengths))):
+		while x <= 100 and cumulative >= total_len * x / 100:
+			nx.append(length)
+			lx.append(index + 1)
+			x += 1
+		if x > 100:
+			break
+	aun = round(sum(length * length for length in lengths) / total_len, 2) if total_len else None
+	return {'total_bp': total_len, 'count': len(lengths), 'nx': nx, 'lx': lx, 'auN': aun}
+
+
+# Write the sidecar JSON and binary array file, arrays from every entry are appended to the same binary file
+# FASTA files with identical content share one entry, listing each file it was seen as
+def write_sidecar(output, entries, gap_size):
+	json_path = output + '.assembly_stats.json'
+	arrays_path = output + '.assembly_stats.lengths.bin'
+	sidecar = {
+		'version' : SIDECAR_VERSION,
+		'gap' : int(gap_size),
+		'arrays_file' : os.path.basename(arrays_path),
+		'arrays_dtype' : 'uint64-le',
+		'fastas' : {},
+	}
+
+	offset = 0
+	with open(arrays_path, 'wb') as arrays_out:
+		for file_hash, entry, arrays in entries:
+			if file_hash in sidecar['fastas']:
+				sidecar['fastas'][file_hash]['files'].extend(entry['files'])
+				continue
+			entry['arrays'] = {}
+			for name, values in arrays.items():
+				values = array(ARRAY_TYPECODE, values)
+				if sys.byteorder != 'little':
+					values.byteswap()
+				values.tofile(arrays_out)
+				entry['arrays'][name] = {'offset' : offset, 'count' : len(values)}
+				offset += len(values)
+			sidecar['fastas'][file_hash] = entry
+
+	with open(json_path, 'w') as json_out:
+		json.dump(sidecar, json_out)
+
+
+# Load the sidecar JSON
+def load_sidecar(json_path):
+	with open(json_path, 'r') as json_in:
+		sidecar = json.load(json_in)
+	if sidecar.get('version') != SIDECAR_VERSION:
+		raise ValueError(f"Unsupported assembly stats sidecar version in {json_path}")
+	sidecar['arrays_path'] = os.path.join(os.path.dirname(json_path), sidecar['arrays_file'])
+	return sidecar
+
+
+# Find a sidecar entry by its role ('bin' or 'complete_assembly') and optionally bin ID
+def find_entry(sidecar, role, bin_id=None):
+	for entry in sidecar['fastas'].values():
+		for fasta in entry['files']:
+			if fasta['role'] == role and (bin_id is None or fasta['bin'] == bin_id):
+				return entry
+	return None
+
+
+# Read a single per-record array (e.g. 'lengths') for an entry from the binary file
+def load_array(sidecar, entry, name):
+	location = entry['arrays'][name]
+	values = array(ARRAY_TYPECODE)
+	with open(sidecar['arrays_path'], 'rb') as arrays_in:
+		arrays_in.seek(location['offset'] * values.itemsize)
+		values.fromfile(arrays_in, location['count'])
+	if sys.byteorder != 'little':
+		values.byteswap()
+	return values
@@ -15,6 +15,7 @@ import datetime
 from jinja2 import Environment, FileSystemLoader
 import os
 import base64
+from stats_sidecar import load_sidecar, find_entry
 
 ###### Functions
 
@@ -97,10 +98,14 @@ def process_bracken_all(bracken_all_results, min_read_count, min_read_prop):
 	return bracken_all_data
 
 
-# Combine contig summary states and calculate contig N50
-def process_contig_summary(contig_summary_ccvals):
+# Combine contig summary states and calculate contig N50 (taken from the assembly stats sidecar if available)
+def process_contig_summary(contig_summary_ccvals, assembly_stats=None):
 	contig_summary = pd.read_csv(contig_summary_ccvals, sep='\t')
-	total_length = contig_summary['Contig length (bp)'].sum()
+	complete_assembly = find_entry(load_sidecar(assembly_stats), 'complete_assembly') if assembly_stats else None
+	if complete_assembly:
+		total_length = complete_assembly['stats']['assembly_length_bp']
+	else:
+		total_length = contig_summary['Contig length (bp)'].sum()
 	count_total_contigs = len(contig_summary)
 
 	ctax = contig_summary.dropna(subset=['skani: Contig average nucleotide identity to reference'])
@@ -111,15 +116,18 @@ def process_contig_summary(contig_summary_ccvals):
 	count_binned = round(((len(contig_summary[~filter]['Contig length (bp)'])/count_total_contigs)*100),2)
 	perc_binned = round(((length_binned/total_length)*100),2)
 
-	contig_lengths = sorted((contig_summary['Contig length (bp)'].astype(int).tolist()), reverse=True)
+	if complete_assembly:
+		c50 = complete_assembly['stats']['scaffold_N50_bp']
+	else:
+		contig_lengths = sorted((contig_summary['Contig length (bp)'].astype(int).tolist()), reverse=True)
 
-	cumulative_length = 0
-	half_len = (total_length/2)
-	for length in contig_lengths:
-		cumulative_length += length
-		if cumulative_length >= half_len:
-			c50 = length
-			break
+		cumulative_length = 0
+		half_len = (total_length/2)
+		for length in contig_lengths:
+			cumulative_length += length
+			if cumulative_length >= half_len:
+				c50 = length
+				break
 
 	contig_data = {
 		'total_length' : round((total_length/1000000),2),
@@ -474,6 +482,7 @@ def parse_args():
 	parser.add_argument('--min_read_prop', required=False, help="Min proportion of reads required to retain taxonomic hit", default=0)
 	parser.add_argument('--min_read_count', required=False, help="Min count of reads required to retain taxonomic hit", default=0)
 	parser.add_argument('--contig_summary', required=False, help="Contig summary file")
+	parser.add_argument('--assembly_stats', required=False, help="Assembly stats sidecar (*.assembly_stats.json)")
 	parser.add_argument('--bin_summary', required=False, help='Bin summary file')
 	parser.add_argument('--krocus', required=False, nargs = '*', help='Krocus_ccvals')
 	parser.add_argument('--mlst', required=False, nargs = '*', help='MLST ccvals')
@@ -528,7 +537,7 @@ def main():
 		bin_summary_clean = "None"
 
 	if args.contig_summary:
-		contig_data = process_contig_summary(args.contig_summary)
+		contig_data = process_contig_summary(args.contig_summary, args.assembly_stats)
 	else:
 		contig_data = "None"
 
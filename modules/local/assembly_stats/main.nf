@@ -1,16 +1,17 @@
 process ASSEMBLY_STATS {
     tag "$meta.id"
-    label 'process_single'
+    label 'process_low'
 
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
         'quay.io/biocontainers/biopython@sha256:f85da084589c559a5b99f3075cd4c5eeb1d846d37bc43dd0ee9d1b834dbafbbb' :
         'quay.io/biocontainers/biopython@sha256:f85da084589c559a5b99f3075cd4c5eeb1d846d37bc43dd0ee9d1b834dbafbbb' }"
 
     input:
-    tuple val(meta), path(fasta, stageAs: "input_bins/*")
+    tuple val(meta), path(fasta, stageAs: "input_bins/*"), path(complete_assembly)
 
     output:
     tuple val(meta), path("*.assembly_stats.csv"), emit: asm_stats
+    tuple val(meta), path("*.assembly_stats.json"), path("*.assembly_stats.lengths.bin"), emit: sidecar
     path "versions.yml", emit: versions
 
     when:
@@ -22,6 +23,9 @@ process ASSEMBLY_STATS {
     """
     assembly_stats.py \\
          --fasta_dir input_bins/ \\
+         --threads ${task.cpus} \\
+         --sidecar \\
+         --complete_assembly ${complete_assembly} \\
          --output ${prefix}
 
     cat <<-END_VERSIONS > versions.yml
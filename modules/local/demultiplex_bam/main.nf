@@ -0,0 +1,43 @@
+process DEMULTIPLEX_BAM {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda "${moduleDir}/environment.yml"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'quay.io/biocontainers/samtools:1.20--h50ea8bc_0' :
+        'https://depot.galaxyproject.org/singularity/samtools:1.20--h50ea8bc_0' }"
+
+    input:
+    tuple val(meta), val(bins), path(bam), path(contig_map)
+
+    output:
+    tuple val(meta), path("*.fastq.gz"), emit: fastq
+    path  "versions.yml"           , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    def bin_list = bins.unique().join(',')
+    """
+    # Stream the BAM once (primary alignments only, as samtools fastq would keep), assigning each read to the bin of its reference contig
+    # Every target bin has its own samtools fastq writer, so each gets a FASTQ even if no reads map to it, and the task fails if any writer does
+    samtools view -@ ${task.cpus} -h -F 0x900 $bam \\
+        | awk -v bins="${bin_list}" -v prefix="${prefix}" -v args="${args}" 'BEGIN{
+                FS=OFS="\\t"
+                n=split(bins, b, ",")
+                for (i=1; i<=n; i++) writer[b[i]]="samtools fastq " args " -0 " prefix "." b[i] ".fastq.gz -"
+            }
+            NR==FNR {if (FNR > 1 && (\$3 in writer)) contig_bin[\$2]=\$3; next}
+            /^@/ {for (t in writer) print | writer[t]; next}
+            (\$3 in contig_bin) && !(\$1 in seen) {seen[\$1]=1; print | writer[contig_bin[\$3]]}
+            END {for (t in writer) if (close(writer[t]) != 0) failed=1; exit failed}' $contig_map -
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        samtools: \$(echo \$(samtools --version 2>&1) | sed 's/^.*samtools //; s/Using.*\$//')
+    END_VERSIONS
+    """
+}
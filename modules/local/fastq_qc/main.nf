@@ -0,0 +1,36 @@
+process FASTQ_QC {
+    tag "$meta.id"
+    label 'process_low'
+
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'quay.io/djberger/lma_img:latest' :
+        'quay.io/djberger/lma_img:latest' }"
+
+    input:
+    tuple val(meta), path(fastq)
+    val(endseq_len)
+
+    output:
+    tuple val(meta), path("*.fw.txt"), path("*.rv.txt"), path("*.NanoStats.txt"), path("*.read_hist.tsv"), emit: qc_input
+    path "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    fastq_qc.py \\
+       --fastq $fastq \\
+       --endseq_len $endseq_len \\
+       --threads $task.cpus \\
+       --output ${prefix} \\
+       $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        fastq_qc.py: \$(fastq_qc.py --version 2>&1 | cut -f2 -d " ")
+    END_VERSIONS
+    """
+}
@@ -7,7 +7,7 @@ process FETCH_FASTQ {
         'quay.io/djberger/lma_img:latest' }"
 
     input:
-    val(meta)
+    tuple val(meta), path(manifest)
 
     output:
     tuple val(meta), path("*.fastq.gz"), optional: true, emit: reads
@@ -26,7 +26,10 @@ process FETCH_FASTQ {
        --input-dir $params.run_dir \\
        --run_id ${meta.run_id} \\
        --output_prefix ${prefix} \\
-       --folder_name guppy ${barcode_in}
+       --manifest ${manifest} \\
+       --threads ${task.cpus} \\
+       --folder_name guppy ${barcode_in} \\
+       $args
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -7,10 +7,12 @@ process FETCH_SEQSUM {
         'quay.io/djberger/lma_img:latest' }"
 
     input:
-    val(meta)
+    tuple val(meta), path(manifest)
 
     output:
     tuple val(meta), path("sequencing_summary*"), optional: true, emit: sequencing_summary
+    tuple val(meta), path("*.seqsum_summary.tsv"), optional: true, emit: seqsum_summary
+    tuple val(meta), path("*.seqsum_histograms.*"), optional: true, emit: seqsum_histograms
     path "versions.yml", emit: versions
 
     when:
@@ -23,7 +25,10 @@ process FETCH_SEQSUM {
     """
     process_seqsum.py \\
        --input-dir $params.run_dir \\
-       --run_id ${prefix}
+       --run_id ${prefix} \\
+       --manifest ${manifest} \\
+       --aggregate \\
+       --output ${prefix}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
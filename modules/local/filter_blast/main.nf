@@ -24,6 +24,7 @@ process FILTER_BLAST {
     filter_blasthits.py \\
        --workflow workflow.txt \\
        --blast_results ${blast_results} \\
+       --streaming \\
        --output $prefix
 
     cat <<-END_VERSIONS > versions.yml
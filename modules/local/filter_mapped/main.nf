@@ -1,35 +0,0 @@
-process FILTER_MAPPED {
-    tag "$meta.id"
-    label 'process_medium'
-
-    conda "${moduleDir}/environment.yml"
-    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
-        'quay.io/biocontainers/samtools:1.20--h50ea8bc_0' : 
-        'https://depot.galaxyproject.org/singularity/samtools:1.20--h50ea8bc_0' }"
-
-    input:
-    tuple val(meta), path(bam)
-
-    output:
-    tuple val(meta), path("*.minimap2.human_reads.txt"), optional: true, emit: read_list
-    path "versions.yml"           , emit: versions
-
-    when:
-    task.ext.when == null || task.ext.when
-
-    script:
-    def args = task.ext.args ?: ''
-    def prefix = task.ext.prefix ?: "${meta.id}"
-    """
-    samtools \\
-        view \\
-        -@ ${task.cpus} \\
-        -F 4 \\
-        $bam | cut -f1 | sort | uniq > ${prefix}.minimap2.human_reads.txt
-
-    cat <<-END_VERSIONS > versions.yml
-    "${task.process}":
-        samtools: \$(echo \$(samtools --version 2>&1) | sed 's/^.*samtools //; s/Using.*\$//')
-    END_VERSIONS
-    """
-}
@@ -0,0 +1,35 @@
+process INDEX_RUN {
+    tag "$meta"
+    label 'process_single'
+
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'quay.io/djberger/lma_img:latest' :
+        'quay.io/djberger/lma_img:latest' }"
+
+    input:
+    val(meta)
+
+    output:
+    tuple val(meta), path("*.run_index.tsv"), emit: manifest
+    path "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta}"
+
+    """
+    index_run_dir.py \\
+       --input-dir $params.run_dir \\
+       --run_id ${meta} \\
+       --folder_name guppy \\
+       --output ${prefix}.run_index.tsv
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        index_run_dir.py: \$(index_run_dir.py --version 2>&1 | cut -f2 -d " ")
+    END_VERSIONS
+    """
+}
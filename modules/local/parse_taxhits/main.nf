@@ -14,7 +14,7 @@ process PARSE_TAXHITS {
     val(mode)
 
     output:
-    tuple val(meta), path("*.target_species.tsv"), emit: targets_filtered
+    tuple val(meta), path("*/*.target_species.tsv"), emit: targets_filtered
     path "versions.yml"           , emit: versions
 
     when:
@@ -22,14 +22,16 @@ process PARSE_TAXHITS {
 
     script:
     def args = task.ext.args ?: ''
-    def prefix = task.ext.prefix ?: "${meta.id}"
+    def outputs = meta.samples.keySet().collect { "${it}/${it}" }.join(' ')
     def opt = mode.matches("Sylph") ? "--gtdb_fn $params.TAXONOMIC_PROFILING.gtdb_metadata" : ""
+    def taxdump = (mode.matches("Bracken") && params.TAXONOMIC_PROFILING.dbdir) ? "--taxdump $params.TAXONOMIC_PROFILING.dbdir" : ""
 
     """
     parse_taxonomic_hits.py \\
        $opt \\
+       $taxdump \\
        --taxhits $bracken_taxhits \\
-       --output ${prefix} \\
+       --output $outputs \\
        --targets $targets \\
        --min_reads $min_reads \\
        --min_frac $min_frac \\
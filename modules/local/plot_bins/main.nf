@@ -8,7 +8,7 @@ process PLOT_BINS {
         'quay.io/djberger/lma_img:latest' }"
 
     input:
-    tuple val(meta), path(cov), path(fstats), path(skani), path(plasmid_score), path(checkm), path(bin_tax), path(asm_stats)
+    tuple val(meta), path(cov), path(skani), path(plasmid_score), path(checkm), path(bin_tax), path(asm_stats), path(asm_sidecar), path(asm_sidecar_arrays)
     path(syl_fn)
     path(template)
 
@@ -16,6 +16,7 @@ process PLOT_BINS {
     tuple val(meta), path("*.html"), path("*.html"), emit: html 
     tuple val(meta), path("*.contig_summary.tsv"), emit: contig_summary
     tuple val(meta), path("*.bin_summary.tsv"), emit: bin_summary
+    tuple val(meta), path("plotly-*.min.js*"), optional: true, emit: plotlyjs
     path "versions.yml", emit: versions
 
     when:
@@ -30,7 +31,7 @@ process PLOT_BINS {
        $args \\
        --asm_stats $asm_stats \\
        --cov $cov \\
-       --fstats $fstats \\
+       --asm_sidecar $asm_sidecar \\
        --bin_tax *.bac*.summary.tsv \\
        --checkm $checkm \\
        --skani $skani \\
@@ -15,6 +15,7 @@ process PLOT_INDVTAXHITS {
 
     output:
     tuple val(meta), path("*.html"), emit: report
+    tuple val(meta), path("plotly-*.min.js*"), optional: true, emit: plotlyjs
     path "versions.yml", emit: versions
 
 
@@ -29,6 +30,7 @@ process PLOT_INDVTAXHITS {
     def bracken_kraken2 = mode.matches("Kraken2, Bracken") ? "--bracken_kraken2 $taxhits" : ""
     def bracken_centrifuger = mode.matches("Centrifuger, Bracken") ? "--bracken_centrifuger $taxhits" : ""
     def sylph = mode.matches("Sylph") ? "--sylph $taxhits --syl_fn $db" : ""
+    def taxdump = (mode.endsWith("Taxpasta") && params.TAXONOMIC_PROFILING.dbdir) ? "--taxdump $params.TAXONOMIC_PROFILING.dbdir" : ""
 
     """
     plot_taxhits.py \\
@@ -38,6 +40,7 @@ process PLOT_INDVTAXHITS {
        $bracken_kraken2 \\
        $bracken_centrifuger \\
        $sylph \\
+       $taxdump \\
        --logo $params.logo \\
        --sample_id ${meta.id} \\
        --run_id ${meta.run_id} \\
@@ -14,6 +14,7 @@ process PLOT_TAXHITS {
 
     output:
     tuple val(meta), path("*.html"), emit: report
+    tuple val(meta), path("plotly-*.min.js*"), optional: true, emit: plotlyjs
     path "versions.yml", emit: versions
 
     when:
@@ -24,12 +25,14 @@ process PLOT_TAXHITS {
     def prefix = task.ext.prefix ?: "${meta.id}"
     """
     plot_taxhits.py \\
+       $args \\
        --taxpasta_kraken2 $taxpasta_kraken \\
        --taxpasta_centrifuger $taxpasta_centrifuger \\
        --sylph $sylph \\
        --bracken_kraken2 $kraken2_bracken \\
        --bracken_centrifuger $centrifuger_bracken \\
        --syl_fn $syl_fn \\
+       --taxdump $params.TAXONOMIC_PROFILING.dbdir \\
        --logo $params.logo \\
        --sample_id ${meta.id} \\
        --run_id ${meta.run_id} \\
@@ -0,0 +1,38 @@
+process REMOVE_HOST_READS {
+    tag "$meta.id"
+    label 'process_low'
+
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'quay.io/djberger/lma_img:latest' :
+        'quay.io/djberger/lma_img:latest' }"
+
+    input:
+    tuple val(meta), path(fastq), path(minimap2_hits), path(kraken2_hits)
+
+    output:
+    tuple val(meta), path("*.fq.gz"), emit: clean_reads
+    tuple val(meta), path("*.host_reads.txt"), emit: host_readlist
+    path "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    def minimap2_input = minimap2_hits ? "--minimap2 ${minimap2_hits}" : ""
+    def kraken2_input = kraken2_hits ? "--kraken2 ${kraken2_hits}" : ""
+    """
+    remove_host_reads.py \\
+       --fastq $fastq \\
+       $minimap2_input \\
+       $kraken2_input \\
+       --output ${prefix} \\
+       $args
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        remove_host_reads.py: \$(remove_host_reads.py --version 2>&1 | cut -f2 -d " ")
+    END_VERSIONS
+    """
+}
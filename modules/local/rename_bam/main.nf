@@ -0,0 +1,55 @@
+process RENAME_BAM {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda "${moduleDir}/environment.yml"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'quay.io/biocontainers/samtools:1.20--h50ea8bc_0' :
+        'https://depot.galaxyproject.org/singularity/samtools:1.20--h50ea8bc_0' }"
+
+    input:
+    tuple val(meta), path(bam), path(contig_map), path(fai)
+
+    output:
+    tuple val(meta), path("*.bam"), emit: bam
+    tuple val(meta), path("*.bai"), emit: bai
+    path  "versions.yml"           , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    # Header: @HD, @SQ lines in complete assembly order (from the .fai), then the remaining header lines of the original alignment
+    samtools view -H $bam | awk '/^@HD/' > ${prefix}.header.sam
+    awk 'BEGIN{OFS="\\t"} {print "@SQ", "SN:"\$1, "LN:"\$2}' $fai >> ${prefix}.header.sam
+    samtools view -H $bam | awk '!/^@HD/ && !/^@SQ/' >> ${prefix}.header.sam
+
+    # Records: rename the reference, mate reference and supplementary alignment (SA tag) contigs using the contig map, keeping SA contigs missing from the map as they are
+    samtools view -@ ${task.cpus} $bam \\
+        | awk 'BEGIN{FS=OFS="\\t"}
+            NR==FNR {if (FNR > 1) map[\$1]=\$2; next}
+            \$3 != "*" {if (!(\$3 in map)) next; \$3=map[\$3]}
+            \$7 != "*" && \$7 != "=" && (\$7 in map) {\$7=map[\$7]}
+            {
+                for (i=12; i<=NF; i++) {
+                    if (substr(\$i, 1, 5) != "SA:Z:") continue
+                    n=split(substr(\$i, 6), sa, ";"); tag="SA:Z:"
+                    for (j=1; j<n; j++) {split(sa[j], f, ","); tag=tag ((f[1] in map) ? map[f[1]] : f[1]) substr(sa[j], length(f[1])+1) ";"}
+                    \$i=tag
+                }
+                print
+            }' $contig_map - \\
+        | cat ${prefix}.header.sam - \\
+        | samtools sort -@ ${task.cpus} $args -o ${prefix}.bam -
+
+    samtools index -@ ${task.cpus} ${prefix}.bam
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        samtools: \$(echo \$(samtools --version 2>&1) | sed 's/^.*samtools //; s/Using.*\$//')
+    END_VERSIONS
+    """
+}
@@ -12,6 +12,8 @@ process RENAME_CONTIGS {
     output:
     tuple val(meta), path("assembled_bins/*[!unbinned].fasta"), optional: true, emit: assembled_bins
     tuple val(meta), path("*.complete_assembly.fasta"), emit: complete_assembly
+    tuple val(meta), path("*.complete_assembly.fasta.fai"), emit: fai
+    tuple val(meta), path("*.contig_map.tsv"), emit: contig_map
     tuple val(meta), path("assembled_bins/*.unbinned.fasta"), optional: true, emit: unbinned
     path "versions.yml", emit: versions
 
@@ -29,9 +31,9 @@ process RENAME_CONTIGS {
 
     rename_bins.py \\
        --input_dir assembled_bins/ \\
-       --prefix ${meta.id}
-
-    cat assembled_bins/* > ${prefix}.complete_assembly.fasta
+       --prefix ${meta.id} \\
+       --complete_assembly ${prefix}.complete_assembly.fasta \\
+       --contig_map ${prefix}.contig_map.tsv
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -38,6 +38,7 @@ process SUMMARIZE_RESULTS {
     def in_14 = input_files.toString().contains(".ecoli_typing_short.tsv") ? "--ecoli_typing RESULTS/*.ecoli_typing_short.tsv" : ""
     def in_15 = input_files.toString().contains(".bracken_centrifuger.target_species.tsv") ? "--centrifuger_bracken_targets RESULTS/*.bracken_centrifuger.target_species.tsv" : ""
     def in_16 = input_files.toString().contains(".bracken_centrifuger.tsv") ? "--centrifuger_bracken_all RESULTS/*.bracken_centrifuger.tsv" : ""
+    def in_17 = input_files.toString().contains(".assembly_stats.json") ? "--assembly_stats RESULTS/*.assembly_stats.json" : ""
 
 
     """
@@ -69,6 +70,7 @@ process SUMMARIZE_RESULTS {
        $in_14 \\
        $in_15 \\
        $in_16 \\
+       $in_17 \\
        --tax_mode $params.SUMMARIZE_RESULTS.tax_mode \\
        --report_template $template
 
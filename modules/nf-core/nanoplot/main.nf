@@ -15,7 +15,6 @@ process NANOPLOT {
     tuple val(meta), path("*.png") , optional: true, emit: png
     tuple val(meta), path("*.txt") , emit: txt
     tuple val(meta), path("*.log")                 , emit: log
-    tuple val(meta), path("*.NanoStats.txt"), path("*.gz"), emit: qc_input
     path  "versions.yml"                           , emit: versions
 
     when:
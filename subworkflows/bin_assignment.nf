@@ -87,7 +87,10 @@ workflow BIN_ASSIGNMENT {
     emit:
     assembled_bins
     complete_assembly = RENAME_CONTIGS.out.complete_assembly
+    complete_assembly_fai = RENAME_CONTIGS.out.fai
+    contig_map = RENAME_CONTIGS.out.contig_map
     reads_complete_assembly = ch_reads.join(RENAME_CONTIGS.out.complete_assembly, by: [0])
+    polished_bam = assembly_output.map { meta -> meta = [meta[0], meta[3]]}
     bin_bam = ch_filter_bam
     versions = ch_versions
 }
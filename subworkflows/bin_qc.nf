@@ -8,7 +8,6 @@ include { ASSEMBLY_STATS } from '../modules/local/assembly_stats/main'
 include { GTDBTK_CLASSIFYWF } from '../modules/nf-core/gtdbtk/classifywf/main'
 include { PLOT_BINS } from '../modules/local/plot_bins/main'
 include { ASSIGN_TAXONOMY } from '../modules/local/assign_taxonomy/main'
-include { FILTER_BAM } from '../modules/local/filter_bam/main'
 include { MEDAKA as MEDAKA_MAG } from '../modules/local/medaka/main'   
 
 workflow BIN_QC {
@@ -16,6 +15,7 @@ workflow BIN_QC {
     take: 
     assembled_bins
     contig_qc_results
+    complete_assembly
 
     main:
     ch_versions = Channel.empty()
@@ -38,7 +38,7 @@ workflow BIN_QC {
 //    QUAST(assembled_bins)
 //    ch_versions = ch_versions.mix(QUAST.out.versions)
 
-    ASSEMBLY_STATS(assembled_bins)
+    ASSEMBLY_STATS(assembled_bins.join(complete_assembly, by: [0]))
     ch_versions = ch_versions.mix(ASSEMBLY_STATS.out.versions)
 
     if ( params.GTDBTK_CLASSIFYWF.gtdb_db) {
@@ -46,14 +46,15 @@ workflow BIN_QC {
             if ( params.CHECKM_LINEAGEWF.db) {
                 if ( params.TAXONOMIC_PROFILING.gtdb_metadata) {
                     ch_int_1 = CHECKM_LINEAGEWF.out.checkm_tsv.join(GTDBTK_CLASSIFYWF.out.summary, by: [0])
-                    ch_int_2 = ch_int_1.join(ASSEMBLY_STATS.out.asm_stats, by: [0])
+                    ch_int_2 = ch_int_1.join(ASSEMBLY_STATS.out.asm_stats, by: [0]).join(ASSEMBLY_STATS.out.sidecar, by: [0])
                     ch_int_3 = contig_qc_results.join(ch_int_2, by: [0])
 
                     PLOT_BINS(ch_int_3, params.TAXONOMIC_PROFILING.gtdb_metadata, params.PLOT_BINS.template) 
                     ch_versions = ch_versions.mix(PLOT_BINS.out.versions)
 
                     ch_binreports = ch_binreports.mix(PLOT_BINS.out.bin_summary)
-                    ch_binreports = ch_binreports.mix(PLOT_BINS.out.contig_summary) }}}}
+                    ch_binreports = ch_binreports.mix(PLOT_BINS.out.contig_summary)
+                    ch_binreports = ch_binreports.mix(ASSEMBLY_STATS.out.sidecar.map{ meta -> meta = [meta[0], meta[1]]}) }}}}
 
     emit:
     ch_int_3
@@ -3,7 +3,7 @@
  */
 
 include { ASSIGN_TAXONOMY } from '../modules/local/assign_taxonomy/main'
-include { FILTER_BAM } from '../modules/local/filter_bam/main'
+include { DEMULTIPLEX_BAM } from '../modules/local/demultiplex_bam/main'
 include { MEDAKA as MEDAKA_MAG } from '../modules/local/medaka/main'                                                                                                                                                          
 
 workflow BIN_TAXONOMY {
@@ -11,6 +11,7 @@ workflow BIN_TAXONOMY {
     take:
     bin_taxonomy
     bin_bam
+    contig_map
 
     main:
     ch_versions = Channel.empty()
@@ -30,15 +31,21 @@ workflow BIN_TAXONOMY {
 
         ch_assigned_AF_25 = ch_test2.combine(bin_bam, by: [0]).unique().map{meta -> meta = [[id: meta[0].id, run_id: meta[0].run_id, barcode: meta[0].barcode, target: meta[0].target, single_end: true, is_ont: true, bin: (meta[1].getName().split(/\./)[1]), clean_id: (meta[1].getName().split(/\./)[2].replace("_", " ")), genus: (meta[1].getName().split(/\./)[2].split("_")[0]), amfr: (meta[1].getName().split(/\./)[3]), resfinder: (meta[1].getName().split(/\./)[4].replace("~", " ")), mlst_scheme: (meta[1].getName().split(/\./)[5]), krocus_scheme: (meta[1].getName().split(/\./)[6].replace("~", " ")), gene_DB: (meta[1].getName().split(/\./)[7])], meta[1], meta[4]]}.unique()
 
-        FILTER_BAM(ch_assigned_AF_25)
-        ch_versions = ch_versions.mix(FILTER_BAM.out.versions)
+        // Demultiplex reads for every target bin of a sample in a single pass over its BAM, matching samples on run and sample id
+        ch_demux_bins = ch_assigned_AF_25.map{meta -> meta = [[meta[0].run_id, meta[0].id], meta[0].bin]}.unique().groupTuple(by: [0])
+        ch_demux_bam = bin_bam.join(contig_map, by: [0]).map{meta -> meta = [[meta[0].run_id, meta[0].id], meta[0], meta[3], meta[4]]}
+        ch_demux_input = ch_demux_bam.join(ch_demux_bins, by: [0]).map{meta -> meta = [meta[1], meta[4], meta[2], meta[3]]}
 
-        ch_assigned_AF_26 = FILTER_BAM.out.sp_sub_fastq
+        DEMULTIPLEX_BAM(ch_demux_input)
+        ch_versions = ch_versions.mix(DEMULTIPLEX_BAM.out.versions)
+
+        ch_demux_fastq = DEMULTIPLEX_BAM.out.fastq.transpose().map{meta -> meta = [[meta[0].run_id, meta[0].id, meta[1].getName().tokenize('.')[-3]], meta[1]]}
+        ch_assigned_AF_26 = ch_assigned_AF_25.map{meta -> meta = [[meta[0].run_id, meta[0].id, meta[0].bin], meta[0], meta[1]]}.join(ch_demux_fastq, by: [0]).map{meta -> meta = [meta[1], meta[2], meta[3]]}
 
         if (params.BIN_TAXONOMY.medaka_mag ) {
             MEDAKA_MAG(ch_assigned_AF_26)
             ch_prokarya_reads = MEDAKA_MAG.out.assembly_reads}
-        else { ch_prokarya_reads = FILTER_BAM.out.sp_sub_fastq}
+        else { ch_prokarya_reads = ch_assigned_AF_26}
 
         ch_salmonella = ch_prokarya_reads.filter({meta, fasta, bam -> meta.genus.toLowerCase().matches("^salmonella")})
         ch_ecoli = ch_prokarya_reads.filter({meta, fasta, bam -> meta.clean_id.toLowerCase().matches("^escherichia coli")})
@@ -4,11 +4,9 @@
 
 include { NANOPLOT as NANOPLOT_POSTQC} from '../modules/nf-core/nanoplot/main'
 include { MINIMAP2_ALIGN } from '../modules/nf-core/minimap2/align/main'
-include { FILTER_MAPPED } from '../modules/local/filter_mapped/main'
 include { KRAKEN2_KRAKEN2 as KRAKEN2_HOST } from '../modules/nf-core/kraken2/kraken2/main'
-include { SEQKIT_GREP } from '../modules/nf-core/seqkit/grep/main'
-include { SEQTK_FQCHK as SEQTK_FQCHK_POSTQC } from '../modules/local/seqtk/fqchk/main'
-include { FILTER_READLIST } from '../modules/local/filter_readlist/main'
+include { FASTQ_QC as FASTQ_QC_POSTQC } from '../modules/local/fastq_qc/main'
+include { REMOVE_HOST_READS } from '../modules/local/remove_host_reads/main'
 
 workflow READ_DECONTAMINATION {
 
@@ -20,45 +18,42 @@ workflow READ_DECONTAMINATION {
     ch_candidate_reads = Channel.empty()
 
     if (params.READ_DECONTAMINATION.host_assembly) {
-       MINIMAP2_ALIGN(qc_pass_reads, [[],params.READ_DECONTAMINATION.host_assembly], true, false, false)
+       MINIMAP2_ALIGN(qc_pass_reads, [[],params.READ_DECONTAMINATION.host_assembly], false, false, false)
        ch_versions = ch_versions.mix(MINIMAP2_ALIGN.out.versions)
 
-       FILTER_MAPPED(MINIMAP2_ALIGN.out.bam)
-       ch_versions = ch_versions.mix(FILTER_MAPPED.out.versions)
-
-       ch_candidate_reads =  qc_pass_reads.join(FILTER_MAPPED.out.read_list.map{meta -> meta = [meta[0],meta[1],meta[1]]})
+       ch_candidate_reads =  qc_pass_reads.join(MINIMAP2_ALIGN.out.paf.map{meta -> meta = [meta[0],meta[1],[]]})
     }
 
     if (params.READ_DECONTAMINATION.host_krakendb) {
        KRAKEN2_HOST(qc_pass_reads, params.READ_DECONTAMINATION.host_krakendb,false,true)
        ch_versions = ch_versions.mix(KRAKEN2_HOST.out.versions)
 
-       ch_candidate_reads =  qc_pass_reads.join(KRAKEN2_HOST.out.classified_reads_assignment.map{meta -> meta = [meta[0],meta[1], meta[1]]})
+       ch_candidate_reads =  qc_pass_reads.join(KRAKEN2_HOST.out.classified_reads_assignment.map{meta -> meta = [meta[0],[],meta[1]]})
     }
 
     if (params.READ_DECONTAMINATION.host_assembly) {
        if (params.READ_DECONTAMINATION.host_krakendb) {
-          ch_decom_reads = FILTER_MAPPED.out.read_list.join(KRAKEN2_HOST.out.classified_reads_assignment, by: [0])
+          ch_decom_reads = MINIMAP2_ALIGN.out.paf.join(KRAKEN2_HOST.out.classified_reads_assignment, by: [0])
           ch_candidate_reads = qc_pass_reads.join(ch_decom_reads)
        }
     }
 
-    FILTER_READLIST(ch_candidate_reads)
-    //versions
-
-    SEQKIT_GREP(FILTER_READLIST.out.host_readlist)
-    ch_versions = ch_versions.mix(SEQKIT_GREP.out.versions)
+    // Host read IDs from minimap2 (PAF) and Kraken2 are held as hashes in memory and the clean FASTQ is written in one pass
+    REMOVE_HOST_READS(ch_candidate_reads)
+    ch_versions = ch_versions.mix(REMOVE_HOST_READS.out.versions)
 
-    NANOPLOT_POSTQC(SEQKIT_GREP.out.filter)
-    ch_versions = ch_versions.mix(NANOPLOT_POSTQC.out.versions)
+    FASTQ_QC_POSTQC(REMOVE_HOST_READS.out.clean_reads, params.FASTQ_QC.endseq_len)
+    ch_versions = ch_versions.mix(FASTQ_QC_POSTQC.out.versions)
 
-    SEQTK_FQCHK_POSTQC(SEQKIT_GREP.out.filter, params.SEQTK_FQCHK.endseq_len)
-    ch_versions = ch_versions.mix(SEQTK_FQCHK_POSTQC.out.versions)
+    if (params.READ_QC.nanoplot) {
+        NANOPLOT_POSTQC(REMOVE_HOST_READS.out.clean_reads)
+        ch_versions = ch_versions.mix(NANOPLOT_POSTQC.out.versions)
+    }
 
     emit:
-    host_readlist = FILTER_READLIST.out.host_readlist.map{meta -> meta = [meta[0], meta[2]]}
-    postqc_reads  = SEQKIT_GREP.out.filter.map{meta -> meta = [meta[0], meta[1]] }
-    postqc_results = SEQTK_FQCHK_POSTQC.out.pbq_se.join(NANOPLOT_POSTQC.out.qc_input, by: [0])
+    host_readlist = REMOVE_HOST_READS.out.host_readlist
+    postqc_reads  = REMOVE_HOST_READS.out.clean_reads
+    postqc_results = FASTQ_QC_POSTQC.out.qc_input
     versions = ch_versions
 }
 
@@ -5,7 +5,7 @@
 include { NANOPLOT as NANOPLOT_PREQC } from '../modules/nf-core/nanoplot/main'
 include { PORECHOP_PORECHOP } from '../modules/nf-core/porechop/porechop/main'
 include { FILTLONG } from '../modules/nf-core/filtlong/main'
-include { SEQTK_FQCHK as SEQTK_FQCHK_PREQC } from '../modules/local/seqtk/fqchk/main'
+include { FASTQ_QC as FASTQ_QC_PREQC } from '../modules/local/fastq_qc/main'
 
 workflow READ_QC {
 
@@ -13,17 +13,19 @@ workflow READ_QC {
     reads    // channel: [ val(meta), path(reads) ]
 
     main:
-    // Takes input reads, runs two read quality control tools and then trims adapters and filters out low quality reads
+    // Takes input reads, collects read quality control metrics and then trims adapters and filters out low quality reads
 
     ch_versions = Channel.empty()
 
-    // Run Nanoplot of pre-quality controlled reads
-    NANOPLOT_PREQC(reads)
-    ch_versions = ch_versions.mix(NANOPLOT_PREQC.out.versions)
+    // Get read statistics, nucleotide composition of read ends and read length/quality histogram in a single pass
+    FASTQ_QC_PREQC(reads, params.FASTQ_QC.endseq_len)
+    ch_versions = ch_versions.mix(FASTQ_QC_PREQC.out.versions)
 
-    // Get nucloetide composition of reads
-    SEQTK_FQCHK_PREQC(reads, params.SEQTK_FQCHK.endseq_len)
-    ch_versions = ch_versions.mix(SEQTK_FQCHK_PREQC.out.versions)
+    // Optionally run Nanoplot of pre-quality controlled reads for its standalone reports
+    if (params.READ_QC.nanoplot) {
+        NANOPLOT_PREQC(reads)
+        ch_versions = ch_versions.mix(NANOPLOT_PREQC.out.versions)
+    }
 
     // Trims adapters
     PORECHOP_PORECHOP(reads)
@@ -37,8 +39,8 @@ workflow READ_QC {
     // Emit QC pass reads
     qc_pass_reads = FILTLONG.out.reads
 
-    // Emit merged Seqth and Nanoplot results
-    preqc_results  = SEQTK_FQCHK_PREQC.out.pbq_se.join(NANOPLOT_PREQC.out.qc_input, by: [0])
+    // Emit read QC metrics (5' and 3' composition, read statistics and read length/quality histogram)
+    preqc_results  = FASTQ_QC_PREQC.out.qc_input
 
     versions = ch_versions
 }
@@ -3,6 +3,7 @@
  */
 
 include { PYCOQC } from '../modules/nf-core/pycoqc/main'
+include { INDEX_RUN } from '../modules/local/index_run/main'
 include { FETCH_FASTQ } from '../modules/local/fetch_fastq/main'
 include { FETCH_SEQSUM } from '../modules/local/fetch_seqsum/main'
 
@@ -18,21 +19,31 @@ workflow RUN_QC {
 
     scheme.map{meta -> meta.run_id}.unique().set{ schemex }
 
+    // Index each run directory once
+    INDEX_RUN(schemex)
+    ch_versions = ch_versions.mix(INDEX_RUN.out.versions)
+
+    ch_fetch_fastq = scheme.map{meta -> meta = [meta.run_id, meta]}.combine(INDEX_RUN.out.manifest, by: [0]).map{meta -> meta = [meta[1], meta[2]]}
+
     // Gather Pass FASTQ files
-    FETCH_FASTQ(scheme)
+    FETCH_FASTQ(ch_fetch_fastq)
     ch_versions = ch_versions.mix(FETCH_FASTQ.out.versions)
 
     // Get Sequencing summary file
-    FETCH_SEQSUM(schemex)
+    FETCH_SEQSUM(INDEX_RUN.out.manifest)
     ch_versions = ch_versions.mix(FETCH_SEQSUM.out.versions)
 
-    // Run PycoQC on Sequencing summary file
-    PYCOQC(FETCH_SEQSUM.out.sequencing_summary)
-    ch_versions = ch_versions.mix(PYCOQC.out.versions)
+    // Run PycoQC on Sequencing summary file, FETCH_SEQSUM also aggregates the summaries into per-barcode statistics and histograms in a single chunked pass
+    if (params.RUN_QC.pycoqc) {
+        PYCOQC(FETCH_SEQSUM.out.sequencing_summary)
+        ch_versions = ch_versions.mix(PYCOQC.out.versions)
+    }
 
     emit:
     // Emit combined FASTQ file
     aggregated_reads = FETCH_FASTQ.out.reads
+    seqsum_summary = FETCH_SEQSUM.out.seqsum_summary
+    seqsum_histograms = FETCH_SEQSUM.out.seqsum_histograms
 
     versions = ch_versions
 
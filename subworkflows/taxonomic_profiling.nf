@@ -52,10 +52,11 @@ workflow TAXONOMIC_PROFILING {
             ch_parsedreports = ch_parsedreports.mix(BRACKEN_KRAKEN2.out.reports)
 
             if (params.TAXONOMIC_PROFILING.target_species) {
-                PARSE_KRAKEN2HITS(BRACKEN_KRAKEN2.out.reports, params.TAXONOMIC_PROFILING.target_species, [params.PARSE_KRAKEN2HITS.min_target_reads, params.PARSE_KRAKEN2HITS.min_target_fraction], "Bracken")
+                ch_parse_kraken2hits_batch = BRACKEN_KRAKEN2.out.reports.map{meta -> meta = [meta[0].run_id, meta[0], meta[1]]}.groupTuple(by: [0]).map{meta -> meta = [[id: meta[0], run_id: meta[0], samples: [meta[1]*.id, meta[1]].transpose().collectEntries()], meta[2]]}
+                PARSE_KRAKEN2HITS(ch_parse_kraken2hits_batch, params.TAXONOMIC_PROFILING.target_species, [params.PARSE_KRAKEN2HITS.min_target_reads, params.PARSE_KRAKEN2HITS.min_target_fraction], "Bracken")
                 ch_versions = ch_versions.mix(PARSE_KRAKEN2HITS.out.versions)
 
-                ch_parsedreports = ch_parsedreports.mix(PARSE_KRAKEN2HITS.out.targets_filtered)
+                ch_parsedreports = ch_parsedreports.mix(PARSE_KRAKEN2HITS.out.targets_filtered.transpose().map{meta -> meta = [meta[0].samples[meta[1].getParent().getName()], meta[1]]})
             }
         }
     }
@@ -71,11 +72,12 @@ workflow TAXONOMIC_PROFILING {
             PLOT_SYLPH(SYLPH_PROFILE.out.results, "Sylph", params.TAXONOMIC_PROFILING.gtdb_metadata, params.TAXONOMIC_PROFILING.template)
             ch_versions = ch_versions.mix(PLOT_SYLPH.out.versions)
 
-            PARSE_SYLPHHITS(SYLPH_PROFILE.out.results, params.TAXONOMIC_PROFILING.target_species, [params.PARSE_SYLPHHITS.min_target_reads, params.PARSE_SYLPHHITS.min_target_fraction], "Sylph")
+            ch_parse_sylphhits_batch = SYLPH_PROFILE.out.results.map{meta -> meta = [meta[0].run_id, meta[0], meta[1]]}.groupTuple(by: [0]).map{meta -> meta = [[id: meta[0], run_id: meta[0], samples: [meta[1]*.id, meta[1]].transpose().collectEntries()], meta[2]]}
+            PARSE_SYLPHHITS(ch_parse_sylphhits_batch, params.TAXONOMIC_PROFILING.target_species, [params.PARSE_SYLPHHITS.min_target_reads, params.PARSE_SYLPHHITS.min_target_fraction], "Sylph")
             ch_versions = ch_versions.mix(PARSE_SYLPHHITS.out.versions)
 
             ch_parsedreports = ch_parsedreports.mix(SYLPH_PROFILE.out.results)
-            ch_parsedreports = ch_parsedreports.mix(PARSE_SYLPHHITS.out.targets_filtered)
+            ch_parsedreports = ch_parsedreports.mix(PARSE_SYLPHHITS.out.targets_filtered.transpose().map{meta -> meta = [meta[0].samples[meta[1].getParent().getName()], meta[1]]})
 
         }
     }
@@ -99,10 +101,11 @@ workflow TAXONOMIC_PROFILING {
             ch_parsedreports = ch_parsedreports.mix(BRACKEN_CENTRIFUGER.out.reports)
 
             if (params.TAXONOMIC_PROFILING.target_species) {
-                PARSE_CENTRIFUGERHITS(BRACKEN_CENTRIFUGER.out.reports, params.TAXONOMIC_PROFILING.target_species, [params.PARSE_CENTRIFUGERHITS.min_target_reads, params.PARSE_CENTRIFUGERHITS.min_target_fraction], "Bracken")
+                ch_parse_centrifugerhits_batch = BRACKEN_CENTRIFUGER.out.reports.map{meta -> meta = [meta[0].run_id, meta[0], meta[1]]}.groupTuple(by: [0]).map{meta -> meta = [[id: meta[0], run_id: meta[0], samples: [meta[1]*.id, meta[1]].transpose().collectEntries()], meta[2]]}
+                PARSE_CENTRIFUGERHITS(ch_parse_centrifugerhits_batch, params.TAXONOMIC_PROFILING.target_species, [params.PARSE_CENTRIFUGERHITS.min_target_reads, params.PARSE_CENTRIFUGERHITS.min_target_fraction], "Bracken")
                 ch_versions = ch_versions.mix(PARSE_CENTRIFUGERHITS.out.versions)
 
-                ch_parsedreports = ch_parsedreports.mix(PARSE_CENTRIFUGERHITS.out.targets_filtered)
+                ch_parsedreports = ch_parsedreports.mix(PARSE_CENTRIFUGERHITS.out.targets_filtered.transpose().map{meta -> meta = [meta[0].samples[meta[1].getParent().getName()], meta[1]]})
 
             }
        }
@@ -95,15 +95,15 @@ else if (params.input_type =="fastq") {
         BIN_ASSIGNMENT(ASSEMBLY.out.final_assembly_mapped)
         ch_versions = ch_versions.mix(BIN_ASSIGNMENT.out.versions)
 
-        CONTIG_QC(BIN_ASSIGNMENT.out.reads_complete_assembly)
+        CONTIG_QC(BIN_ASSIGNMENT.out.reads_complete_assembly, BIN_ASSIGNMENT.out.polished_bam, BIN_ASSIGNMENT.out.contig_map, BIN_ASSIGNMENT.out.complete_assembly_fai)
         ch_versions = ch_versions.mix(CONTIG_QC.out.versions)
 
-        BIN_QC(BIN_ASSIGNMENT.out.assembled_bins, CONTIG_QC.out.ch_plt_p1)
+        BIN_QC(BIN_ASSIGNMENT.out.assembled_bins, CONTIG_QC.out.ch_plt_p1, BIN_ASSIGNMENT.out.complete_assembly)
         ch_versions = ch_versions.mix(BIN_QC.out.versions)
 
         ch_final_report = ch_final_report.mix(BIN_QC.out.ch_binreports)
 
-        BIN_TAXONOMY(BIN_QC.out.ch_bin_taxonomy, CONTIG_QC.out.complete_assembly_bam)
+        BIN_TAXONOMY(BIN_QC.out.ch_bin_taxonomy, CONTIG_QC.out.complete_assembly_bam, BIN_ASSIGNMENT.out.contig_map)
         ch_versions = ch_versions.mix(BIN_TAXONOMY.out.versions)
 
         if (!params.skip_bacterial_typing ) {